@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Optional, Sequence
+
+from app.common.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration, read by the server
+MAX_RUNNING_ENV = "ADMISSION_MAX_RUNNING"
+MAX_PER_TENANT_ENV = "ADMISSION_MAX_PER_TENANT"
+
+DEFAULT_MAX_RUNNING = 8
+DEFAULT_MAX_PER_TENANT = 4
+DEFAULT_MAX_QUEUED_PER_TENANT = 64
+DEFAULT_TENANT = "default"
+
+# Seconds a rejected client is told to wait before retrying
+RETRY_AFTER_SECONDS = 5
+
+queue_seconds = metrics.histogram("admission_queue_seconds", "Time graph runs waited for admission",
+                                  ("priority", "outcome"))
+rejected = metrics.counter("admission_rejected_total", "Graph runs refused admission", ("priority", "reason"))
+queued = metrics.gauge("admission_queued", "Graph runs waiting for admission", ("priority",))
+running = metrics.gauge("admission_running", "Graph runs admitted and not yet finished", ("priority",))
+
+
+@dataclass(frozen=True)
+class PriorityClass:
+    """
+    Admission limits of one class of graph runs.
+
+    Attributes:
+        name (str): Class name, as requested by clients.
+        rank (int): Classes of lower rank are admitted first when a slot frees.
+        share (float): Fraction of the controller's `max_running` slots the class may
+            hold at once, at least one slot; below 1, it keeps slots free for the other classes.
+        max_queued (int): Runs of the class waiting, beyond which new ones are rejected at once.
+        queue_timeout (Optional[float]): Seconds a run may wait before it is rejected.
+            None waits until admitted.
+    """
+
+    name: str
+    rank: int
+    share: float
+    max_queued: int
+    queue_timeout: Optional[float] = None
+
+
+INTERACTIVE = PriorityClass("interactive", rank=0, share=1.0, max_queued=32, queue_timeout=10.0)
+BATCH = PriorityClass("batch", rank=1, share=0.75, max_queued=256)
+
+DEFAULT_CLASSES = (INTERACTIVE, BATCH)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a graph run is refused admission.
+
+    Attributes:
+        reason (str): "queue_full", "tenant_queue_full" or "timeout".
+        retry_after (int): Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, message: str, reason: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    tenant: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class AdmissionController:
+    """
+    Admits graph runs under global, per-class and per-tenant concurrency limits.
+
+    A run waits in the bounded queue of its priority class until a slot is free; a run
+    arriving at a full queue, or from a tenant with `max_queued_per_tenant` runs already
+    waiting, is rejected at once with AdmissionRejected. When a slot frees, the classes
+    are served by rank and each class in arrival order, skipping the runs of tenants at
+    `max_per_tenant`, so one tenant's burst cannot hold every slot and batch runs cannot
+    delay interactive ones beyond the end of a run.
+
+    Runs are admitted from the event loop's task only; the controller is not thread safe.
+
+    Args:
+        max_running (int): Runs admitted at once across classes and tenants.
+        max_per_tenant (int): Runs of one tenant admitted at once.
+        max_queued_per_tenant (int): Runs of one tenant waiting across classes.
+        classes (Sequence[PriorityClass]): Priority classes, by name.
+    """
+
+    def __init__(self, max_running: int = DEFAULT_MAX_RUNNING, max_per_tenant: int = DEFAULT_MAX_PER_TENANT,
+                 max_queued_per_tenant: int = DEFAULT_MAX_QUEUED_PER_TENANT,
+                 classes: Sequence[PriorityClass] = DEFAULT_CLASSES):
+        self.max_running = max_running
+        self.max_per_tenant = max_per_tenant
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.classes: Dict[str, PriorityClass] = {c.name: c for c in sorted(classes, key=lambda c: c.rank)}
+        # Slots of each class, from its share of this controller's limit
+        self._class_limits: Dict[str, int] = {
+            c.name: max(1, min(max_running, int(max_running * c.share))) for c in self.classes.values()
+        }
+        self._queues: Dict[str, Deque[_Waiter]] = {name: deque() for name in self.classes}
+        self._running: Dict[str, int] = {name: 0 for name in self.classes}
+        self._tenant_running: Dict[str, int] = {}
+        self._tenant_queued: Dict[str, int] = {}
+
+    def check(self, tenant: str, priority: str) -> None:
+        """
+        Raises AdmissionRejected if a run of `tenant` would be rejected now, without queueing it.
+
+        For callers that must answer before they start waiting, such as streaming responses.
+
+        Raises:
+            KeyError: If there is no class `priority`.
+            AdmissionRejected: If the class's queue, or the tenant's, is full.
+        """
+        priority_class = self.classes[priority]
+        if self._can_start(tenant, priority_class) and not self._queues[priority]:
+            return
+        if len(self._queues[priority]) >= priority_class.max_queued:
+            raise self._reject(priority, AdmissionRejected(
+                f"{priority_class.max_queued} {priority} runs are already queued", "queue_full"))
+        if self._tenant_queued.get(tenant, 0) >= self.max_queued_per_tenant:
+            raise self._reject(priority, AdmissionRejected(
+                f"Tenant {tenant} has {self.max_queued_per_tenant} runs queued", "tenant_queue_full"))
+
+    @contextlib.asynccontextmanager
+    async def admit(self, tenant: str = DEFAULT_TENANT, priority: str = INTERACTIVE.name) -> AsyncIterator[None]:
+        """
+        Holds a slot for the run in the block, waiting for one if needed.
+
+        Args:
+            tenant (str): Tenant the run is counted against.
+            priority (str): Name of the run's priority class.
+
+        Raises:
+            KeyError: If there is no class `priority`.
+            AdmissionRejected: If the run is rejected, at once or after its queue timeout.
+        """
+        await self._acquire(tenant, priority)
+        try:
+            yield
+        finally:
+            self._release(tenant, priority)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"running": self._running[name], "queued": len(queue)} for name, queue in self._queues.items()}
+
+    def _can_start(self, tenant: str, priority_class: PriorityClass) -> bool:
+        return (sum(self._running.values()) < self.max_running
+                and self._running[priority_class.name] < self._class_limits[priority_class.name]
+                and self._tenant_running.get(tenant, 0) < self.max_per_tenant)
+
+    def _start(self, tenant: str, priority: str) -> None:
+        self._running[priority] += 1
+        self._tenant_running[tenant] = self._tenant_running.get(tenant, 0) + 1
+        running.inc(priority=priority)
+
+    def _reject(self, priority: str, error: AdmissionRejected) -> AdmissionRejected:
+        rejected.inc(priority=priority, reason=error.reason)
+        logger.warning(f"Graph run refused admission: {error}")
+        return error
+
+    async def _acquire(self, tenant: str, priority: str) -> None:
+        self.check(tenant, priority)
+        priority_class = self.classes[priority]
+        if not self._queues[priority] and self._can_start(tenant, priority_class):
+            queue_seconds.observe(0.0, priority=priority, outcome="admitted")
+            self._start(tenant, priority)
+            return
+
+        waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+        self._queues[priority].append(waiter)
+        self._tenant_queued[tenant] = self._tenant_queued.get(tenant, 0) + 1
+        queued.inc(priority=priority)
+        # Slots may be free for this run while the queue waits on runs of tenants at their limit
+        self._dispatch()
+        outcome = "admitted"
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), priority_class.queue_timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise self._reject(priority, AdmissionRejected(
+                f"No {priority} slot within {priority_class.queue_timeout:g} seconds", "timeout"))
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if outcome != "admitted":
+                self._abandon(waiter, priority)
+            queue_seconds.observe(time.perf_counter() - waiter.enqueued_at, priority=priority, outcome=outcome)
+
+    def _abandon(self, waiter: _Waiter, priority: str) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Admitted as it gave up; hand the slot on
+            self._release(waiter.tenant, priority)
+            return
+        waiter.future.cancel()
+        self._queues[priority].remove(waiter)
+        self._dequeued(waiter, priority)
+
+    def _dequeued(self, waiter: _Waiter, priority: str) -> None:
+        self._tenant_queued[waiter.tenant] -= 1
+        if not self._tenant_queued[waiter.tenant]:
+            del self._tenant_queued[waiter.tenant]
+        queued.dec(priority=priority)
+
+    def _release(self, tenant: str, priority: str) -> None:
+        self._running[priority] -= 1
+        self._tenant_running[tenant] -= 1
+        if not self._tenant_running[tenant]:
+            del self._tenant_running[tenant]
+        running.dec(priority=priority)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Admits waiting runs into the free slots, by class rank then arrival.
+        """
+        for name in self.classes:
+            queue = self._queues[name]
+            for waiter in list(queue):
+                if sum(self._running.values()) >= self.max_running:
+                    return
+                if self._running[name] >= self._class_limits[name]:
+                    break
+                if self._tenant_running.get(waiter.tenant, 0) >= self.max_per_tenant:
+                    continue
+                queue.remove(waiter)
+                self._dequeued(waiter, name)
+                self._start(waiter.tenant, name)
+                waiter.future.set_result(None)
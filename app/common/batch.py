@@ -0,0 +1,236 @@
+"""
+Runs the requests of a JSON Lines file through a pattern graph.
+
+Each input line is a JSON object with an ID (`id` or `request_id`) and the user message
+(`message`, `prompt` or `body`, preceded by `title` when there is one). Requests are
+read as they are needed and run with at most `--concurrency` at once, each on a new
+thread. Every result is appended to the output file as soon as it is known, so an
+interrupted batch can be restarted with the same arguments: requests already recorded
+as "ok" are skipped, failed ones are run again.
+
+Run from the repository root:
+
+    python -m app.common.batch --graph cot --input requests.jsonl --output results.jsonl
+    python -m app.common.batch --graph spotify_ls --input requests.jsonl --output out.jsonl --concurrency 4
+
+`--deadline` stops each request after that many seconds, recording the answer of its
+last checkpoint with status "deadline"; such requests are run again on a restart.
+`--fake-llm` swaps in the deterministic models of the benchmarks, to try a batch offline.
+The report at the end gives throughput, latency percentiles and the tokens used.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import LLMResult
+
+from app.common.cancellation import run_with_deadline
+from app.common.graph_registry import GRAPHS, GraphRegistry, import_pattern
+
+
+logger = logging.getLogger(__name__)
+
+ID_FIELDS = ("id", "request_id")
+TEXT_FIELDS = ("message", "prompt", "body")
+
+
+class TokenCounter(BaseCallbackHandler):
+    """
+    Sums the tokens reported by the LLM calls of a run.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+
+@dataclass
+class BatchStats:
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    latencies: List[float] = field(default_factory=list)
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+def parse_request(line: str, text_field: Optional[str]) -> Tuple[str, str]:
+    """
+    Returns the (ID, message) of an input line.
+
+    Raises:
+        ValueError: If the line has no ID or no message.
+    """
+    record = json.loads(line)
+    request_id = next((str(record[f]) for f in ID_FIELDS if f in record), None)
+    fields = (text_field,) if text_field else TEXT_FIELDS
+    text = next((record[f] for f in fields if record.get(f)), None)
+    if request_id is None or text is None:
+        raise ValueError(f"No ID or message in {line[:80]!r}")
+    if record.get("title") and text_field is None:
+        text = f"{record['title']}\n\n{text}"
+    return request_id, text
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    IDs recorded as "ok" in an earlier output file.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line of an interrupted batch may be cut short
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+def read_requests(path: str, text_field: Optional[str]) -> Iterator[Tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield parse_request(line, text_field)
+            except (ValueError, json.JSONDecodeError) as e:
+                logger.error(f"Skipping line {number} of {path}: {e}")
+
+
+def last_answer(values: Dict[str, Any]) -> Optional[str]:
+    for message in reversed(values.get("messages", [])):
+        if isinstance(message, AIMessage) and message.content:
+            return message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return None
+
+
+async def run_request(graph: Any, name: str, request_id: str, text: str,
+                      deadline: Optional[float] = None) -> Dict[str, Any]:
+    counter = TokenCounter()
+    thread_id = f"batch-{request_id}-{uuid.uuid4().hex[:8]}"
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [counter]}
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"id": request_id, "graph": name, "thread_id": thread_id}
+    try:
+        outcome = await run_with_deadline(graph, {"messages": [HumanMessage(content=text)]}, config,
+                                          name=name, deadline=deadline)
+        record.update(status="ok" if outcome.completed else outcome.status, answer=last_answer(outcome.values))
+    except Exception as e:
+        record.update(status="error", error=repr(e))
+    record["latency_seconds"] = time.perf_counter() - start
+    record["tokens"] = {"input": counter.input_tokens, "output": counter.output_tokens}
+    return record
+
+
+async def run_batch(graph: Any, name: str, input_path: str, output_path: str, concurrency: int,
+                    text_field: Optional[str] = None, deadline: Optional[float] = None) -> BatchStats:
+    """
+    Runs the requests of `input_path` not yet completed in `output_path`, appending results to it.
+    """
+    stats = BatchStats()
+    done = completed_ids(output_path)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce() -> None:
+        for request_id, text in read_requests(input_path, text_field):
+            if request_id in done:
+                stats.skipped += 1
+                continue
+            await queue.put((request_id, text))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async def work() -> None:
+            while (item := await queue.get()) is not None:
+                record = await run_request(graph, name, *item, deadline=deadline)
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                stats.latencies.append(record["latency_seconds"])
+                stats.input_tokens += record["tokens"]["input"]
+                stats.output_tokens += record["tokens"]["output"]
+                if record["status"] == "ok":
+                    stats.done += 1
+                else:
+                    stats.failed += 1
+                    logger.error(f"Request {record['id']} failed: {record.get('error', record['status'])}")
+
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    return stats
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_report(stats: BatchStats, seconds: float) -> None:
+    runs = stats.done + stats.failed
+    print(f"completed {stats.done}, failed {stats.failed}, skipped {stats.skipped} in {seconds:.1f}s")
+    if runs:
+        print(f"throughput {runs / seconds:.2f} requests/s")
+        print("latency s   p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+            *(percentile(stats.latencies, p) for p in (50, 95, 99)), max(stats.latencies)))
+    print(f"tokens      input {stats.input_tokens}  output {stats.output_tokens}  "
+          f"total {stats.input_tokens + stats.output_tokens}")
+
+
+def load_graph(name: str, fake_llm: bool) -> Any:
+    if not fake_llm:
+        return GraphRegistry({name: GRAPHS[name]}).get(name)
+    from app.common.benchmarks.fakes import FakeChatModel, FakeStats, fake_search_tool, inject_fakes
+
+    stats = FakeStats()
+    module = import_pattern(GRAPHS[name])
+    inject_fakes(module, FakeChatModel().with_stats(stats), fake_search_tool(stats))
+    return getattr(module, GRAPHS[name].factory)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the requests of a JSON Lines file through a pattern graph")
+    parser.add_argument("--graph", required=True, choices=sorted(GRAPHS))
+    parser.add_argument("--input", required=True, help="JSON Lines file of requests")
+    parser.add_argument("--output", required=True, help="JSON Lines file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--text-field", default=None, help="Field holding the message, detected by default")
+    parser.add_argument("--deadline", type=float, default=None, help="Seconds each request may take")
+    parser.add_argument("--fake-llm", action="store_true", help="Use deterministic fake models, offline")
+    args = parser.parse_args()
+
+    graph = load_graph(args.graph, args.fake_llm)
+    # Pattern modules configure logging at INFO on import; keep the output to errors and the report
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(graph, args.graph, args.input, args.output, args.concurrency, args.text_field,
+                                  args.deadline))
+    print_report(stats, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Checkpoint write latency benchmark.
+
+Runs a small three-node graph on many threads and records how long the checkpointer
+takes to persist each superstep (the `put` of the new checkpoint plus the `put_writes`
+of the node outputs). Compares the in-memory checkpointer with the SQLite one.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.bench_checkpointer --threads 10000
+
+No API key or network access is needed; the graph nodes are plain Python functions.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Annotated, Any, Dict, List
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from app.common.checkpointer import BoundedMemorySaver, SqliteCheckpointSaver
+
+
+class BenchState(TypedDict):
+    messages: Annotated[list, add_messages]
+    steps: int
+
+
+def _node(name: str, payload: str):
+    def node(state: BenchState) -> Dict[str, Any]:
+        return {"messages": [("ai", f"{name}: {payload}")], "steps": state.get("steps", 0) + 1}
+    return node
+
+
+def instrument(saver: BaseCheckpointSaver, samples: List[float]) -> None:
+    """
+    Wraps the write methods of `saver` so their duration is appended to `samples`.
+    """
+    for method in ("put", "put_writes"):
+        original = getattr(saver, method)
+
+        def timed(*args, _original=original, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+        setattr(saver, method, timed)
+
+
+def build_bench_graph(saver: BaseCheckpointSaver, payload_size: int):
+    payload = "x" * payload_size
+    builder = StateGraph(BenchState)
+    builder.add_node("plan", _node("plan", payload))
+    builder.add_node("act", _node("act", payload))
+    builder.add_node("reflect", _node("reflect", payload))
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "act")
+    builder.add_edge("act", "reflect")
+    builder.add_edge("reflect", END)
+    return builder.compile(checkpointer=saver)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(saver: BaseCheckpointSaver, threads: int, concurrency: int, payload_size: int) -> Dict[str, float]:
+    samples: List[float] = []
+    instrument(saver, samples)
+    graph = build_bench_graph(saver, payload_size)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await graph.ainvoke(
+                {"messages": [("user", f"thread {i}")], "steps": 0},
+                {"configurable": {"thread_id": f"bench-{i}"}},
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(threads)])
+    elapsed = time.perf_counter() - start
+    if isinstance(saver, SqliteCheckpointSaver):
+        saver.flush()
+    return {
+        "elapsed_s": elapsed,
+        "writes": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def report(name: str, stats: Dict[str, float], extra: str = "") -> None:
+    print(
+        f"{name:<8} writes={stats['writes']:>7} total={stats['elapsed_s']:7.2f}s "
+        f"mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms "
+        f"p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms {extra}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint write latency per superstep")
+    parser.add_argument("--threads", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--payload-size", type=int, default=512, help="Characters written per node")
+    parser.add_argument("--max-threads", type=int, default=1000, help="Eviction limit of the memory checkpointer")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--only", choices=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    if args.only in (None, "memory"):
+        saver = BoundedMemorySaver(max_threads=args.max_threads, ttl_seconds=None)
+        stats = asyncio.run(run(saver, args.threads, args.concurrency, args.payload_size))
+        report("memory", stats, f"threads_kept={saver.thread_count()} evicted={saver.evicted_threads}")
+
+    if args.only in (None, "sqlite"):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite")
+            saver = SqliteCheckpointSaver(path, batch_size=args.batch_size, flush_interval=args.flush_interval)
+            try:
+                stats = asyncio.run(run(saver, args.threads, args.concurrency, args.payload_size))
+            finally:
+                saver.close()
+            size_mb = sum(
+                os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)
+            ) / 1e6
+            report("sqlite", stats, f"db_size={size_mb:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
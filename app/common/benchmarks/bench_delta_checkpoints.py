@@ -0,0 +1,163 @@
+"""
+Full versus delta checkpoints of the messages channel.
+
+Runs an agent-like loop (an AIMessage with a tool call and verbose response metadata,
+followed by a large ToolMessage) for a number of steps, checkpointing every superstep.
+Reports the bytes written per step and the time to restore a checkpoint at several
+points of the session, for the plain checkpointer and for DeltaCheckpointSaver.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.bench_delta_checkpoints --steps 60
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Annotated, Any, Dict, List
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from app.common.checkpointer import BoundedMemorySaver, SqliteCheckpointSaver
+from app.common.delta_checkpointer import DeltaCheckpointSaver
+
+
+class LoopState(TypedDict):
+    messages: Annotated[list, add_messages]
+    step: int
+
+
+def build_loop_graph(saver: BaseCheckpointSaver, steps: int, tool_payload: int):
+    metadata = {"token_usage": {"prompt_tokens": 1234, "completion_tokens": 56}, "model_name": "gpt-4o",
+                "system_fingerprint": "fp_0123456789", "logprobs": [{"token": "x" * 8, "logprob": -0.1}] * 20}
+    uris = [f"spotify:track:{i:022d}" for i in range(tool_payload // 36)]
+
+    def agent(state: LoopState) -> Dict[str, Any]:
+        call_id = f"call_{state['step']}"
+        message = AIMessage(
+            content=f"Step {state['step']}: fetching more tracks.",
+            tool_calls=[{"id": call_id, "name": "find_top_tracks", "args": {"artists": uris[:5]}}],
+            response_metadata=metadata,
+        )
+        return {"messages": [message]}
+
+    def tool(state: LoopState) -> Dict[str, Any]:
+        call_id = state["messages"][-1].tool_calls[0]["id"]
+        return {"messages": [ToolMessage(content=json.dumps(uris), tool_call_id=call_id)], "step": state["step"] + 1}
+
+    builder = StateGraph(LoopState)
+    builder.add_node("agent", agent)
+    builder.add_node("tool", tool)
+    builder.add_edge(START, "agent")
+    builder.add_edge("agent", "tool")
+    builder.add_conditional_edges("tool", lambda state: "agent" if state["step"] < steps else END)
+    return builder.compile(checkpointer=saver)
+
+
+def checkpoint_bytes(saver: BaseCheckpointSaver, thread_id: str) -> List[int]:
+    """
+    Bytes a BoundedMemorySaver, plus its delta store when wrapped, holds for each
+    checkpoint of a thread, in order.
+
+    Computed from the stored checkpoints once the run is over: pending writes are stored
+    from worker threads while the graph runs, so the saver is not read mid-run. Each
+    checkpoint is charged its own payload and writes, the channel values first stored
+    with it and, for deltas, its record and the message bodies it added.
+    """
+    inner = saver.saver if isinstance(saver, DeltaCheckpointSaver) else saver
+    sizes = []
+    parent_versions: Dict[str, Any] = {}
+    seen_bodies = set()
+    for checkpoint_tuple in reversed(list(inner.list({"configurable": {"thread_id": thread_id}}))):
+        configurable = checkpoint_tuple.config["configurable"]
+        key = (thread_id, configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        checkpoint, metadata, _ = inner.storage[thread_id][key[1]][key[2]]
+        total = len(checkpoint[1]) + len(metadata[1])
+        total += sum(len(value[1]) for _, _, value, *_ in inner.writes.get(key, {}).values())
+        versions = checkpoint_tuple.checkpoint["channel_versions"]
+        for channel, version in versions.items():
+            if parent_versions.get(channel) != version:
+                total += len(inner.blobs.get((thread_id, key[1], channel, version), ("", b""))[1])
+        parent_versions = versions
+        record = saver.store.records.get(key) if isinstance(saver, DeltaCheckpointSaver) else None
+        if record is not None:
+            total += len(record[1])
+            for digest in saver.serde.loads_typed(record)["appended"]:
+                if digest not in seen_bodies:
+                    seen_bodies.add(digest)
+                    total += len(saver.store.bodies[digest][1]) + len(digest)
+        sizes.append(total)
+    return sizes
+
+
+def measure_writes(saver: BaseCheckpointSaver, steps: int, tool_payload: int) -> List[int]:
+    graph = build_loop_graph(saver, steps, tool_payload)
+    graph.invoke({"messages": [("user", "Build me a playlist")], "step": 0},
+                 {"configurable": {"thread_id": "bench"}, "recursion_limit": 4 * steps + 10})
+    return checkpoint_bytes(saver, "bench")
+
+
+def measure_restore(saver: BaseCheckpointSaver, steps: int, tool_payload: int, repeats: int) -> Dict[int, float]:
+    graph = build_loop_graph(saver, steps, tool_payload)
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": 4 * steps + 10}
+    graph.invoke({"messages": [("user", "Build me a playlist")], "step": 0}, config)
+    inner = saver.saver if isinstance(saver, DeltaCheckpointSaver) else saver
+    if isinstance(inner, SqliteCheckpointSaver):
+        inner.flush()
+    history = list(reversed(list(saver.list({"configurable": {"thread_id": "bench"}}))))
+    timings: Dict[int, float] = {}
+    for index in sorted({len(history) // 4, len(history) // 2, len(history) - 1}):
+        checkpoint_config = history[index].config
+        samples = []
+        for _ in range(repeats):
+            if isinstance(saver, DeltaCheckpointSaver):
+                saver._lists.clear()  # measure a cold rebuild
+            start = time.perf_counter()
+            saver.get_tuple(checkpoint_config)
+            samples.append(time.perf_counter() - start)
+        timings[index] = statistics.median(samples) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and delta checkpoints of the messages channel")
+    parser.add_argument("--steps", type=int, default=60, help="Agent/tool round trips")
+    parser.add_argument("--tool-payload", type=int, default=8000, help="Approximate ToolMessage size in bytes")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    full = measure_writes(BoundedMemorySaver(ttl_seconds=None), args.steps, args.tool_payload)
+    delta = measure_writes(DeltaCheckpointSaver(BoundedMemorySaver(ttl_seconds=None)), args.steps, args.tool_payload)
+    print("bytes written per checkpoint (memory)")
+    print(f"{'checkpoint':>10} {'full':>12} {'delta':>12}")
+    for i in sorted({1, len(full) // 4, len(full) // 2, len(full) - 1}):
+        print(f"{i:>10} {full[i]:>12,} {delta[i]:>12,}")
+    print(f"{'total':>10} {sum(full):>12,} {sum(delta):>12,}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        variants = {
+            "memory/full": BoundedMemorySaver(ttl_seconds=None),
+            "memory/delta": DeltaCheckpointSaver(BoundedMemorySaver(ttl_seconds=None)),
+            "sqlite/full": SqliteCheckpointSaver(os.path.join(directory, "full.sqlite")),
+            "sqlite/delta": DeltaCheckpointSaver(SqliteCheckpointSaver(os.path.join(directory, "delta.sqlite"))),
+        }
+        print("\nrestore time in ms (median, cold) by checkpoint index")
+        for name, saver in variants.items():
+            timings = measure_restore(saver, args.steps, args.tool_payload, args.repeats)
+            print(f"{name:<13} " + "  ".join(f"#{i}: {ms:.3f}" for i, ms in timings.items()))
+        for name in ("full", "delta"):
+            saver = variants[f"sqlite/{name}"]
+            (saver.saver if isinstance(saver, DeltaCheckpointSaver) else saver).close()
+            size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.startswith(name))
+            print(f"sqlite/{name} database size: {size / 1e6:.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
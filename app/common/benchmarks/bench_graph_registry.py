@@ -0,0 +1,111 @@
+"""
+Request overhead of compiling graphs per request versus once per process.
+
+For each pattern, times:
+
+- first: the first request served through the GraphRegistry, which imports the
+  pattern module and compiles the graph before serving it;
+- warm: later requests served through the registry, which reuse the compiled graph;
+- per-request compile: requests that call `build_graph()` themselves, as a server
+  without the registry would.
+
+A request here is the graph work that does not involve the LLM: the user message is
+written to a new thread through the checkpointer and the thread's state read back.
+Whatever the LLM adds is the same in every mode.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.bench_graph_registry --requests 200
+    python -m app.common.benchmarks.bench_graph_registry --graphs cot_ls,spotify_ls
+
+No network access is needed. OPENAI_API_KEY (and TAVILY_API_KEY for the *_tool
+patterns) must be set, to any value, for the graphs' clients to be constructed.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import HumanMessage
+from langgraph.constants import START
+
+from app.common.graph_registry import GRAPHS, GraphRegistry, import_pattern
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def request(graph: Any) -> None:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    await graph.aupdate_state(config, {"messages": [HumanMessage(content="benchmark")]}, as_node=START)
+    await graph.aget_state(config)
+
+
+async def bench(name: str, requests: int) -> Dict[str, Any]:
+    registry = GraphRegistry({name: GRAPHS[name]})
+
+    start = time.perf_counter()
+    await request(registry.get(name))
+    first = time.perf_counter() - start
+
+    warm: List[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await request(registry.get(name))
+        warm.append(time.perf_counter() - start)
+
+    # The module is imported by now, so this only measures compiling
+    build_graph = getattr(import_pattern(GRAPHS[name]), GRAPHS[name].factory)
+    per_request: List[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await request(build_graph())
+        per_request.append(time.perf_counter() - start)
+
+    return {
+        "graph": name,
+        "first_ms": first * 1000,
+        "warm_p50_ms": percentile(warm, 50) * 1000,
+        "warm_p95_ms": percentile(warm, 95) * 1000,
+        "compile_p50_ms": percentile(per_request, 50) * 1000,
+        "compile_p95_ms": percentile(per_request, 95) * 1000,
+        "speedup": statistics.median(per_request) / statistics.median(warm),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = (f"{'graph':<26}{'first ms':>10}{'warm p50':>10}{'warm p95':>10}"
+              f"{'compile p50':>13}{'compile p95':>13}{'speedup':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['graph']:<26}{r['first_ms']:>10.1f}{r['warm_p50_ms']:>10.2f}{r['warm_p95_ms']:>10.2f}"
+              f"{r['compile_p50_ms']:>13.2f}{r['compile_p95_ms']:>13.2f}{r['speedup']:>8.1f}x")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    names = args.graphs.split(",") if args.graphs else sorted(GRAPHS)
+    results = []
+    for name in names:
+        try:
+            results.append(await bench(name, args.requests))
+        except Exception as e:
+            print(f"{name}: skipped, {e!r}")
+    print_report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request graph compilation against the registry")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--graphs", default="", help="Comma separated graph names, all by default")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
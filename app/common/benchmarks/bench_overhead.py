@@ -0,0 +1,255 @@
+"""
+Framework overhead of each pattern graph, with the LLM and the search tool faked.
+
+Every graph is run end to end with the deterministic models of `fakes.py` injected, so
+the numbers reflect LangGraph, the checkpointer, the prompts and the nodes' own code.
+For each pattern the report gives:
+
+- per-superstep overhead: run time minus the time spent in the fakes, divided by the
+  supersteps of the run (one checkpoint is written per superstep);
+- checkpoint cost: time spent in `aput`/`aput_writes` per superstep, and the mean
+  serialized size of a checkpoint;
+- memory growth: memory still allocated after `--runs` runs, per run and per superstep,
+  measured with tracemalloc. Completed threads stay in the checkpointer, so this
+  includes the checkpoints kept for them;
+- throughput: completed runs per second with 1, 10 and 100 threads running at once.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.bench_overhead
+    python -m app.common.benchmarks.bench_overhead --graphs cot,spotify_ls --llm-latency-ms 20
+    python -m app.common.benchmarks.bench_overhead --json overhead.jsonl
+
+No network access is needed. spotify_ls runs its Spotify tools against the local
+Spotify stand-in, whose time is counted as overhead; its plan cache is disabled so
+every run plans.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import HumanMessage
+
+from app.common.benchmarks.fakes import FakeChatModel, FakeStats, fake_search_tool, inject_fakes
+from app.common.benchmarks.import_profile import git_revision
+from app.common.graph_registry import GRAPHS, PATTERNS_DIR, import_pattern
+
+DEFAULT_GRAPHS = ["cot", "cot_ls", "reflection", "reflection_react", "reflection_react_tool", "plan_execute",
+                  "spotify_ls"]
+DEFAULT_CONCURRENCY = [1, 10, 100]
+PROMPT = "Write a short summary of the history of the bicycle."
+
+
+class CheckpointTimer:
+    """
+    Times the checkpoint writes of a compiled graph and records the size of each checkpoint.
+    """
+
+    def __init__(self, checkpointer: Any):
+        self.checkpointer = checkpointer
+        self.puts = 0
+        self.seconds = 0.0
+        self.bytes: List[int] = []
+        self._aput = checkpointer.aput
+        self._aput_writes = checkpointer.aput_writes
+        checkpointer.aput = self.aput
+        checkpointer.aput_writes = self.aput_writes
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        start = time.perf_counter()
+        result = await self._aput(config, checkpoint, metadata, new_versions)
+        self.seconds += time.perf_counter() - start
+        self.puts += 1
+        # Sized outside the timed section, so measuring does not add to the cost
+        self.bytes.append(len(self.checkpointer.serde.dumps_typed(checkpoint)[1]))
+        return result
+
+    async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+        start = time.perf_counter()
+        result = await self._aput_writes(config, writes, task_id, *args, **kwargs)
+        self.seconds += time.perf_counter() - start
+        return result
+
+    def reset(self) -> None:
+        self.puts = 0
+        self.seconds = 0.0
+        self.bytes.clear()
+
+
+def start_spotify_standin() -> Any:
+    # The stand-in lives with the spotify_ls utilities, which are not a package
+    sys.path.insert(0, os.path.join(PATTERNS_DIR, "spotify_ls", "utils"))
+    try:
+        from spotify_standin import StandinConfig, start_standin
+    finally:
+        sys.path.pop(0)
+    server = start_standin(StandinConfig())
+    os.environ["SPOTIFY_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("SPOTIFY_USER_ID", "standin-user")
+    return server
+
+
+def build(name: str, llm: FakeChatModel, stats: FakeStats, tool_latency: float) -> Any:
+    spec = GRAPHS[name]
+    module = import_pattern(spec)
+    # Pattern modules configure logging at INFO on import; only the report is wanted
+    logging.getLogger().setLevel(logging.WARNING)
+    inject_fakes(module, llm, fake_search_tool(stats, tool_latency))
+    return getattr(module, spec.factory)()
+
+
+async def run_once(graph: Any) -> None:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 100}
+    await graph.ainvoke({"messages": [HumanMessage(content=PROMPT)]}, config)
+
+
+async def measure_overhead(graph: Any, timer: CheckpointTimer, stats: FakeStats, runs: int) -> Dict[str, Any]:
+    overhead: List[float] = []
+    supersteps: List[int] = []
+    checkpoint_ms: List[float] = []
+    checkpoint_bytes: List[int] = []
+    for _ in range(runs):
+        stats.reset()
+        timer.reset()
+        start = time.perf_counter()
+        await run_once(graph)
+        elapsed = time.perf_counter() - start
+        steps = max(timer.puts, 1)
+        overhead.append((elapsed - stats.seconds) / steps)
+        supersteps.append(steps)
+        checkpoint_ms.append(timer.seconds / steps * 1000)
+        checkpoint_bytes.extend(timer.bytes)
+    return {
+        "supersteps": statistics.median(supersteps),
+        "llm_calls": stats.llm_calls,
+        "tool_calls": stats.tool_calls,
+        "step_overhead_ms": statistics.median(overhead) * 1000,
+        "checkpoint_ms": statistics.median(checkpoint_ms),
+        "checkpoint_kb": statistics.fmean(checkpoint_bytes) / 1024 if checkpoint_bytes else 0.0,
+    }
+
+
+async def measure_memory(graph: Any, timer: CheckpointTimer, runs: int) -> Dict[str, Any]:
+    timer.reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(runs):
+            await run_once(graph)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    growth = after - before
+    return {
+        "kb_per_run": growth / runs / 1024,
+        "bytes_per_superstep": growth / max(timer.puts, 1),
+    }
+
+
+async def measure_throughput(graph: Any, concurrency: int, runs: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded() -> None:
+        async with semaphore:
+            await run_once(graph)
+
+    total = max(runs, concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def bench(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    stats = FakeStats()
+    llm = FakeChatModel(latency=args.llm_latency_ms / 1000, tool_rounds=args.tool_rounds).with_stats(stats)
+    graph = build(name, llm, stats, args.llm_latency_ms / 1000)
+    timer = CheckpointTimer(graph.checkpointer)
+
+    # Warm-up, so lazy imports and first-use caches are not measured
+    await run_once(graph)
+
+    result = {"graph": name}
+    result.update(await measure_overhead(graph, timer, stats, args.runs))
+    result.update(await measure_memory(graph, timer, args.runs))
+    result["throughput"] = {
+        str(c): await measure_throughput(graph, c, args.runs) for c in args.concurrency
+    }
+    return result
+
+
+def print_report(results: List[Dict[str, Any]], concurrency: List[int]) -> None:
+    header = (f"{'graph':<24}{'steps':>6}{'step ms':>9}{'ckpt ms':>9}{'ckpt KB':>9}"
+              f"{'KB/run':>9}{'B/step':>9}" + "".join(f"{f'runs/s@{c}':>12}" for c in concurrency))
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['graph']:<24}{r['supersteps']:>6.0f}{r['step_overhead_ms']:>9.2f}{r['checkpoint_ms']:>9.3f}"
+              f"{r['checkpoint_kb']:>9.1f}{r['kb_per_run']:>9.1f}{r['bytes_per_superstep']:>9.0f}"
+              + "".join(f"{r['throughput'][str(c)]:>12.1f}" for c in concurrency))
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    names = args.graphs.split(",") if args.graphs else DEFAULT_GRAPHS
+    server = start_spotify_standin() if "spotify_ls" in names else None
+    results = []
+    try:
+        for name in names:
+            try:
+                results.append(await bench(name, args))
+            except Exception as e:
+                print(f"{name}: skipped, {e!r}")
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the framework overhead of each graph with fake models")
+    parser.add_argument("--graphs", default="", help="Comma separated graph names, the main patterns by default")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per measurement")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="Latency of each fake LLM and search call")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="Tool calling answers per conversation")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Comma separated numbers of concurrent threads")
+    parser.add_argument("--json", default="", help="JSON Lines file the results are appended to")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    # The graphs' clients are faked, but some modules still read the keys
+    os.environ.setdefault("OPENAI_API_KEY", "bench-overhead")
+    os.environ.setdefault("TAVILY_API_KEY", "bench-overhead")
+    os.environ["PLAN_CACHE_SIZE"] = "0"
+    os.environ["COT_PROMPT_CACHE_SIZE"] = "0"
+
+    results = asyncio.run(main_async(args))
+    print_report(results, args.concurrency)
+
+    if args.json:
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "llm_latency_ms": args.llm_latency_ms,
+            "results": results,
+        }
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
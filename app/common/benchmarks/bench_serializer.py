@@ -0,0 +1,130 @@
+"""
+Checkpoint serializer throughput benchmark.
+
+Serializes a state shaped like a spotify_ls session (a Plan with substeps, playlists,
+tracks, artist sets and URI maps, and a message history with tool calls and large
+tool results) with langgraph's default serializer and with FastSerializer, and
+reports size, throughput and whether the value round-trips exactly.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.bench_serializer --messages 40 --tracks 300
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.common.serializer import FastSerializer, zstandard
+
+SPOTIFY_LS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "routes", "patterns", "spotify_ls"
+)
+for path in reversed([SPOTIFY_LS_DIR, os.path.join(SPOTIFY_LS_DIR, "models")]):
+    sys.path.insert(0, path)
+
+from plan import Plan, Step, SubStep  # type: ignore  # noqa: E402
+from spotify_model import Playlist, Track  # type: ignore  # noqa: E402
+
+
+def build_state(messages: int, tracks: int) -> Dict[str, Any]:
+    steps = [
+        Step(
+            step_number=i,
+            name=f"step-{i}",
+            type="parallel" if i % 3 == 0 else "action",
+            description=f"Description of step {i} with enough words to look like a real plan step.",
+            success_criteria=f"Step {i} produced its expected output.",
+            tool="get_artists_from_playlist",
+            action="Call the tool with the playlist URI.",
+            substeps=[
+                SubStep(step_number=j, name=f"sub-{i}-{j}", type="action", description="Sub step",
+                        success_criteria="Done", tool="find_top_tracks")
+                for j in range(3)
+            ] if i % 3 == 0 else None,
+        )
+        for i in range(8)
+    ]
+    track_list = [
+        Track(id=f"{i:022d}", uri=f"spotify:track:{i:022d}", name=f"Track {i}", artists=[f"Artist {i % 50}"],
+              album=f"Album {i % 20}", duration_ms=200000 + i, explicit=bool(i % 2), popularity=i % 100)
+        for i in range(tracks)
+    ]
+    uris = [track.uri for track in track_list]
+    history: List[Any] = [SystemMessage("You are a playlist assistant."), HumanMessage("Build me a playlist")]
+    for i in range(messages // 2):
+        history.append(AIMessage(
+            content="",
+            tool_calls=[{"id": f"call_{i}", "name": "find_top_tracks", "args": {"artists": uris[:10]}}],
+            response_metadata={"token_usage": {"prompt_tokens": 1500 + i, "completion_tokens": 40},
+                               "model_name": "gpt-4o", "finish_reason": "tool_calls"},
+        ))
+        history.append(ToolMessage(content=json.dumps(uris[: 50 + i]), tool_call_id=f"call_{i}"))
+    return {
+        "plan": Plan(steps=steps, reasoning="Reasoning " * 50, validated=True),
+        "playlists": [Playlist(uri=f"spotify:playlist:{i}", name=f"Playlist {i}") for i in range(20)],
+        "new_playlist": Playlist(uri="spotify:playlist:new", name="New playlist"),
+        "tracks": track_list,
+        "new_tracks": track_list[: tracks // 2],
+        "valid_artists": {f"spotify:artist:{i}" for i in range(300)},
+        "candidate_artists": {f"spotify:artist:{i}" for i in range(150, 450)},
+        "artists_uri": {f"spotify:artist:{i}": f"Artist {i}" for i in range(300)},
+        "artists_name": {f"Artist {i}": f"spotify:artist:{i}" for i in range(300)},
+        "messages": history,
+        "spotify_prompt": "Prompt " * 100,
+        "rounds": 3,
+    }
+
+
+def timed(fn: Callable[[], Any], min_seconds: float) -> Tuple[float, Any]:
+    count, result = 0, None
+    start = time.perf_counter()
+    while True:
+        result = fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / count, result
+
+
+def same(a: Any, b: Any) -> bool:
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint serializers")
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--tracks", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=1.0, help="Minimum time per measurement")
+    args = parser.parse_args()
+
+    state = build_state(args.messages, args.tracks)
+    serializers = {"default": JsonPlusSerializer(), "fast": FastSerializer(compression=None),
+                   "fast+zlib": FastSerializer(compression="zlib")}
+    if zstandard is not None:
+        serializers["fast+zstd"] = FastSerializer(compression="zstd")
+
+    print(f"{'serializer':<11} {'size':>10} {'dumps ms':>9} {'loads ms':>9} {'dumps MB/s':>11} "
+          f"{'loads MB/s':>11} exact")
+    for name, serde in serializers.items():
+        dumps_s, typed = timed(lambda: serde.dumps_typed(state), args.seconds)
+        loads_s, restored = timed(lambda: serde.loads_typed(typed), args.seconds)
+        raw_mb = len(serializers["fast"].dumps_typed(state)[1]) / 1e6
+        print(f"{name:<11} {len(typed[1]):>10,} {dumps_s * 1000:>9.3f} {loads_s * 1000:>9.3f} "
+              f"{raw_mb / dumps_s:>11.1f} {raw_mb / loads_s:>11.1f} {same(state, restored)}")
+
+
+if __name__ == "__main__":
+    main()
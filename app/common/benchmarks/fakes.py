@@ -0,0 +1,249 @@
+"""
+Deterministic stand-ins for the chat models and search tools used by the pattern graphs.
+
+They let the benchmarks run every graph end to end without network access, so what is
+measured is the framework's own overhead. `inject_fakes` swaps them into an imported
+pattern module, through the names its nodes look up at call time (`ChatOpenAI`,
+`get_tavily_tool`).
+"""
+
+import asyncio
+import threading
+import time
+import types
+from typing import Any, Dict, List, Optional, Sequence, Union, get_args, get_origin
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool, tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, PrivateAttr
+
+# Items in each list of a fake structured output
+FAKE_LIST_ITEMS = 3
+MAX_MODEL_DEPTH = 4
+
+
+class FakeStats:
+    """
+    Thread safe count and duration of the fake LLM and tool calls.
+    """
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            if kind == "llm":
+                self.llm_calls += 1
+            else:
+                self.tool_calls += 1
+            self.seconds += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.llm_calls = self.tool_calls = 0
+            self.seconds = 0.0
+
+
+def fake_value(annotation: Any, depth: int = 0) -> Any:
+    """
+    Returns a placeholder value of the given type, recursing into pydantic models.
+    """
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if annotation is str:
+        return "fake"
+    if annotation is bool:
+        return True
+    if annotation is int:
+        return 1
+    if annotation is float:
+        return 1.0
+    if origin is Union:
+        options = [a for a in args if a is not type(None)]
+        # Leave optional nested models out, as a model would for a plain answer
+        if len(options) < len(args) and depth >= 1:
+            return None
+        return fake_value(options[0], depth) if options else None
+    if origin in (list, set, tuple, Sequence):
+        item = args[0] if args else str
+        return [fake_value(item, depth) for _ in range(FAKE_LIST_ITEMS)] if depth < MAX_MODEL_DEPTH else []
+    if origin is dict:
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_model(annotation, depth + 1)
+    if args:
+        # Literal and friends
+        return args[0]
+    return None
+
+
+def fake_model(schema: type, depth: int = 0) -> BaseModel:
+    values = {name: fake_value(field.annotation, depth) for name, field in schema.model_fields.items()}
+    return schema.model_validate(values)
+
+
+def fake_usage(messages: List[BaseMessage], answer: str) -> Dict[str, int]:
+    """
+    Token usage of a call, estimated at four characters per token.
+    """
+    input_tokens = sum(len(str(m.content)) for m in messages) // 4
+    output_tokens = len(answer) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def fake_args(tool_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds arguments for a tool call from the tool's OpenAI JSON schema.
+    """
+    parameters = tool_schema.get("function", {}).get("parameters", {})
+    samples = {"string": "fake", "integer": 1, "number": 1.0, "boolean": True, "array": ["fake"], "object": {}}
+    return {
+        name: samples.get(spec.get("type"), "fake")
+        for name, spec in parameters.get("properties", {}).items()
+        if name in parameters.get("required", [])
+    }
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model answering instantly (or after `latency`) with deterministic messages.
+
+    With tools bound, the first `tool_rounds` answers of a conversation call the first
+    bound tool; later answers are plain text. Structured output returns a valid
+    instance of the schema filled with placeholder values.
+
+    Attributes:
+        latency (float): Seconds each call sleeps, to model the LLM's latency.
+        tool_rounds (int): Answers per conversation that call a tool.
+    """
+
+    latency: float = 0.0
+    tool_rounds: int = 1
+    _stats: FakeStats = PrivateAttr(default_factory=FakeStats)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def with_stats(self, stats: FakeStats) -> "FakeChatModel":
+        self._stats = stats
+        return self
+
+    def _answer(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        tool_answers = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+        if tools and tool_answers < self.tool_rounds:
+            call = {
+                "name": tools[0]["function"]["name"],
+                "args": fake_args(tools[0]),
+                "id": f"call_fake_{tool_answers}_{len(messages)}",
+            }
+            return AIMessage(content="", tool_calls=[call], usage_metadata=fake_usage(messages, ""))
+        content = f"Fake answer after {len(messages)} messages."
+        return AIMessage(content=content, usage_metadata=fake_usage(messages, content))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._answer(messages, kwargs.get("tools"))
+        self._stats.record("llm", time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._answer(messages, kwargs.get("tools"))
+        self._stats.record("llm", time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any) -> Any:
+        def answer() -> Any:
+            parsed = fake_model(schema)
+            if include_raw:
+                return {"raw": AIMessage(content=parsed.model_dump_json()), "parsed": parsed, "parsing_error": None}
+            return parsed
+
+        def invoke(_: Any) -> Any:
+            start = time.perf_counter()
+            if self.latency:
+                time.sleep(self.latency)
+            result = answer()
+            self._stats.record("llm", time.perf_counter() - start)
+            return result
+
+        async def ainvoke(_: Any) -> Any:
+            start = time.perf_counter()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            result = answer()
+            self._stats.record("llm", time.perf_counter() - start)
+            return result
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def fake_search_tool(stats: FakeStats, latency: float = 0.0) -> BaseTool:
+    """
+    Returns a tool with the name and arguments of TavilySearchResults, answering with fixed results.
+    """
+
+    @tool("tavily_search_results_json")
+    async def search(query: str) -> List[Dict[str, str]]:
+        """A search engine. Input should be a search query."""
+        start = time.perf_counter()
+        if latency:
+            await asyncio.sleep(latency)
+        stats.record("tool", time.perf_counter() - start)
+        return [{"url": f"https://example.com/{i}", "content": f"Result {i} for {query}"} for i in range(2)]
+
+    return search
+
+
+def _namespaces(module: types.ModuleType) -> List[Dict[str, Any]]:
+    # The module itself, plus the modules of the functions it imported by name
+    # (e.g. spotify_ls' search tools), which are no longer in sys.modules
+    namespaces = {id(vars(module)): vars(module)}
+    for value in list(vars(module).values()):
+        namespace = getattr(value, "__globals__", None)
+        if namespace is None:
+            namespace = getattr(getattr(value, "func", None), "__globals__", None)
+        if isinstance(namespace, dict):
+            namespaces.setdefault(id(namespace), namespace)
+    return list(namespaces.values())
+
+
+def inject_fakes(module: types.ModuleType, llm: FakeChatModel, search: BaseTool) -> int:
+    """
+    Points a pattern module's `ChatOpenAI` and Tavily search tool at the fakes.
+
+    Must run before `build_graph()`, which creates the tool nodes.
+
+    Returns:
+        int: Number of names replaced.
+    """
+    replaced = 0
+    for namespace in _namespaces(module):
+        if "ChatOpenAI" in namespace:
+            namespace["ChatOpenAI"] = lambda *args, **kwargs: llm
+            replaced += 1
+        if "TavilySearchResults" in namespace:
+            namespace["TavilySearchResults"] = lambda *args, **kwargs: search
+            replaced += 1
+        if "get_tavily_tool" in namespace:
+            namespace["get_tavily_tool"] = lambda *args, **kwargs: search
+            replaced += 1
+    return replaced
@@ -0,0 +1,138 @@
+"""
+Import-time report of the pattern graph modules.
+
+Each pattern module is imported in a fresh interpreter, as on a cold start, after the
+registry itself is loaded. The report gives the median import time over `--runs`
+and the modules that took the longest to import with it. Their times come from
+`python -X importtime` and include the modules they import in turn.
+
+Run from the repository root:
+
+    python -m app.common.benchmarks.import_profile
+    python -m app.common.benchmarks.import_profile --json import_times.jsonl --budget-ms 400
+
+`--json` appends one record per run to a JSON Lines file, so import times can be
+tracked over time. `--budget-ms` exits with status 1 when a module's median exceeds it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.common.graph_registry import GRAPHS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+MARKER = "--- pattern import ---"
+
+SCRIPT = f"""
+import json, sys, time
+from app.common.graph_registry import GRAPHS, import_pattern
+print({MARKER!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+import_pattern(GRAPHS[sys.argv[1]])
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, float]]:
+    """
+    Returns (module, cumulative ms) of the outermost imports logged after the marker.
+    """
+    _, _, after = stderr.partition(MARKER)
+    modules = []
+    for line in after.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented below the import that caused them
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        modules.append((name.strip(), int(cumulative) / 1000))
+    return modules
+
+
+def profile(name: str, runs: int, top: int) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    # Clients are no longer created at import time, but keep imports from failing on
+    # modules that still validate keys eagerly
+    env.setdefault("OPENAI_API_KEY", "import-profile")
+    env.setdefault("TAVILY_API_KEY", "import-profile")
+    samples: List[float] = []
+    modules: List[Tuple[str, float]] = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT, name],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1])["ms"])
+        modules = parse_importtime(result.stderr)
+    return {
+        "graph": name,
+        "module": GRAPHS[name].import_path,
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+        "heaviest": sorted(modules, key=lambda m: m[1], reverse=True)[:top],
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'graph':<26}{'median ms':>10}{'max ms':>9}  heaviest imports (cumulative ms)"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        heaviest = ", ".join(f"{module} {ms:.0f}" for module, ms in r["heaviest"])
+        print(f"{r['graph']:<26}{r['median_ms']:>10.0f}{r['max_ms']:>9.0f}  {heaviest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of each pattern graph module")
+    parser.add_argument("--graphs", default="", help="Comma separated graph names, all by default")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Number of heaviest imports listed per module")
+    parser.add_argument("--json", default="", help="JSON Lines file the results are appended to")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Fail when a median exceeds this")
+    args = parser.parse_args()
+
+    names = args.graphs.split(",") if args.graphs else sorted(GRAPHS)
+    results = []
+    for name in names:
+        try:
+            results.append(profile(name, args.runs, args.top))
+        except RuntimeError as e:
+            print(f"{name}: import failed, {e}")
+    print_report(results)
+
+    if args.json:
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    over = [r for r in results if args.budget_ms and r["median_ms"] > args.budget_ms]
+    for r in over:
+        print(f"{r['graph']}: {r['median_ms']:.0f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.graph.state import CompiledStateGraph
+
+from app.common.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Reasons a run is cancelled, the values of the `reason` label
+DEADLINE = "deadline"
+DISCONNECT = "disconnect"
+CANCELLED = "cancelled"
+
+runs_cancelled = metrics.counter("graph_runs_cancelled_total", "Graph runs cancelled before they finished",
+                                 ("graph", "reason"))
+
+
+class RunCancelled(Exception):
+    """
+    Raised inside a run once its CancelToken is cancelled.
+
+    Attributes:
+        reason (str): Why the run was cancelled.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Run cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Thread safe cancellation flag of one graph run.
+
+    Cancelling the asyncio task of a run stops its coroutines, but not the sync nodes
+    and tools LangGraph runs in worker threads. Those check the token instead, through
+    `check_cancelled` or the CancellationCallbackHandler, and stop at their next check.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = CANCELLED) -> bool:
+        """
+        Cancels the run; only the first reason is kept.
+
+        Returns:
+            bool: Whether this call cancelled it.
+        """
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Raises:
+            RunCancelled: If the token is cancelled.
+        """
+        if self._event.is_set():
+            raise RunCancelled(self.reason or CANCELLED)
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "cancel_token", default=None
+)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def check_cancelled() -> None:
+    """
+    Stops the current run if it was cancelled; a no-op outside a cancellable run.
+
+    Call it in loops making one request per iteration, such as pagination.
+
+    Raises:
+        RunCancelled: If the run's token is cancelled.
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+@contextlib.contextmanager
+def cancel_scope(token: CancelToken) -> Iterator[CancelToken]:
+    """
+    Makes `token` the current token of the code run in the block, and of the tasks and
+    threads it starts with a copy of the context.
+    """
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+class CancellationCallbackHandler(BaseCallbackHandler):
+    """
+    Fails the LLM calls, tool calls and nodes of a run once its token is cancelled.
+
+    Checks are made when a call starts and on each streamed token, so a streamed LLM
+    call stops at its next chunk. A call already waiting on a non-streamed response
+    finishes, but its node then fails at the next check.
+
+    Args:
+        token (CancelToken): Token of the run.
+    """
+
+    run_inline = True
+    # Errors of other handlers are only logged; these have to stop the run
+    raise_error = True
+
+    def __init__(self, token: CancelToken):
+        self.token = token
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, **kwargs: Any) -> None:
+        self.token.check()
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, **kwargs: Any) -> None:
+        self.token.check()
+
+    def on_llm_start(self, serialized: Optional[Dict[str, Any]], prompts: Any, **kwargs: Any) -> None:
+        self.token.check()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.token.check()
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, **kwargs: Any) -> None:
+        self.token.check()
+
+
+def cancellable_config(config: Dict[str, Any], token: CancelToken) -> Dict[str, Any]:
+    """
+    Returns a copy of a run config whose callbacks include a handler checking `token`.
+    """
+    callbacks = config.get("callbacks") or []
+    if not isinstance(callbacks, list):
+        # A callback manager; its handlers are inherited by the run
+        callbacks = list(callbacks.handlers)
+    return {**config, "callbacks": [*callbacks, CancellationCallbackHandler(token)]}
+
+
+def record_cancellation(graph: str, reason: str) -> None:
+    runs_cancelled.inc(graph=graph, reason=reason)
+    logger.info(f"Run of {graph} cancelled: {reason}")
+
+
+async def partial_values(graph: CompiledStateGraph, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    State values of the run's last checkpoint: the work done before it was stopped.
+    """
+    try:
+        return (await graph.aget_state(config)).values
+    except Exception as e:
+        # A graph compiled without a checkpointer keeps no partial state
+        logger.warning(f"No partial state to return: {e!r}")
+        return {}
+
+
+@dataclass
+class RunOutcome:
+    """
+    Result of a run started by `run_with_deadline`.
+
+    Attributes:
+        status (str): "completed", or the reason the run was cancelled.
+        values (Dict[str, Any]): Final state values, or those of the last checkpoint
+            when the run was cancelled.
+    """
+
+    status: str
+    values: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def completed(self) -> bool:
+        return self.status == "completed"
+
+
+@contextlib.asynccontextmanager
+async def cancellable_run(config: Dict[str, Any], *, name: str, deadline: Optional[float] = None,
+                          token: Optional[CancelToken] = None,
+                          cancel_reason: str = CANCELLED) -> AsyncIterator[Tuple[Dict[str, Any], CancelToken]]:
+    """
+    Scope of a cancellable graph run, for callers that stream it.
+
+    Yields the run config to pass to the graph, with the run's token. The block is
+    stopped when its deadline passes or the token is cancelled; both are suppressed,
+    so after the block `token.cancelled` tells whether the run finished. When the task
+    running the block is cancelled, the token is cancelled with `cancel_reason`, so the
+    run's worker threads stop, and CancelledError propagates. Every cancellation is counted.
+
+    Args:
+        config (Dict[str, Any]): Run config.
+        name (str): Graph name, for the cancellation count.
+        deadline (Optional[float]): Seconds the block may take; no limit when None.
+        token (Optional[CancelToken]): Token to cancel the run with; a new one when None.
+        cancel_reason (str): Reason recorded when the task is cancelled.
+    """
+    token = token or CancelToken()
+    try:
+        with cancel_scope(token):
+            async with asyncio.timeout(deadline):
+                yield cancellable_config(config, token), token
+    except TimeoutError:
+        token.cancel(DEADLINE)
+    except RunCancelled:
+        if not token.cancelled:
+            raise
+    except (asyncio.CancelledError, GeneratorExit):
+        # GeneratorExit: a streaming response closed the generator running the block
+        token.cancel(cancel_reason)
+        record_cancellation(name, token.reason)
+        raise
+    else:
+        return
+    record_cancellation(name, token.reason)
+
+
+async def run_with_deadline(graph: CompiledStateGraph, input: Any, config: Dict[str, Any], *, name: str,
+                            deadline: Optional[float] = None, token: Optional[CancelToken] = None,
+                            cancel_reason: str = CANCELLED) -> RunOutcome:
+    """
+    Runs a graph until it finishes, its deadline passes or its token is cancelled.
+
+    A run stopped by its deadline, or by its token, returns the state of its last
+    checkpoint as a partial result. See `cancellable_run` for the cancellation of the
+    calling task.
+
+    Args:
+        graph (CompiledStateGraph): Graph to run.
+        input (Any): Graph input.
+        config (Dict[str, Any]): Run config, with the thread ID the partial state is read from.
+        name (str): Graph name, for the cancellation count.
+        deadline (Optional[float]): Seconds the run may take; no limit when None.
+        token (Optional[CancelToken]): Token to cancel the run with; a new one when None.
+        cancel_reason (str): Reason recorded when the calling task is cancelled.
+
+    Returns:
+        RunOutcome: The final or partial state values.
+    """
+    async with cancellable_run(config, name=name, deadline=deadline, token=token,
+                               cancel_reason=cancel_reason) as (run_config, token):
+        return RunOutcome("completed", await graph.ainvoke(input, run_config))
+    return RunOutcome(token.reason, await partial_values(graph, config))
@@ -0,0 +1,464 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration, read by get_checkpointer()
+CHECKPOINTER_ENV = "CHECKPOINTER"  # "memory" (default) or "sqlite"
+SQLITE_DIR_ENV = "CHECKPOINTER_SQLITE_DIR"
+MAX_THREADS_ENV = "CHECKPOINTER_MAX_THREADS"
+THREAD_TTL_ENV = "CHECKPOINTER_THREAD_TTL_SECONDS"
+BATCH_SIZE_ENV = "CHECKPOINTER_BATCH_SIZE"
+FLUSH_INTERVAL_ENV = "CHECKPOINTER_FLUSH_INTERVAL_SECONDS"
+SERDE_ENV = "CHECKPOINTER_SERDE"  # "default" or "fast"
+COMPRESS_THRESHOLD_ENV = "CHECKPOINTER_COMPRESS_THRESHOLD"
+DELTA_MESSAGES_ENV = "CHECKPOINTER_DELTA_MESSAGES"  # "1" stores the messages channel as deltas
+
+DEFAULT_SQLITE_DIR = "checkpoints"
+DEFAULT_MAX_THREADS = 1000
+DEFAULT_THREAD_TTL_SECONDS = 3600.0
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.05
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver that evicts whole threads by LRU order and idle time.
+
+    The stock MemorySaver keeps every checkpoint of every thread forever. This variant
+    tracks when each thread was last read or written and drops the least recently used
+    threads once `max_threads` is exceeded, as well as threads idle for more than
+    `ttl_seconds`.
+
+    Attributes:
+        max_threads (int): Maximum number of threads kept in memory.
+        ttl_seconds (Optional[float]): Idle time after which a thread is dropped. None disables it.
+    """
+
+    def __init__(self, *, max_threads: int = DEFAULT_MAX_THREADS,
+                 ttl_seconds: Optional[float] = DEFAULT_THREAD_TTL_SECONDS,
+                 serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._access_lock = threading.Lock()
+        self.evicted_threads = 0
+        # Called with the thread id of every evicted thread, e.g. to drop side storage
+        self.eviction_listeners: List[Callable[[str], None]] = []
+
+    def _touch(self, config: RunnableConfig) -> None:
+        thread_id = config.get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return
+        thread_id = str(thread_id)
+        now = time.monotonic()
+        with self._access_lock:
+            self._last_access.pop(thread_id, None)
+            self._last_access[thread_id] = now
+            expired = []
+            for candidate, last_access in self._last_access.items():
+                too_many = len(self._last_access) - len(expired) > self.max_threads
+                too_old = self.ttl_seconds is not None and now - last_access > self.ttl_seconds
+                if candidate == thread_id or not (too_many or too_old):
+                    break
+                expired.append(candidate)
+            for candidate in expired:
+                del self._last_access[candidate]
+        for candidate in expired:
+            self._drop_thread(candidate)
+
+    def _drop_thread(self, thread_id: str) -> None:
+        # Derive the writes/blobs keys from the thread's own checkpoints instead of
+        # scanning every key in memory, so eviction cost does not grow with the
+        # number of threads.
+        blobs = getattr(self, "blobs", None)
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id, (checkpoint, _, _) in checkpoints.items():
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                if blobs is not None:
+                    versions = self.serde.loads_typed(checkpoint).get("channel_versions", {})
+                    for channel, version in versions.items():
+                        blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        self.evicted_threads += 1
+        for listener in self.eviction_listeners:
+            listener(thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self._touch(config)
+        return super().get_tuple(config)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        self._touch(config)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   *args: Any) -> None:
+        self._touch(config)
+        return super().put_writes(config, writes, task_id, *args)
+
+    def thread_count(self) -> int:
+        return len(self._last_access)
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Durable checkpoint saver backed by a single SQLite database file.
+
+    The database runs in WAL mode with `synchronous=NORMAL`, so readers never block the
+    writer and commits do not fsync the main database file. Writes go to a shared
+    connection immediately, which keeps reads consistent, but commits are grouped:
+    a commit happens every `batch_size` statements or `flush_interval` seconds,
+    whichever comes first. A crash can lose at most one flush interval of checkpoints.
+
+    The async methods run the blocking SQLite calls in a worker thread so the event
+    loop is never blocked by disk I/O.
+
+    Args:
+        path (str): Database file path. ":memory:" keeps everything in memory.
+        batch_size (int): Number of pending statements that triggers a commit.
+        flush_interval (float): Maximum seconds a statement waits before being committed.
+        serde (Optional[SerializerProtocol]): Serializer for checkpoints and writes.
+    """
+
+    def __init__(self, path: str, *, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde)
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self._pending = 0
+        self._closed = threading.Event()
+        self._setup()
+        self._flusher = threading.Thread(target=self._flush_loop, name="sqlite-checkpoint-flusher", daemon=True)
+        self._flusher.start()
+
+    def _setup(self) -> None:
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+                """
+            )
+
+    # Batched commits
+
+    def _execute_write(self, query: str, rows: List[Tuple]) -> None:
+        with self.lock:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            self.conn.executemany(query, rows)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._commit()
+
+    def _commit(self) -> None:
+        if self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+        self._pending = 0
+
+    def flush(self) -> None:
+        """
+        Commits every pending write.
+        """
+        with self.lock:
+            self._commit()
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            if self._pending:
+                try:
+                    self.flush()
+                except sqlite3.Error as e:
+                    logger.error(f"Error committing checkpoints: {e}")
+
+    def close(self) -> None:
+        self._closed.set()
+        self._flusher.join()
+        with self.lock:
+            self._commit()
+            self.conn.close()
+
+    # Sync API
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, "
+            "metadata "
+            f"FROM checkpoints {where} ORDER BY checkpoint_id DESC"
+        )
+        results: List[CheckpointTuple] = []
+        # Materialize under the lock rather than holding it across yields
+        with self.lock:
+            for thread_id, checkpoint_ns, *row in self.conn.execute(query, params).fetchall():
+                result = self._to_tuple(thread_id, checkpoint_ns, tuple(row))
+                if filter and not all(result.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(result)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(metadata)
+        self._execute_write(
+            "INSERT OR REPLACE INTO checkpoints "
+            "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, "
+            "metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                serialized_checkpoint,
+                metadata_type,
+                serialized_metadata,
+            )],
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   *args: Any) -> None:
+        # Special channels (errors, interrupts) overwrite; regular writes are idempotent
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        self._execute_write(
+            f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    str(config["configurable"]["thread_id"]),
+                    config["configurable"].get("checkpoint_ns", ""),
+                    str(config["configurable"]["checkpoint_id"]),
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    *self.serde.dumps_typed(value),
+                )
+                for idx, (channel, value) in enumerate(writes)
+            ],
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._execute_write("DELETE FROM checkpoints WHERE thread_id = ?", [(str(thread_id),)])
+        self._execute_write("DELETE FROM writes WHERE thread_id = ?", [(str(thread_id),)])
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: zero padded counter plus a random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Async API
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None
+                    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for result in results:
+            yield result
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          *args: Any) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, *args)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def get_checkpointer(name: str) -> BaseCheckpointSaver:
+    """
+    Builds the checkpointer selected by the environment for the graph `name`.
+
+    Environment:
+        CHECKPOINTER: "memory" (default) for a BoundedMemorySaver, "sqlite" for a
+            SqliteCheckpointSaver stored in `$CHECKPOINTER_SQLITE_DIR/<name>.sqlite`.
+        CHECKPOINTER_MAX_THREADS / CHECKPOINTER_THREAD_TTL_SECONDS: eviction limits of
+            the memory checkpointer.
+        CHECKPOINTER_BATCH_SIZE / CHECKPOINTER_FLUSH_INTERVAL_SECONDS: commit batching
+            of the SQLite checkpointer.
+        CHECKPOINTER_SERDE: "fast" serializes checkpoints with FastSerializer;
+            CHECKPOINTER_COMPRESS_THRESHOLD sets its compression threshold in bytes.
+        CHECKPOINTER_DELTA_MESSAGES: "1" wraps either checkpointer in a
+            DeltaCheckpointSaver, which stores only the messages added per step.
+
+    Args:
+        name (str): Name of the graph. Each graph gets its own SQLite file, so thread
+            IDs never clash across patterns.
+
+    Returns:
+        BaseCheckpointSaver: The checkpointer to compile the graph with.
+    """
+    kind = os.getenv(CHECKPOINTER_ENV, "memory").lower()
+    serde: Optional[SerializerProtocol] = None
+    if os.getenv(SERDE_ENV, "default").lower() == "fast":
+        from app.common.serializer import DEFAULT_COMPRESS_THRESHOLD, FastSerializer
+
+        serde = FastSerializer(
+            compress_threshold=int(os.getenv(COMPRESS_THRESHOLD_ENV, DEFAULT_COMPRESS_THRESHOLD))
+        )
+    saver: BaseCheckpointSaver
+    if kind == "sqlite":
+        directory = os.getenv(SQLITE_DIR_ENV, DEFAULT_SQLITE_DIR)
+        saver = SqliteCheckpointSaver(
+            os.path.join(directory, f"{name}.sqlite"),
+            batch_size=int(os.getenv(BATCH_SIZE_ENV, DEFAULT_BATCH_SIZE)),
+            flush_interval=float(os.getenv(FLUSH_INTERVAL_ENV, DEFAULT_FLUSH_INTERVAL_SECONDS)),
+            serde=serde,
+        )
+    else:
+        if kind != "memory":
+            logger.warning(f"Unknown {CHECKPOINTER_ENV}={kind!r}, using the in-memory checkpointer")
+        ttl = os.getenv(THREAD_TTL_ENV)
+        saver = BoundedMemorySaver(
+            max_threads=int(os.getenv(MAX_THREADS_ENV, DEFAULT_MAX_THREADS)),
+            ttl_seconds=float(ttl) if ttl else DEFAULT_THREAD_TTL_SECONDS,
+            serde=serde,
+        )
+    if os.getenv(DELTA_MESSAGES_ENV, "0") == "1":
+        from app.common.delta_checkpointer import DeltaCheckpointSaver
+
+        saver = DeltaCheckpointSaver(saver)
+    return saver
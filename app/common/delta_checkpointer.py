@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+)
+
+
+MESSAGES_CHANNEL = "messages"
+# Stored in place of the messages list; points to the delta record of a checkpoint
+REF_KEY = "__messages_delta__"
+# A full hash list is written every SNAPSHOT_EVERY steps so a rebuild never walks far
+DEFAULT_SNAPSHOT_EVERY = 32
+LIST_CACHE_SIZE = 1024
+
+Key = Tuple[str, str, str]  # (thread_id, checkpoint_ns, checkpoint_id)
+
+
+def message_hash(serialized: Tuple[str, bytes]) -> str:
+    type_, data = serialized
+    digest = hashlib.blake2b(type_.encode(), digest_size=16)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class MemoryDeltaStore:
+    """
+    In-memory storage for message bodies and per-checkpoint delta records.
+
+    Message bodies are content-addressed and shared by every thread that references
+    them; a body is dropped once no remaining thread references it.
+    """
+
+    def __init__(self):
+        self.bodies: Dict[str, Tuple[str, bytes]] = {}
+        self.records: Dict[Key, Tuple[str, bytes]] = {}
+        self._refs: Dict[str, int] = {}
+        self._thread_hashes: Dict[str, set] = {}
+        self._thread_keys: Dict[str, List[Key]] = {}
+        self._lock = threading.Lock()
+
+    def put_bodies(self, thread_id: str, bodies: Dict[str, Tuple[str, bytes]]) -> None:
+        with self._lock:
+            owned = self._thread_hashes.setdefault(thread_id, set())
+            for digest, body in bodies.items():
+                self.bodies.setdefault(digest, body)
+                if digest not in owned:
+                    owned.add(digest)
+                    self._refs[digest] = self._refs.get(digest, 0) + 1
+
+    def get_bodies(self, digests: Sequence[str]) -> Dict[str, Tuple[str, bytes]]:
+        return {digest: self.bodies[digest] for digest in digests}
+
+    def put_record(self, key: Key, record: Tuple[str, bytes]) -> None:
+        with self._lock:
+            self.records[key] = record
+            self._thread_keys.setdefault(key[0], []).append(key)
+
+    def get_record(self, key: Key) -> Optional[Tuple[str, bytes]]:
+        return self.records.get(key)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in self._thread_keys.pop(thread_id, []):
+                self.records.pop(key, None)
+            for digest in self._thread_hashes.pop(thread_id, set()):
+                self._refs[digest] -= 1
+                if not self._refs[digest]:
+                    del self._refs[digest]
+                    self.bodies.pop(digest, None)
+
+
+class SqliteDeltaStore:
+    """
+    Delta storage kept in the database of a SqliteCheckpointSaver.
+
+    Shares the saver's connection, lock and batched commits, so a checkpoint and its
+    delta record are committed together.
+    """
+
+    def __init__(self, saver: Any):
+        self.saver = saver
+        with saver.lock:
+            saver.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS message_bodies (
+                    hash TEXT PRIMARY KEY,
+                    type TEXT,
+                    value BLOB
+                );
+                CREATE TABLE IF NOT EXISTS message_refs (
+                    thread_id TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (thread_id, hash)
+                );
+                CREATE TABLE IF NOT EXISTS message_deltas (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    type TEXT,
+                    record BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                """
+            )
+
+    def put_bodies(self, thread_id: str, bodies: Dict[str, Tuple[str, bytes]]) -> None:
+        if not bodies:
+            return
+        self.saver._execute_write(
+            "INSERT OR IGNORE INTO message_bodies (hash, type, value) VALUES (?, ?, ?)",
+            [(digest, type_, value) for digest, (type_, value) in bodies.items()],
+        )
+        self.saver._execute_write(
+            "INSERT OR IGNORE INTO message_refs (thread_id, hash) VALUES (?, ?)",
+            [(thread_id, digest) for digest in bodies],
+        )
+
+    def get_bodies(self, digests: Sequence[str]) -> Dict[str, Tuple[str, bytes]]:
+        unique = list(dict.fromkeys(digests))
+        bodies: Dict[str, Tuple[str, bytes]] = {}
+        with self.saver.lock:
+            # Stay under SQLite's default limit on bound parameters
+            for i in range(0, len(unique), 500):
+                chunk = unique[i : i + 500]
+                rows = self.saver.conn.execute(
+                    f"SELECT hash, type, value FROM message_bodies WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                bodies.update({digest: (type_, value) for digest, type_, value in rows})
+        return bodies
+
+    def put_record(self, key: Key, record: Tuple[str, bytes]) -> None:
+        self.saver._execute_write(
+            "INSERT OR REPLACE INTO message_deltas (thread_id, checkpoint_ns, checkpoint_id, type, record) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(*key, *record)],
+        )
+
+    def get_record(self, key: Key) -> Optional[Tuple[str, bytes]]:
+        with self.saver.lock:
+            row = self.saver.conn.execute(
+                "SELECT type, record FROM message_deltas "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver._execute_write("DELETE FROM message_deltas WHERE thread_id = ?", [(thread_id,)])
+        self.saver._execute_write("DELETE FROM message_refs WHERE thread_id = ?", [(thread_id,)])
+        self.saver._execute_write(
+            "DELETE FROM message_bodies WHERE hash NOT IN (SELECT hash FROM message_refs)", [()]
+        )
+
+
+class DeltaCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpoint saver that stores the messages channel as deltas.
+
+    Wraps another saver. On every `put`, the messages list is replaced by a small
+    reference, and only what changed since the parent checkpoint is written: the
+    number of leading messages kept from the parent and the hashes of the messages
+    appended after them. Message bodies are stored once per content hash, so a
+    message shared by many checkpoints (or threads) is written once. Every
+    `snapshot_every` steps the full hash list is recorded so rebuilding a checkpoint
+    never replays a long chain.
+
+    Messages are rebuilt when a checkpoint is read (`get_tuple`, `list` and their
+    async variants, which back `get_state` and `get_state_history`).
+
+    Args:
+        saver (BaseCheckpointSaver): Saver storing everything except message bodies.
+        store (Optional[Any]): MemoryDeltaStore or SqliteDeltaStore. Defaults to a
+            SqliteDeltaStore for a SqliteCheckpointSaver and a MemoryDeltaStore otherwise.
+        snapshot_every (int): Number of steps between full hash lists.
+        channel (str): Name of the channel holding the messages.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, store: Optional[Any] = None, *,
+                 snapshot_every: int = DEFAULT_SNAPSHOT_EVERY, channel: str = MESSAGES_CHANNEL,
+                 serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde or saver.serde)
+        self.saver = saver
+        if store is None:
+            store = SqliteDeltaStore(saver) if hasattr(saver, "_execute_write") else MemoryDeltaStore()
+        self.store = store
+        self.snapshot_every = max(1, snapshot_every)
+        self.channel = channel
+        # Hash lists of recent checkpoints, so a step does not rebuild its parent
+        self._lists: "OrderedDict[Key, Tuple[Tuple[str, ...], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if hasattr(saver, "eviction_listeners"):
+            saver.eviction_listeners.append(self._on_evict)
+
+    def _on_evict(self, thread_id: str) -> None:
+        self.store.delete_thread(thread_id)
+        with self._lock:
+            for key in [key for key in self._lists if key[0] == thread_id]:
+                del self._lists[key]
+
+    def _remember(self, key: Key, hashes: Tuple[str, ...], depth: int) -> None:
+        with self._lock:
+            self._lists[key] = (hashes, depth)
+            self._lists.move_to_end(key)
+            while len(self._lists) > LIST_CACHE_SIZE:
+                self._lists.popitem(last=False)
+
+    def _hash_list(self, key: Key) -> Tuple[Tuple[str, ...], int]:
+        with self._lock:
+            if key in self._lists:
+                self._lists.move_to_end(key)
+                return self._lists[key]
+        # Walk back to the nearest full list, then replay the deltas forward
+        chain = []
+        current: Optional[Key] = key
+        while current is not None:
+            stored = self.store.get_record(current)
+            if stored is None:
+                break
+            record = self.serde.loads_typed(stored)
+            chain.append(record)
+            if record["keep"] == 0:
+                break
+            current = (key[0], key[1], record["parent"]) if record["parent"] else None
+        hashes: List[str] = []
+        for record in reversed(chain):
+            hashes = hashes[: record["keep"]] + record["appended"]
+        result = (tuple(hashes), chain[0]["depth"] if chain else 0)
+        self._remember(key, *result)
+        return result
+
+    def _encode(self, config: RunnableConfig, checkpoint: Checkpoint) -> Checkpoint:
+        values = checkpoint.get("channel_values", {})
+        if self.channel not in values:
+            return checkpoint
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        serialized = [self.serde.dumps_typed(message) for message in values[self.channel]]
+        hashes = tuple(message_hash(s) for s in serialized)
+        if parent_id:
+            parent_hashes, parent_depth = self._hash_list((thread_id, checkpoint_ns, parent_id))
+        else:
+            parent_hashes, parent_depth = (), -1
+        depth = parent_depth + 1
+
+        keep = 0
+        if depth % self.snapshot_every:
+            limit = min(len(parent_hashes), len(hashes))
+            while keep < limit and parent_hashes[keep] == hashes[keep]:
+                keep += 1
+        # The store skips bodies it already holds, but still records that this thread uses them
+        self.store.put_bodies(thread_id, dict(zip(hashes[keep:], serialized[keep:])))
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        record = {"parent": parent_id, "keep": keep, "appended": list(hashes[keep:]), "depth": depth}
+        self.store.put_record(key, self.serde.dumps_typed(record))
+        self._remember(key, hashes, depth)
+        return {**checkpoint, "channel_values": {**values, self.channel: {REF_KEY: checkpoint["id"]}}}
+
+    def _decode(self, checkpoint_tuple: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if checkpoint_tuple is None:
+            return None
+        values = checkpoint_tuple.checkpoint.get("channel_values", {})
+        ref = values.get(self.channel)
+        if not (isinstance(ref, dict) and REF_KEY in ref):
+            return checkpoint_tuple
+        configurable = checkpoint_tuple.config["configurable"]
+        key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""), ref[REF_KEY])
+        hashes, _ = self._hash_list(key)
+        bodies = self.store.get_bodies(hashes)
+        messages = [self.serde.loads_typed(bodies[digest]) for digest in hashes]
+        checkpoint = {**checkpoint_tuple.checkpoint, "channel_values": {**values, self.channel: messages}}
+        return checkpoint_tuple._replace(checkpoint=checkpoint)
+
+    # Sync API
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._decode(self.saver.get_tuple(config))
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        for checkpoint_tuple in self.saver.list(config, filter=filter, before=before, limit=limit):
+            yield self._decode(checkpoint_tuple)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        return self.saver.put(config, self._encode(config, checkpoint), metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   *args: Any) -> None:
+        return self.saver.put_writes(config, writes, task_id, *args)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+        self._on_evict(str(thread_id))
+
+    def get_next_version(self, current: Optional[Any], channel: None) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    # Async API. Encoding and decoding serialize every message and may hit the delta
+    # store, so they run in a worker thread.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self._decode, await self.saver.aget_tuple(config))
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None
+                    ) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield await asyncio.to_thread(self._decode, checkpoint_tuple)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        encoded = await asyncio.to_thread(self._encode, config, checkpoint)
+        return await self.saver.aput(config, encoded, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          *args: Any) -> None:
+        return await self.saver.aput_writes(config, writes, task_id, *args)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.saver.adelete_thread(thread_id)
+        self._on_evict(str(thread_id))
@@ -0,0 +1,202 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langgraph.graph.state import CompiledStateGraph
+
+from app.common.metrics import instrument_graph
+from app.common.tracing import trace_graph
+
+
+logger = logging.getLogger(__name__)
+
+PATTERNS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "routes", "patterns")
+PATTERNS_PACKAGE = "app.routes.patterns"
+
+# Comma separated names of the graphs compiled at startup; all of them by default
+GRAPHS_ENV = "GRAPHS"
+
+
+@dataclass(frozen=True)
+class GraphSpec:
+    """
+    Where a pattern's graph is built.
+
+    Attributes:
+        pattern (str): Directory of the pattern under `app/routes/patterns`.
+        module (str): Module defining the factory, relative to the pattern directory.
+        factory (str): Function returning the compiled graph.
+        dependencies (Tuple[str, ...]): Directories added to `sys.path` while the module
+            is imported, relative to the pattern directory, as in its langgraph.json.
+    """
+
+    pattern: str
+    module: str
+    factory: str = "build_graph"
+    dependencies: Tuple[str, ...] = (".",)
+
+    @property
+    def import_path(self) -> str:
+        return f"{PATTERNS_PACKAGE}.{self.pattern}.{self.module}"
+
+
+GRAPHS: Dict[str, GraphSpec] = {
+    "cot": GraphSpec("cot", "cot"),
+    "cot_ls": GraphSpec("cot_ls", "cot"),
+    "plan_execute": GraphSpec("plan_execute", "plan_execute"),
+    "reflection": GraphSpec("reflection", "reflection"),
+    "reflection_long": GraphSpec("reflection", "reflection", factory="build_long_input_graph"),
+    "reflection_react": GraphSpec("reflection_react", "reflection_react"),
+    "reflection_react_ls": GraphSpec("reflection_react_ls", "reflection_react"),
+    "reflection_react_tool": GraphSpec("reflection_react_tool", "reflection_react_tool"),
+    "reflection_react_tool_ls": GraphSpec("reflection_react_tool_ls", "reflection_react_tool"),
+    "spotify_ls": GraphSpec("spotify_ls", "main", dependencies=(".", "models", "utils")),
+}
+
+
+def _is_flat_pattern_module(name: str, module: object) -> bool:
+    path = getattr(module, "__file__", None)
+    return (
+        path is not None
+        and not name.startswith("app.")
+        and os.path.abspath(path).startswith(PATTERNS_DIR + os.sep)
+    )
+
+
+def import_pattern(spec: GraphSpec) -> object:
+    """
+    Imports the module of a pattern graph.
+
+    Pattern modules import their siblings by bare name (`from prompts import Prompts`),
+    and several patterns have siblings with the same name. Each pattern is therefore
+    imported with its own directories on `sys.path`, and the bare-named modules it
+    loads are taken out of `sys.modules` afterwards, so the next pattern loads its own.
+    The pattern keeps the references it already holds.
+
+    Args:
+        spec (GraphSpec): The graph to import.
+
+    Returns:
+        object: The imported module.
+    """
+    pattern_dir = os.path.join(PATTERNS_DIR, spec.pattern)
+    paths = [os.path.normpath(os.path.join(pattern_dir, d)) for d in spec.dependencies]
+    stashed = {n: m for n, m in list(sys.modules.items()) if _is_flat_pattern_module(n, m)}
+    for name in stashed:
+        del sys.modules[name]
+    sys.path[:0] = paths
+    try:
+        return importlib.import_module(spec.import_path)
+    finally:
+        for path in paths:
+            sys.path.remove(path)
+        for name, module in list(sys.modules.items()):
+            if _is_flat_pattern_module(name, module):
+                del sys.modules[name]
+        sys.modules.update(stashed)
+
+
+class GraphRegistry:
+    """
+    Compiles each pattern graph once per process and hands out the compiled graph.
+
+    A compiled graph holds no per-request state: requests share it, and its
+    checkpointer, and pass their thread in the RunnableConfig of each call. Compiling
+    once also keeps each graph's tool nodes, clients and checkpointer (and with it a
+    SQLite connection) to a single instance. Graphs are instrumented for
+    `app.common.metrics`, and traced when `TRACE_DIR` is set, as they are compiled.
+
+    Args:
+        specs (Optional[Dict[str, GraphSpec]]): Graphs by name. Defaults to `GRAPHS`.
+
+    Attributes:
+        compile_seconds (Dict[str, float]): Import and compile time of each loaded graph.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, GraphSpec]] = None):
+        self.specs = GRAPHS if specs is None else specs
+        self.compile_seconds: Dict[str, float] = {}
+        self._graphs: Dict[str, CompiledStateGraph] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return sorted(self.specs)
+
+    def loaded(self) -> List[str]:
+        return sorted(self._graphs)
+
+    def get(self, name: str) -> CompiledStateGraph:
+        """
+        Returns the compiled graph `name`, compiling it on first use.
+
+        Raises:
+            KeyError: If no graph is registered under `name`.
+        """
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+        spec = self.specs[name]
+        with self._lock:
+            # Another request may have compiled it while this one waited
+            if name not in self._graphs:
+                start = time.perf_counter()
+                module = import_pattern(spec)
+                graph = instrument_graph(getattr(module, spec.factory)(), name)
+                self._graphs[name] = trace_graph(graph, name)
+                self.compile_seconds[name] = time.perf_counter() - start
+                logger.info(f"Compiled graph {name} in {self.compile_seconds[name] * 1000:.0f}ms")
+            return self._graphs[name]
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Compiles the given graphs, all of them by default.
+
+        A graph that fails to compile (e.g. a missing optional dependency) is logged and
+        skipped, so one broken pattern does not keep the server from starting.
+
+        Returns:
+            Dict[str, float]: Compile time in seconds of each graph compiled.
+        """
+        compiled = {}
+        for name in self.names() if names is None else names:
+            try:
+                self.get(name)
+                compiled[name] = self.compile_seconds[name]
+            except Exception as e:
+                logger.error(f"Could not compile graph {name}: {e!r}")
+        return compiled
+
+    def close(self) -> None:
+        """
+        Flushes and closes the checkpointers of the compiled graphs.
+        """
+        with self._lock:
+            for name, graph in self._graphs.items():
+                # A DeltaCheckpointSaver closes through the saver it wraps
+                saver = getattr(graph.checkpointer, "saver", graph.checkpointer)
+                close = getattr(saver, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception as e:
+                        logger.error(f"Could not close the checkpointer of {name}: {e!r}")
+            self._graphs.clear()
+
+
+graph_registry = GraphRegistry()
+
+
+def get_graph_registry() -> GraphRegistry:
+    return graph_registry
+
+
+def graphs_from_env() -> Optional[List[str]]:
+    value = os.getenv(GRAPHS_ENV)
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
@@ -0,0 +1,286 @@
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from app.common.admission import BATCH, DEFAULT_TENANT, AdmissionController
+from app.common.cancellation import CANCELLED, CancelToken, cancellable_run
+from app.common.graph_registry import GraphRegistry, get_graph_registry
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration, read by the server
+WORKERS_ENV = "JOB_WORKERS"
+MAX_QUEUED_ENV = "JOB_MAX_QUEUED"
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_MAX_FINISHED = 1000
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while `max_queued` jobs are already waiting.
+    """
+
+
+@dataclass
+class Job:
+    """
+    A graph run executed in the background.
+
+    Attributes:
+        id (str): Job ID.
+        graph (str): Name of the graph run.
+        thread_id (str): Thread the run checkpoints to; its state outlives the job.
+        message (str): The user message.
+        deadline (Optional[float]): Seconds the run may take; no limit when None.
+        tenant (str): Tenant the run is counted against by admission control.
+        priority (str): Admission priority class of the run.
+        status (str): "queued", "running", "succeeded", "failed" or "cancelled".
+        events (List[Dict[str, Any]]): Progress events, in order; see `JobQueue`.
+        result (Optional[Dict[str, Any]]): Final state values of a succeeded job, or the
+            state of the last checkpoint of a job stopped by its deadline.
+        error (Optional[str]): Why a job failed or was cancelled.
+    """
+
+    id: str
+    graph: str
+    thread_id: str
+    message: str
+    deadline: Optional[float] = None
+    tenant: str = DEFAULT_TENANT
+    priority: str = BATCH.name
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _token: CancelToken = field(default_factory=CancelToken, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "graph": self.graph,
+            "thread_id": self.thread_id,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "deadline_seconds": self.deadline,
+            "events": len(self.events),
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Runs graph jobs on a bounded pool of asyncio workers.
+
+    `submit` returns at once with a queued Job; at most `workers` jobs run at a time and
+    at most `max_queued` wait, beyond which submissions are rejected. Each job records
+    progress events:
+
+    - {"type": "status", "status": ...} when it is queued, starts and finishes;
+    - {"type": "node", "node": ..., "keys": [...]} after each node, with
+      the state keys the node updated.
+
+    Every event carries a sequence number `seq` and a `time`. The run checkpoints to its
+    thread, so its state can also be read through the graph once the job is gone;
+    only the last `max_finished` finished jobs are kept.
+
+    With an admission controller, a worker's job stays queued until admission control
+    lets it run, and fails if it is refused.
+
+    A job is cancelled by `cancel`, or when its deadline passes; a job stopped by its
+    deadline keeps the state of its last checkpoint as its result.
+
+    Args:
+        registry (Optional[GraphRegistry]): Graphs jobs can run. Defaults to the shared registry.
+        workers (int): Jobs run at once.
+        max_queued (int): Jobs waiting to run, beyond which `submit` raises QueueFullError.
+        max_finished (int): Finished jobs kept for their status and result.
+        admission (Optional[AdmissionController]): Admission control of the runs; none when None.
+    """
+
+    def __init__(self, registry: Optional[GraphRegistry] = None, workers: int = DEFAULT_WORKERS,
+                 max_queued: int = DEFAULT_MAX_QUEUED, max_finished: int = DEFAULT_MAX_FINISHED,
+                 admission: Optional[AdmissionController] = None):
+        self.registry = registry or get_graph_registry()
+        self.admission = admission
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Cancels the workers, and with them the jobs they are running.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, graph: str, message: str, thread_id: Optional[str] = None,
+               deadline: Optional[float] = None, tenant: str = DEFAULT_TENANT, priority: str = BATCH.name) -> Job:
+        """
+        Queues a run of `graph` with `message` on `thread_id`, a new thread when None.
+        The run is stopped after `deadline` seconds, when given, and admitted as a run
+        of `tenant` in the `priority` class.
+
+        Raises:
+            KeyError: If no graph is registered under `graph`.
+            ValueError: If there is no priority class `priority`.
+            QueueFullError: If `max_queued` jobs are already waiting.
+            RuntimeError: If the queue was not started.
+        """
+        if graph not in self.registry.specs:
+            raise KeyError(graph)
+        if self.admission is not None and priority not in self.admission.classes:
+            raise ValueError(f"Unknown priority class {priority}")
+        if self._queue is None:
+            raise RuntimeError("The job queue is not started")
+        job = Job(id=str(uuid.uuid4()), graph=graph, thread_id=thread_id or str(uuid.uuid4()), message=message,
+                  deadline=deadline, tenant=tenant, priority=priority)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.max_queued} jobs are already queued")
+        self._jobs[job.id] = job
+        self._record(job, {"type": "status", "status": "queued"})
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancels a queued or running job; a finished job is left as it is.
+
+        Raises:
+            KeyError: If there is no job `job_id`.
+        """
+        job = self._jobs[job_id]
+        if job.finished:
+            return job
+        job._token.cancel(CANCELLED)
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            # Still queued; the worker that takes it skips it
+            self._finish(job, "cancelled", CANCELLED)
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def follow(self, job_id: str, since: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the job's events from sequence number `since`, waiting for new ones until it finishes.
+
+        Raises:
+            KeyError: If there is no job `job_id`.
+        """
+        job = self._jobs[job_id]
+        while True:
+            while since < len(job.events):
+                yield job.events[since]
+                since += 1
+            if job.finished:
+                return
+            job._changed.clear()
+            await job._changed.wait()
+
+    def _record(self, job: Job, event: Dict[str, Any]) -> None:
+        event = {"seq": len(job.events), "time": time.time(), **event}
+        job.events.append(event)
+        job._changed.set()
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._record(job, {"type": "status", "status": status, **({"error": error} if error else {})})
+        finished = [j for j in self._jobs.values() if j.finished]
+        for old in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[old.id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                job._task = asyncio.create_task(self._run(job))
+                await job._task
+            except asyncio.CancelledError:
+                # Only the job was cancelled, the worker goes on
+                if asyncio.current_task().cancelling():
+                    raise
+            finally:
+                self._queue.task_done()
+
+    def _admitted(self, job: Job) -> AsyncContextManager[None]:
+        if self.admission is None:
+            return contextlib.nullcontext()
+        return self.admission.admit(job.tenant, job.priority)
+
+    async def _run(self, job: Job) -> None:
+        config = {"configurable": {"thread_id": job.thread_id}}
+        try:
+            async with self._admitted(job):
+                job.status = "running"
+                job.started_at = time.time()
+                self._record(job, {"type": "status", "status": "running"})
+                graph = self.registry.get(job.graph)
+                async with cancellable_run(config, name=job.graph, deadline=job.deadline,
+                                           token=job._token) as (run_config, token):
+                    async for update in graph.astream({"messages": [HumanMessage(content=job.message)]},
+                                                      run_config, stream_mode="updates"):
+                        for node, values in update.items():
+                            keys = sorted(values) if isinstance(values, dict) else []
+                            self._record(job, {"type": "node", "node": node, "keys": keys})
+                # The final state, or that of the last checkpoint before a cancellation
+                job.result = (await graph.aget_state(config)).values
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled", job._token.reason)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.graph}) failed: {e!r}")
+            self._finish(job, "failed", str(e))
+            return
+        if token.cancelled:
+            self._finish(job, "cancelled", token.reason)
+        else:
+            self._finish(job, "succeeded")
@@ -0,0 +1,57 @@
+import importlib
+import threading
+from typing import Any, List, Optional
+
+
+class LazyImport:
+    """
+    Stands in for a module, or an attribute of one, until it is first used.
+
+    Attribute access, calls and `dir()` import the module on first use and are then
+    forwarded to the real object, so `ChatOpenAI = lazy_import("langchain_openai",
+    "ChatOpenAI")` works like the import it replaces, without paying for it until a
+    node first creates a client. `isinstance` checks and type annotations evaluated at
+    definition time need the real object and should not use a LazyImport.
+
+    Args:
+        module (str): Module to import.
+        attribute (Optional[str]): Attribute of the module to stand in for; the module
+            itself when None.
+    """
+
+    def __init__(self, module: str, attribute: Optional[str] = None):
+        self._module = module
+        self._attribute = attribute
+        self._target: Any = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module)
+                    if self._attribute is not None:
+                        target = getattr(target, self._attribute)
+                    self._target = target
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._load()(*args, **kwargs)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        target = self._module if self._attribute is None else f"{self._module}.{self._attribute}"
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyImport {target} ({state})>"
+
+
+def lazy_import(module: str, attribute: Optional[str] = None) -> Any:
+    """
+    Returns a LazyImport of `module`, or of `module.attribute`.
+    """
+    return LazyImport(module, attribute)
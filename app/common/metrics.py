@@ -0,0 +1,538 @@
+import asyncio
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.graph.state import CompiledStateGraph
+
+from app.common.tool_node import ToolLatencyHistogram, tool_latency
+
+
+logger = logging.getLogger(__name__)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS: Tuple[float, ...] = tuple(1024 * 4 ** i for i in range(8))  # 1KB to 16MB
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class MetricFamily:
+    """
+    One metric as exported: its samples, by label set.
+
+    Attributes:
+        name (str): Metric name.
+        kind (str): "counter", "gauge" or "histogram".
+        help (str): Description.
+        samples (List[Tuple[str, Dict[str, str], float]]): (suffix, labels, value); the
+            suffix is appended to the name, e.g. "_bucket" for histograms.
+    """
+
+    name: str
+    kind: str
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]] = field(default_factory=list)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple((name, str(labels.get(name, ""))) for name in self.label_names)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help, label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [("", dict(key), value) for key, value in self._values.items()]
+        return MetricFamily(self.name, self.kind, self.help, samples)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram per label set, exported as `_bucket`, `_sum` and `_count`.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        family = MetricFamily(self.name, self.kind, self.help)
+        for key, counts, total in items:
+            labels = dict(key)
+            family.samples.extend(_histogram_samples(labels, self.buckets, counts, total))
+        return family
+
+
+def _histogram_samples(labels: Dict[str, str], buckets: Sequence[float], counts: Sequence[int],
+                       total: float) -> List[Tuple[str, Dict[str, str], float]]:
+    samples, cumulative = [], 0
+    for bound, count in zip([*buckets, float("inf")], counts):
+        cumulative += count
+        samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, cumulative))
+    return samples
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    Metrics of the process, rendered in the Prometheus text exposition format.
+
+    Instruments (counters, gauges, histograms) are created once and updated in place.
+    Values owned by other components, such as cache hit counts, are read when the
+    metrics are rendered, through collectors registered with `register_collector` or
+    `register_cache`. Nothing here needs a Prometheus client or server: `render()`
+    returns the text a scrape would get, and `write()` saves it to a file for offline use.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[MetricFamily]]] = {}
+        self._caches: Dict[str, Tuple[Callable[[], Tuple[int, int]], Optional[Callable[[], float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help: str, label_names: Sequence[str], **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, label_names, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, label_names)
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, label_names)
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, label_names, buckets=buckets)
+
+    def register_collector(self, name: str, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """
+        Adds a function called on every render, returning metric families to export.
+
+        Registering again under the same name replaces the earlier collector.
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def register_cache(self, name: str, counts: Callable[[], Tuple[int, int]],
+                       seconds_saved: Optional[Callable[[], float]] = None) -> None:
+        """
+        Exports the hits and misses of a cache, and its hit ratio.
+
+        Args:
+            name (str): Value of the `cache` label.
+            counts (Callable[[], Tuple[int, int]]): Returns (hits, misses) so far.
+            seconds_saved (Optional[Callable[[], float]]): Returns the time the hits saved
+                so far, for caches that skip timed work such as an LLM call.
+        """
+        with self._lock:
+            self._caches[name] = (counts, seconds_saved)
+            self._collectors.setdefault("caches", self._collect_caches)
+
+    def _collect_caches(self) -> List[MetricFamily]:
+        hits = MetricFamily("cache_hits_total", "counter", "Lookups answered from the cache")
+        misses = MetricFamily("cache_misses_total", "counter", "Lookups not answered from the cache")
+        ratio = MetricFamily("cache_hit_ratio", "gauge", "Hits over lookups since the process started")
+        saved = MetricFamily("cache_seconds_saved_total", "counter", "Time the cache hits saved")
+        for name, (counts, seconds_saved) in list(self._caches.items()):
+            hit_count, miss_count = counts()
+            lookups = hit_count + miss_count
+            hits.samples.append(("", {"cache": name}, hit_count))
+            misses.samples.append(("", {"cache": name}, miss_count))
+            ratio.samples.append(("", {"cache": name}, hit_count / lookups if lookups else 0.0))
+            if seconds_saved is not None:
+                saved.samples.append(("", {"cache": name}, seconds_saved()))
+        return [hits, misses, ratio, saved]
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        families = [metric.collect() for metric in metrics]
+        for name, collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e!r}")
+        return families
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape(family.help)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples:
+                label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                name = family.name + suffix
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes `render()` to `path`, replacing it atomically, e.g. for a textfile collector.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+
+metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return metrics
+
+
+# Instruments shared by every graph
+graph_run_seconds = metrics.histogram("graph_run_seconds", "Duration of graph runs", ("graph", "outcome"))
+graph_runs_in_flight = metrics.gauge("graph_runs_in_flight", "Graph runs in progress", ("graph",))
+node_seconds = metrics.histogram("graph_node_seconds", "Duration of graph node runs", ("graph", "node", "outcome"))
+llm_call_seconds = metrics.histogram("llm_call_seconds", "Duration of LLM calls", ("graph", "node", "model", "outcome"))
+llm_tokens = metrics.counter("llm_tokens_total", "Tokens used by LLM calls", ("graph", "model", "type"))
+tool_call_seconds = metrics.histogram("tool_call_seconds", "Duration of tool calls", ("graph", "tool", "outcome"))
+spotify_request_seconds = metrics.histogram("spotify_request_seconds", "Duration of Spotify Web API requests",
+                                            ("method", "endpoint", "status"))
+checkpoint_write_seconds = metrics.histogram("checkpoint_write_seconds", "Duration of checkpoint writes", ("graph",))
+checkpoint_bytes = metrics.histogram("checkpoint_bytes", "Bytes serialized per checkpoint write", ("graph",),
+                                     buckets=SIZE_BUCKETS)
+event_loop_lag_seconds = metrics.histogram("event_loop_lag_seconds", "Delay of event loop callbacks",
+                                           buckets=LAG_BUCKETS)
+
+
+def collect_tool_latency(histogram: ToolLatencyHistogram = tool_latency) -> List[MetricFamily]:
+    """
+    Exports the ConcurrentToolNode latency histograms, converted to seconds.
+    """
+    latency = MetricFamily("tool_node_latency_seconds", "histogram",
+                           "Duration of ConcurrentToolNode calls, including time queued for a slot")
+    outcomes = MetricFamily("tool_node_calls_total", "counter", "ConcurrentToolNode calls by outcome")
+    buckets = [bound / 1000 for bound in histogram.buckets_ms]
+    for tool, data in histogram.snapshot().items():
+        cumulative = list(data["buckets"].values())
+        counts = [b - a for a, b in zip([0, *cumulative], cumulative)]
+        latency.samples.extend(_histogram_samples({"tool": tool}, buckets, counts, data["sum_seconds"]))
+        for outcome, count in data["outcomes"].items():
+            outcomes.samples.append(("", {"tool": tool, "outcome": outcome}, count))
+    return [latency, outcomes]
+
+
+metrics.register_collector("tool_node", collect_tool_latency)
+
+
+@dataclass
+class _Run:
+    kind: str
+    labels: Dict[str, str]
+    start: float
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records the runs, nodes, LLM calls and tool calls of a graph from its callbacks.
+
+    Attached to a compiled graph's config by `instrument_graph`, it sees every run the
+    graph makes, so no node needs code of its own. A chain run whose parent this handler
+    has not seen is the graph run itself; its direct children named after a LangGraph
+    node are the node runs.
+
+    Args:
+        graph (str): Value of the `graph` label.
+    """
+
+    # Updates are a few dictionary operations, cheaper than a hop to a thread pool
+    run_inline = True
+
+    def __init__(self, graph: str):
+        self.graph = graph
+        self._runs: Dict[uuid.UUID, _Run] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: uuid.UUID, kind: str, labels: Dict[str, str]) -> None:
+        with self._lock:
+            self._runs[run_id] = _Run(kind, labels, time.perf_counter())
+
+    def _end(self, run_id: uuid.UUID, outcome: str) -> Optional[_Run]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        seconds = time.perf_counter() - run.start
+        if run.kind == "graph":
+            graph_runs_in_flight.dec(graph=self.graph)
+            graph_run_seconds.observe(seconds, outcome=outcome, **run.labels)
+        elif run.kind == "node":
+            node_seconds.observe(seconds, outcome=outcome, **run.labels)
+        elif run.kind == "llm":
+            llm_call_seconds.observe(seconds, outcome=outcome, **run.labels)
+        elif run.kind == "tool":
+            tool_call_seconds.observe(seconds, outcome=outcome, **run.labels)
+        return run
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: uuid.UUID,
+                       parent_run_id: Optional[uuid.UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id is not None else None
+        if parent is None:
+            graph_runs_in_flight.inc(graph=self.graph)
+            self._start(run_id, "graph", {"graph": self.graph})
+            return
+        node = (metadata or {}).get("langgraph_node")
+        if parent.kind == "graph" and node is not None and kwargs.get("name") == node and not node.startswith("__"):
+            self._start(run_id, "node", {"graph": self.graph, "node": node})
+        else:
+            # Tracked so its children are not taken for graph runs
+            self._start(run_id, "chain", {})
+
+    def on_chain_end(self, outputs: Any, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._end(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._end(run_id, "error")
+
+    def _start_llm(self, run_id: uuid.UUID, metadata: Optional[Dict[str, Any]]) -> None:
+        metadata = metadata or {}
+        self._start(run_id, "llm", {
+            "graph": self.graph,
+            "node": metadata.get("langgraph_node", ""),
+            "model": metadata.get("ls_model_name", ""),
+        })
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, *, run_id: uuid.UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_start(self, serialized: Optional[Dict[str, Any]], prompts: List[str], *, run_id: uuid.UUID,
+                     metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        run = self._end(run_id, "ok")
+        if run is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    llm_tokens.inc(usage.get("input_tokens", 0), graph=self.graph, model=run.labels["model"],
+                                   type="input")
+                    llm_tokens.inc(usage.get("output_tokens", 0), graph=self.graph, model=run.labels["model"],
+                                   type="output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._end(run_id, "error")
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, *, run_id: uuid.UUID,
+                      **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or ""
+        self._start(run_id, "tool", {"graph": self.graph, "tool": name})
+
+    def on_tool_end(self, output: Any, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._end(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._end(run_id, "error")
+
+
+# Bytes serialized during the checkpoint write in progress, if any
+_checkpoint_sizes: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "checkpoint_sizes", default=None
+)
+
+
+class _SizedSerializer:
+    """
+    Forwards to a serializer, adding the size of what it serializes during a checkpoint write.
+    """
+
+    def __init__(self, serde: Any):
+        self.serde = serde
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        result = self.serde.dumps_typed(obj)
+        sizes = _checkpoint_sizes.get()
+        if sizes is not None:
+            sizes.append(len(result[1]))
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.serde, name)
+
+
+def instrument_checkpointer(checkpointer: Any, graph: str) -> None:
+    """
+    Records the duration and serialized size of each checkpoint written by `checkpointer`.
+
+    The size counts everything serialized while the checkpoint is saved, through the
+    savers' serializers (a DeltaCheckpointSaver and the saver it wraps), so it is the
+    size actually stored, whichever saver and serializer are configured.
+    """
+    if checkpointer is None or getattr(checkpointer, "_metrics_graph", None) is not None:
+        return
+    saver = checkpointer
+    while saver is not None:
+        if not isinstance(saver.serde, _SizedSerializer):
+            saver.serde = _SizedSerializer(saver.serde)
+        saver = getattr(saver, "saver", None)
+
+    aput = checkpointer.aput
+
+    async def timed_aput(config, checkpoint, metadata, new_versions):
+        sizes: List[int] = []
+        token = _checkpoint_sizes.set(sizes)
+        start = time.perf_counter()
+        try:
+            return await aput(config, checkpoint, metadata, new_versions)
+        finally:
+            checkpoint_write_seconds.observe(time.perf_counter() - start, graph=graph)
+            checkpoint_bytes.observe(sum(sizes), graph=graph)
+            _checkpoint_sizes.reset(token)
+
+    checkpointer.aput = timed_aput
+    checkpointer._metrics_graph = graph
+
+
+def instrument_graph(graph: CompiledStateGraph, name: str) -> CompiledStateGraph:
+    """
+    Returns `graph` with a MetricsCallbackHandler attached and its checkpointer timed.
+
+    The handler is part of the graph's config, so every run is recorded, whatever
+    callbacks the caller passes in its own config.
+    """
+    instrument_checkpointer(graph.checkpointer, name)
+    return graph.with_config(callbacks=[MetricsCallbackHandler(name)])
+
+
+def record_spotify_response(response: Any, *args: Any, **kwargs: Any) -> None:
+    """
+    `requests` response hook recording a Spotify Web API request.
+
+    Endpoints are labelled by their first path segment after the API version
+    ("playlists", "search", ...), which keeps IDs out of the labels.
+    """
+    path = response.request.path_url.split("?", 1)[0].strip("/").split("/")
+    endpoint = path[1] if len(path) > 1 and path[0].startswith("v") else path[0]
+    spotify_request_seconds.observe(response.elapsed.total_seconds(), method=response.request.method,
+                                    endpoint=endpoint, status=response.status_code)
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop runs a callback scheduled `interval` seconds ahead.
+
+    Lag means something is blocking the loop, such as a node doing synchronous I/O,
+    and delays every request served by it.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            event_loop_lag_seconds.observe(max(0.0, loop.time() - start - self.interval))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="event-loop-lag")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
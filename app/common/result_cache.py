@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Generic, Optional, TypeVar
+
+
+V = TypeVar("V")
+
+
+@dataclass
+class CachedResult(Generic[V]):
+    """
+    A stored result.
+
+    Attributes:
+        value (V): The result.
+        seconds (float): Time spent producing it, credited to each hit.
+        hits (int): Lookups it answered.
+    """
+
+    value: V
+    seconds: float
+    hits: int = 0
+
+
+class ResultCache(Generic[V]):
+    """
+    Thread safe LRU cache of results that are slow to produce, such as LLM outputs.
+
+    Results are stored under a hash of their key, with the time spent producing them.
+    Each hit adds that time to `seconds_saved`. Only the `max_entries` most recently used
+    keys are kept, and a cache of no entries stores nothing.
+
+    Args:
+        max_entries (int): Number of keys kept.
+
+    Attributes:
+        hits (int): Lookups answered with a stored result.
+        misses (int): Lookups that found nothing.
+        seconds_saved (float): Time spent producing the stored results, summed over the hits.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResult[V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[CachedResult[V]]:
+        """
+        Returns the result stored under `text`, or None, counting the hit or miss.
+        """
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            self.seconds_saved += entry.seconds
+            return entry
+
+    def put(self, text: str, value: V, seconds: float) -> bool:
+        """
+        Stores a result under `text`, evicting the least recently used keys beyond `max_entries`.
+
+        Returns:
+            bool: Whether the result was stored.
+        """
+        if self.max_entries <= 0:
+            return False
+        key = self.key(text)
+        with self._lock:
+            self._entries[key] = CachedResult(value, seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "seconds_saved": self.seconds_saved,
+            }
@@ -0,0 +1,202 @@
+import importlib
+import threading
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import ormsgpack
+from langgraph.checkpoint.serde.jsonplus import (
+    JsonPlusSerializer,
+    _msgpack_default,
+    _msgpack_ext_hook,
+    _option,
+)
+from pydantic import BaseModel
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is used instead
+    zstandard = None
+
+
+# Extension codes, above the range used by langgraph's own msgpack extensions
+EXT_MODEL = 64
+EXT_SET = 65
+EXT_FROZENSET = 66
+EXT_TUPLE = 67
+
+TYPE_NAME = "fastpack"
+DEFAULT_COMPRESS_THRESHOLD = 4096
+OPTIONS = _option | ormsgpack.OPT_PASSTHROUGH_TUPLE
+
+_setattr = object.__setattr__
+
+
+class _Codec:
+    def __init__(self, name: str, compress: Callable[[bytes], bytes], decompress: Callable[[bytes], bytes]):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+def _zstd_codec(level: int) -> _Codec:
+    # zstandard contexts are not thread safe; keep one pair per thread
+    local = threading.local()
+
+    def compressor() -> Any:
+        if not hasattr(local, "compressor"):
+            local.compressor = zstandard.ZstdCompressor(level=level)
+            local.decompressor = zstandard.ZstdDecompressor()
+        return local
+
+    return _Codec(
+        "zstd",
+        lambda data: compressor().compressor.compress(data),
+        lambda data: compressor().decompressor.decompress(data),
+    )
+
+
+def _zlib_codec(level: int) -> _Codec:
+    return _Codec("zlib", lambda data: zlib.compress(data, level), zlib.decompress)
+
+
+class FastSerializer(JsonPlusSerializer):
+    """
+    Checkpoint serializer tuned for pydantic-heavy graph state.
+
+    Values are packed with ormsgpack. Pydantic models, including the LangChain message
+    classes, are stored as their class path plus their field and private attribute
+    values and rebuilt with `model_construct`, which skips validation: the values were
+    valid when the model was saved, and nested models, sets and tuples are packed with
+    their own types so they come back as they were. Types this serializer does not handle itself are packed
+    with langgraph's extensions, and data written by the default serializer can still
+    be read.
+
+    Payloads of at least `compress_threshold` bytes are compressed with zstd when the
+    `zstandard` package is installed, or with zlib otherwise.
+
+    Args:
+        compression (Optional[str]): "zstd", "zlib", or None to disable compression.
+            Defaults to zstd when available.
+        compress_threshold (int): Minimum packed size in bytes before compressing.
+        level (Optional[int]): Compression level. Defaults to 3 for zstd and 1 for zlib.
+    """
+
+    def __init__(self, *, compression: Optional[str] = "auto",
+                 compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD, level: Optional[int] = None,
+                 pickle_fallback: bool = False):
+        super().__init__(pickle_fallback=pickle_fallback)
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "zlib"
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        self.codec: Optional[_Codec] = None
+        if compression == "zstd":
+            self.codec = _zstd_codec(3 if level is None else level)
+        elif compression == "zlib":
+            self.codec = _zlib_codec(1 if level is None else level)
+        elif compression is not None:
+            raise ValueError(f"Unknown compression {compression!r}")
+        self.codecs = {codec.name: codec for codec in [self.codec] if codec is not None}
+        self.compress_threshold = compress_threshold
+        self._class_paths: Dict[type, Tuple[str, str]] = {}
+        self._classes: Dict[Tuple[str, str], Optional[type]] = {}
+
+    def _pack(self, obj: Any) -> bytes:
+        return ormsgpack.packb(obj, default=self._default_ext, option=OPTIONS)
+
+    def _unpack(self, data: bytes) -> Any:
+        return ormsgpack.unpackb(data, ext_hook=self._ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+
+    def _default_ext(self, obj: Any) -> Any:
+        cls = type(obj)
+        # Checking the cache first avoids pydantic's slow metaclass isinstance check
+        path = self._class_paths.get(cls)
+        if path is None and isinstance(obj, BaseModel):
+            path = self._class_paths[cls] = (cls.__module__, cls.__qualname__)
+        if path is not None:
+            return ormsgpack.Ext(EXT_MODEL, self._pack([
+                *path,
+                obj.__dict__,
+                list(obj.model_fields_set),
+                obj.__pydantic_extra__,
+                obj.__pydantic_private__,
+            ]))
+        if cls is tuple:
+            return ormsgpack.Ext(EXT_TUPLE, self._pack(list(obj)))
+        if cls is set:
+            return ormsgpack.Ext(EXT_SET, self._pack(list(obj)))
+        if cls is frozenset:
+            return ormsgpack.Ext(EXT_FROZENSET, self._pack(list(obj)))
+        return _msgpack_default(obj)
+
+    def _resolve(self, module: str, qualname: str) -> Optional[type]:
+        key = (module, qualname)
+        if key not in self._classes:
+            try:
+                target: Any = importlib.import_module(module)
+                for part in qualname.split("."):
+                    target = getattr(target, part)
+                self._classes[key] = target
+            except (ImportError, AttributeError):
+                self._classes[key] = None
+        return self._classes[key]
+
+    def _construct(self, cls: type, values: Dict[str, Any], fields_set: set, extra: Optional[Dict[str, Any]],
+                   private: Optional[Dict[str, Any]]) -> Any:
+        if cls.__pydantic_post_init__ or cls.__pydantic_root_model__:
+            obj = cls.model_construct(_fields_set=fields_set, **values, **(extra or {}))
+            if private is not None:
+                _setattr(obj, "__pydantic_private__", private)
+            return obj
+        # Same end result as model_construct for plain models, without re-walking the
+        # fields: every field value, defaults included, was saved with the model
+        obj = cls.__new__(cls)
+        _setattr(obj, "__dict__", values)
+        _setattr(obj, "__pydantic_fields_set__", fields_set)
+        _setattr(obj, "__pydantic_extra__", extra)
+        if private is None and cls.__private_attributes__:
+            # Saved without its private attributes, by an older version of this serializer
+            private = {}
+        _setattr(obj, "__pydantic_private__", private)
+        return obj
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == EXT_MODEL:
+            module, qualname, values, fields_set, extra, *private = self._unpack(data)
+            cls = self._resolve(module, qualname)
+            if cls is None:
+                # Same behaviour as the default serializer: fall back to the raw values
+                return {**values, **(extra or {})}
+            return self._construct(cls, values, set(fields_set), extra, private[0] if private else None)
+        if code == EXT_TUPLE:
+            return tuple(self._unpack(data))
+        if code == EXT_SET:
+            return set(self._unpack(data))
+        if code == EXT_FROZENSET:
+            return frozenset(self._unpack(data))
+        return _msgpack_ext_hook(code, data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return super().dumps_typed(obj)
+        try:
+            data = self._pack(obj)
+        except ormsgpack.MsgpackEncodeError:
+            return super().dumps_typed(obj)
+        if self.codec is not None and len(data) >= self.compress_threshold:
+            return f"{TYPE_NAME}+{self.codec.name}", self.codec.compress(data)
+        return TYPE_NAME, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ == TYPE_NAME:
+            return self._unpack(payload)
+        if type_.startswith(f"{TYPE_NAME}+"):
+            name = type_.split("+", 1)[1]
+            codec = self.codecs.get(name)
+            if codec is None:
+                if name == "zstd" and zstandard is None:
+                    raise ImportError("Reading zstd compressed checkpoints requires the zstandard package")
+                codec = self.codecs[name] = _zstd_codec(3) if name == "zstd" else _zlib_codec(1)
+            return self._unpack(codec.decompress(payload))
+        return super().loads_typed(data)
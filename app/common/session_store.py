@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from langchain_core.runnables.config import RunnableConfig
+
+
+T = TypeVar("T")
+
+# Tools invoked outside of a graph run (notebooks, benchmarks) share this key
+DEFAULT_THREAD_ID = "default"
+
+
+def get_thread_id(config: Optional[RunnableConfig]) -> str:
+    """
+    Extracts the LangGraph thread id from a RunnableConfig.
+
+    Args:
+        config (Optional[RunnableConfig]): Config passed to a node or tool.
+
+    Returns:
+        str: The thread id, or DEFAULT_THREAD_ID when the call is not part of a thread.
+    """
+    if not config:
+        return DEFAULT_THREAD_ID
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return DEFAULT_THREAD_ID if thread_id is None else str(thread_id)
+
+
+class ThreadScopedStore(Generic[T]):
+    """
+    Keeps one value per graph thread, with LRU and idle-time eviction.
+
+    Lets tools hold per-session data without sharing it across concurrent sessions
+    served by the same process.
+
+    Attributes:
+        factory (Callable[[], T]): Builds the value for a thread seen for the first time.
+        max_threads (int): Maximum number of threads kept; least recently used are evicted.
+        ttl_seconds (float): Threads idle for longer than this are evicted.
+    """
+
+    def __init__(self, factory: Callable[[], T], max_threads: int = 1024, ttl_seconds: float = 3600.0):
+        self.factory = factory
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._values: "OrderedDict[str, Tuple[float, T]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: str) -> T:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._values.pop(thread_id, None)
+            value = entry[1] if entry is not None else self.factory()
+            self._values[thread_id] = (now, value)
+            self._evict(now)
+            return value
+
+    def evict(self, thread_id: str) -> None:
+        with self._lock:
+            self._values.pop(thread_id, None)
+
+    def _evict(self, now: float) -> None:
+        # Entries are ordered by last access, so expired ones are at the front
+        while self._values:
+            oldest_id, (last_access, _) = next(iter(self._values.items()))
+            if len(self._values) > self.max_threads or now - last_access > self.ttl_seconds:
+                del self._values[oldest_id]
+            else:
+                break
+
+    def snapshot(self) -> Dict[str, T]:
+        with self._lock:
+            return {thread_id: value for thread_id, (_, value) in self._values.items()}
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -0,0 +1,27 @@
+from typing import Any
+
+from app.common.lazy_import import lazy_import
+
+# Imported on first use, to keep module import fast
+RecursiveCharacterTextSplitter = lazy_import("langchain_text_splitters", "RecursiveCharacterTextSplitter")
+
+CHUNK_SIZE = 1000
+
+
+def get_text_splitter() -> Any:
+    """
+    Returns the splitter used for long inputs: chunks of up to CHUNK_SIZE characters, cut at paragraphs, then
+    lines, then words, and within a word only when it is longer than a chunk.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=0,
+        length_function=len,
+        is_separator_regex=False,
+        separators=[
+            "\n\n",
+            "\n",
+            " ",
+            "",
+        ],
+    )
@@ -0,0 +1,336 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Sequence, Tuple, Union
+
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+@dataclass(frozen=True)
+class ToolLimit:
+    """
+    Execution limits of a single tool.
+
+    Attributes:
+        max_concurrency (int): Maximum number of calls of the tool running at once.
+        timeout (Optional[float]): Seconds a call may take before a timeout ToolMessage
+            is returned in its place. None waits forever.
+    """
+
+    max_concurrency: int = 4
+    timeout: Optional[float] = 60.0
+
+
+class ToolLatencyHistogram:
+    """
+    Thread safe per-tool latency histograms and outcome counters.
+
+    Latencies are bucketed by `LATENCY_BUCKETS_MS`, cumulative like Prometheus
+    histograms are when exported. Each call is counted once under its outcome:
+    "ok", "error" (the tool failed or returned an error ToolMessage) or "timeout".
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, tool: str, seconds: float, outcome: str) -> None:
+        index = bisect.bisect_left(self.buckets_ms, seconds * 1000)
+        with self._lock:
+            counts = self._counts.setdefault(tool, [0] * (len(self.buckets_ms) + 1))
+            counts[index] += 1
+            self._sums[tool] = self._sums.get(tool, 0.0) + seconds
+            outcomes = self._outcomes.setdefault(tool, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns a copy of the histograms.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per tool: "buckets" (upper bound in ms, or "+Inf",
+                to the number of calls at or below it), "count", "sum_seconds" and "outcomes".
+        """
+        with self._lock:
+            result = {}
+            for tool, counts in self._counts.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip([*self.buckets_ms, "+Inf"], counts):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                result[tool] = {
+                    "buckets": buckets,
+                    "count": cumulative,
+                    "sum_seconds": self._sums[tool],
+                    "outcomes": dict(self._outcomes[tool]),
+                }
+            return result
+
+    def percentile(self, tool: str, q: float) -> Optional[float]:
+        """
+        Upper bound in ms of the bucket holding the q-th quantile of `tool`'s latencies.
+        """
+        with self._lock:
+            counts = self._counts.get(tool)
+            if not counts:
+                return None
+            target, cumulative = q * sum(counts), 0
+            for bound, count in zip([*self.buckets_ms, float("inf")], counts):
+                cumulative += count
+                if cumulative >= target:
+                    return bound
+        return float("inf")
+
+    def report(self) -> str:
+        lines = [f"{'tool':<28} {'calls':>6} {'ok':>5} {'error':>5} {'timeout':>7} {'mean ms':>9} "
+                 f"{'p50 <=':>7} {'p95 <=':>7} {'p99 <=':>7}"]
+        for tool, data in sorted(self.snapshot().items()):
+            outcomes = data["outcomes"]
+            mean_ms = data["sum_seconds"] / data["count"] * 1000
+            p50, p95, p99 = (self.percentile(tool, q) for q in (0.5, 0.95, 0.99))
+            lines.append(
+                f"{tool:<28} {data['count']:>6} {outcomes.get('ok', 0):>5} {outcomes.get('error', 0):>5} "
+                f"{outcomes.get('timeout', 0):>7} {mean_ms:>9.1f} {p50:>7g} {p95:>7g} {p99:>7g}"
+            )
+        return "\n".join(lines)
+
+
+# Shared by every ConcurrentToolNode unless one is given its own
+tool_latency = ToolLatencyHistogram()
+
+
+def timeout_message(call: ToolCall, timeout: float) -> ToolMessage:
+    return ToolMessage(
+        content=json.dumps({
+            "error": "timeout",
+            "tool": call["name"],
+            "timeout_seconds": timeout,
+            "message": f"The tool did not finish within {timeout:g} seconds and its result was discarded. "
+                       "Retry with fewer items or continue without it.",
+        }),
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+class ConcurrentToolNode(ToolNode):
+    """
+    ToolNode with per-tool concurrency caps, deadlines and latency histograms.
+
+    All tool calls of a message start together, as in ToolNode, but each call first
+    takes a slot of the node-wide cap and of its tool's cap, so a burst of calls to
+    one slow tool queues behind that tool's limit instead of occupying every worker.
+    A call that exceeds its tool's timeout is answered with an error ToolMessage
+    describing the timeout, so the step always completes.
+
+    Async tools are cancelled at the deadline. Sync tools, whether the node runs sync or
+    async, run in the node's own worker threads, which cannot be interrupted; their
+    result is discarded when it arrives late, and they keep their slots until they
+    return, so later calls wait for a free thread.
+
+    Args:
+        tools (Sequence): Tools, as accepted by ToolNode.
+        limits (Optional[Dict[str, ToolLimit]]): Limits by tool name.
+        default_limit (ToolLimit): Limits of tools not listed in `limits`.
+        max_concurrency (int): Maximum number of calls running at once across all tools.
+        histogram (Optional[ToolLatencyHistogram]): Where latencies are recorded.
+            Defaults to the shared `tool_latency`.
+    """
+
+    def __init__(self, tools: Sequence[Any], *, limits: Optional[Dict[str, ToolLimit]] = None,
+                 default_limit: ToolLimit = ToolLimit(), max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 histogram: Optional[ToolLatencyHistogram] = None, **kwargs: Any):
+        super().__init__(tools, **kwargs)
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.max_concurrency = max_concurrency
+        self.histogram = histogram or tool_latency
+        # asyncio semaphores belong to one event loop; keep a set per loop
+        self._async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._sync_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def limit_for(self, name: str) -> ToolLimit:
+        return self.limits.get(name, self.default_limit)
+
+    def _async_semaphores(self, name: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.setdefault(loop, {})
+        if "*" not in slots:
+            slots["*"] = asyncio.Semaphore(self.max_concurrency)
+        if name not in slots:
+            slots[name] = asyncio.Semaphore(self.limit_for(name).max_concurrency)
+        return slots["*"], slots[name]
+
+    def _sync_semaphores(self, name: str) -> Tuple[threading.BoundedSemaphore, threading.BoundedSemaphore]:
+        with self._slots_lock:
+            if "*" not in self._sync_slots:
+                self._sync_slots["*"] = threading.BoundedSemaphore(self.max_concurrency)
+            if name not in self._sync_slots:
+                self._sync_slots[name] = threading.BoundedSemaphore(self.limit_for(name).max_concurrency)
+            return self._sync_slots["*"], self._sync_slots[name]
+
+    @staticmethod
+    def _outcome(message: Any) -> str:
+        return "error" if getattr(message, "status", None) == "error" else "ok"
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._slots_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="tool")
+            return self._executor
+
+    @staticmethod
+    def _is_sync(tool: Optional[BaseTool]) -> bool:
+        if tool is None:
+            return False
+        if "coroutine" in type(tool).model_fields:
+            return tool.coroutine is None
+        return type(tool)._arun is BaseTool._arun
+
+    async def _call_limited(self, name: str, arun: Callable[[], Awaitable[Any]],
+                            run: Optional[Callable[[], Any]]) -> Any:
+        """
+        Runs a call of tool `name` under its slots, deadline and latency histogram.
+
+        Async tools are awaited through `arun` and cancelled at the deadline. Sync tools
+        pass `run`, which runs in the node's executor in a copy of the context; a late
+        call keeps its slots until its thread returns, so the caps hold after a timeout.
+
+        Raises:
+            asyncio.TimeoutError: If the call exceeds the tool's timeout.
+        """
+        limit = self.limit_for(name)
+        node_slots, tool_slots = self._async_semaphores(name)
+        await node_slots.acquire()
+        try:
+            await tool_slots.acquire()
+        except BaseException:
+            node_slots.release()
+            raise
+        held = True
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            if run is None:
+                result = await asyncio.wait_for(arun(), limit.timeout)
+            else:
+                # Run in a copy of the context, so the tool sees the run's cancel token
+                context = contextvars.copy_context()
+                future = asyncio.wrap_future(self._get_executor().submit(context.run, run))
+
+                def done(finished: asyncio.Future) -> None:
+                    self._release(node_slots, tool_slots)
+                    if not finished.cancelled():
+                        finished.exception()  # retrieved, so a late failure is not logged as unhandled
+
+                held = False
+                future.add_done_callback(done)
+                result = await asyncio.wait_for(asyncio.shield(future), limit.timeout)
+            outcome = self._outcome(result)
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if held:
+                self._release(node_slots, tool_slots)
+            self.histogram.observe(name, time.perf_counter() - start, outcome)
+
+    async def _arun_one(self, call: ToolCall, input_type: Literal["list", "dict"],
+                        config: RunnableConfig) -> ToolMessage:
+        sync = self._is_sync(self.tools_by_name.get(call["name"]))
+        try:
+            return await self._call_limited(
+                call["name"],
+                functools.partial(super()._arun_one, call, input_type, config),
+                functools.partial(super()._run_one, call, input_type, config) if sync else None,
+            )
+        except asyncio.TimeoutError:
+            return timeout_message(call, self.limit_for(call["name"]).timeout)
+
+    async def acall(self, name: str, args: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Any:
+        """
+        Calls a tool directly, under the same caps, deadline and metrics as a tool call.
+
+        Unlike a tool call through the node, the tool's return value comes back as is
+        instead of as a ToolMessage, for callers that work with structured results.
+
+        Args:
+            name (str): Tool name.
+            args (Dict[str, Any]): Tool arguments.
+            config (Optional[RunnableConfig]): Config passed to the tool.
+
+        Returns:
+            Any: The tool's return value.
+
+        Raises:
+            KeyError: If the node has no tool called `name`.
+            asyncio.TimeoutError: If the call exceeds the tool's timeout.
+        """
+        tool = self.tools_by_name[name]
+        return await self._call_limited(
+            name,
+            functools.partial(tool.ainvoke, args, config),
+            functools.partial(tool.invoke, args, config) if self._is_sync(tool) else None,
+        )
+
+    def _run_one(self, call: ToolCall, input_type: Literal["list", "dict"], config: RunnableConfig) -> ToolMessage:
+        limit = self.limit_for(call["name"])
+        node_slots, tool_slots = self._sync_semaphores(call["name"])
+        node_slots.acquire()
+        tool_slots.acquire()
+        held = True
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            if limit.timeout is None:
+                result = super()._run_one(call, input_type, config)
+            else:
+                # Run in a copy of the context, so the tool sees the run's cancel token
+                context = contextvars.copy_context()
+                future = self._get_executor().submit(context.run, super()._run_one, call, input_type, config)
+                try:
+                    result = future.result(timeout=limit.timeout)
+                except FutureTimeoutError:
+                    # The call keeps its executor thread until it returns; keep its slots
+                    # taken until then, so later calls wait for a free thread instead of
+                    # timing out in the executor's queue
+                    held = False
+                    future.add_done_callback(lambda _: self._release(node_slots, tool_slots))
+                    outcome = "timeout"
+                    return timeout_message(call, limit.timeout)
+            outcome = self._outcome(result)
+            return result
+        finally:
+            if held:
+                self._release(node_slots, tool_slots)
+            self.histogram.observe(call["name"], time.perf_counter() - start, outcome)
+
+    @staticmethod
+    def _release(*slots: Union[threading.BoundedSemaphore, asyncio.Semaphore]) -> None:
+        for slot in slots:
+            slot.release()
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.graph.state import CompiledStateGraph
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration, read by tracer_from_env()
+TRACE_DIR_ENV = "TRACE_DIR"  # Directory the trace of each graph run is written to; unset disables tracing
+TRACE_CHAINS_ENV = "TRACE_CHAINS"  # "1" also records the runnables inside nodes (prompts, routers, ...)
+
+MAX_ARG_CHARS = 200
+DEFAULT_MAX_TRACES = 100
+
+# perf_counter is precise but has no epoch; anchor it to wall time once
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+@dataclass
+class Span:
+    """
+    A timed operation of a graph run.
+
+    Attributes:
+        name (str): Graph, node, model or tool name.
+        category (str): "graph", "node", "llm", "tool" or "chain".
+        span_id (uuid.UUID): Run ID of the operation.
+        parent_id (Optional[uuid.UUID]): Span the operation ran in, None for the graph run.
+        start_ns (int): Start, in nanoseconds since the epoch.
+        end_ns (int): End, in nanoseconds since the epoch; 0 while running.
+        args (Dict[str, Any]): Details shown with the span, e.g. the model or an error.
+    """
+
+    name: str
+    category: str
+    span_id: uuid.UUID
+    parent_id: Optional[uuid.UUID]
+    start_ns: int
+    end_ns: int = 0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+def _now_ns() -> int:
+    return time.perf_counter_ns() + _EPOCH_OFFSET_NS
+
+
+def _short(value: Any) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= MAX_ARG_CHARS else text[:MAX_ARG_CHARS] + "..."
+
+
+def assign_lanes(spans: List[Span]) -> Dict[uuid.UUID, int]:
+    """
+    Places spans on timeline lanes so that spans on a lane nest or follow each other.
+
+    Trace viewers draw each thread as a stack, so two overlapping siblings, such as
+    tool calls run in parallel, cannot share one. A span stays on its parent's lane
+    when it fits there and moves to the first lane it fits on otherwise.
+
+    Returns:
+        Dict[uuid.UUID, int]: Lane of each span.
+    """
+    lanes: List[List[int]] = []  # End times of the spans open on each lane
+    assigned: Dict[uuid.UUID, int] = {}
+    for span in sorted(spans, key=lambda s: (s.start_ns, -s.end_ns)):
+        preferred = assigned.get(span.parent_id) if span.parent_id is not None else None
+        order = ([preferred] if preferred is not None else []) + [i for i in range(len(lanes)) if i != preferred]
+        for lane in order:
+            stack = lanes[lane]
+            while stack and stack[-1] <= span.start_ns:
+                stack.pop()
+            if not stack or stack[-1] >= span.end_ns:
+                break
+        else:
+            lanes.append([])
+            lane = len(lanes) - 1
+        lanes[lane].append(span.end_ns)
+        assigned[span.span_id] = lane
+    return assigned
+
+
+def chrome_trace(spans: List[Span], process_name: str = "graph") -> Dict[str, Any]:
+    """
+    Converts spans to the Chrome trace event format, as read by chrome://tracing and Perfetto.
+    """
+    lanes = assign_lanes(spans)
+    events: List[Dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": process_name}}
+    ]
+    for lane in sorted(set(lanes.values())):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"lane {lane}"}})
+    for span in spans:
+        events.append({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": max(span.end_ns - span.start_ns, 0) / 1000,
+            "pid": 1,
+            "tid": lanes[span.span_id],
+            "args": span.args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class SpanTracer:
+    """
+    Collects the spans of graph runs and writes each run's trace to a file.
+
+    Spans are kept in memory until their graph run ends. The finished trace then goes
+    to `recent` and, when `directory` is set, is written to
+    `<directory>/<graph>-<thread_id>-<start>.json` on a background thread, so runs do
+    not wait for the disk.
+
+    Args:
+        directory (Optional[str]): Where traces are written; None keeps them in memory only.
+        include_chains (bool): Also record the runnables run inside nodes.
+        max_traces (int): Finished traces kept in `recent`.
+    """
+
+    def __init__(self, directory: Optional[str] = None, include_chains: bool = False,
+                 max_traces: int = DEFAULT_MAX_TRACES):
+        self.directory = directory
+        self.include_chains = include_chains
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=max_traces)
+        self._spans: Dict[uuid.UUID, List[Span]] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer")
+
+    def handler(self, graph: str) -> "TracingCallbackHandler":
+        return TracingCallbackHandler(self, graph)
+
+    def add(self, trace_id: uuid.UUID, span: Span) -> None:
+        with self._lock:
+            self._spans.setdefault(trace_id, []).append(span)
+
+    def finish(self, trace_id: uuid.UUID, graph: str, thread_id: str) -> None:
+        with self._lock:
+            spans = self._spans.pop(trace_id, [])
+        if not spans:
+            return
+        trace = {"graph": graph, "thread_id": thread_id, "trace": chrome_trace(spans, graph)}
+        self.recent.append(trace)
+        if self.directory:
+            start = min(s.start_ns for s in spans) // 1_000_000
+            name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{graph}-{thread_id}-{start}") + ".json"
+            self._writer.submit(self._write, os.path.join(self.directory, name), trace["trace"])
+
+    @staticmethod
+    def _write(path: str, trace: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace, f)
+        except OSError as e:
+            logger.error(f"Could not write trace {path}: {e!r}")
+
+    def flush(self) -> None:
+        """
+        Waits for the traces queued for writing.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records the spans of a graph's runs from its callbacks.
+
+    As with the metrics handler, a chain run whose parent is unknown is the graph run,
+    and its children named after a LangGraph node are the nodes. LLM and tool runs are
+    recorded wherever they happen. Runs that are not recorded still pass their span on,
+    so a tool called from a node's inner runnable is shown under the node.
+
+    Args:
+        tracer (SpanTracer): Where the spans go.
+        graph (str): Name of the graph.
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: SpanTracer, graph: str):
+        self.tracer = tracer
+        self.graph = graph
+        # Run ID to (trace ID, span the run's children belong to, span of the run if recorded)
+        self._runs: Dict[uuid.UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _parent(self, parent_run_id: Optional[uuid.UUID]) -> Optional[tuple]:
+        if parent_run_id is None:
+            return None
+        with self._lock:
+            return self._runs.get(parent_run_id)
+
+    def _open(self, run_id: uuid.UUID, parent: tuple, name: str, category: str, args: Dict[str, Any]) -> None:
+        trace_id, parent_span, _ = parent
+        span = Span(name, category, run_id, parent_span, _now_ns(), args=args)
+        with self._lock:
+            self._runs[run_id] = (trace_id, run_id, span)
+
+    def _close(self, run_id: uuid.UUID, **args: Any) -> Optional[Span]:
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+        if entry is None:
+            return None
+        trace_id, _, span = entry
+        if span is not None:
+            span.end_ns = _now_ns()
+            span.args.update(args)
+            self.tracer.add(trace_id, span)
+        return span
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: uuid.UUID,
+                       parent_run_id: Optional[uuid.UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        parent = self._parent(parent_run_id)
+        metadata = metadata or {}
+        name = kwargs.get("name") or ""
+        if parent is None:
+            thread_id = str(metadata.get("thread_id", ""))
+            self._open(run_id, (run_id, None, None), self.graph, "graph", {"thread_id": thread_id})
+            return
+        node = metadata.get("langgraph_node")
+        is_node = parent[2] is not None and parent[2].category == "graph" and name == node
+        if is_node and not node.startswith("__"):
+            self._open(run_id, parent, node, "node", {"step": metadata.get("langgraph_step")})
+        elif self.tracer.include_chains:
+            self._open(run_id, parent, name, "chain", {})
+        else:
+            with self._lock:
+                self._runs[run_id] = (parent[0], parent[1], None)
+
+    def on_chain_end(self, outputs: Any, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        span = self._close(run_id)
+        if span is not None and span.category == "graph":
+            self.tracer.finish(span.span_id, self.graph, span.args["thread_id"])
+
+    def on_chain_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        span = self._close(run_id, error=_short(error))
+        if span is not None and span.category == "graph":
+            self.tracer.finish(span.span_id, self.graph, span.args["thread_id"])
+
+    def _start_llm(self, run_id: uuid.UUID, parent_run_id: Optional[uuid.UUID],
+                   metadata: Optional[Dict[str, Any]]) -> None:
+        parent = self._parent(parent_run_id)
+        if parent is not None:
+            model = (metadata or {}).get("ls_model_name") or "llm"
+            self._open(run_id, parent, model, "llm", {})
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, *, run_id: uuid.UUID,
+                            parent_run_id: Optional[uuid.UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        self._start_llm(run_id, parent_run_id, metadata)
+
+    def on_llm_start(self, serialized: Optional[Dict[str, Any]], prompts: List[str], *, run_id: uuid.UUID,
+                     parent_run_id: Optional[uuid.UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                     **kwargs: Any) -> None:
+        self._start_llm(run_id, parent_run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        usage: Dict[str, int] = {}
+        for generations in response.generations:
+            for generation in generations:
+                for key, value in (getattr(getattr(generation, "message", None), "usage_metadata", None) or {}).items():
+                    if isinstance(value, int):
+                        usage[key] = usage.get(key, 0) + value
+        self._close(run_id, **usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._close(run_id, error=_short(error))
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, *, run_id: uuid.UUID,
+                      parent_run_id: Optional[uuid.UUID] = None, **kwargs: Any) -> None:
+        parent = self._parent(parent_run_id)
+        if parent is not None:
+            name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+            self._open(run_id, parent, name, "tool", {"input": _short(input_str)})
+
+    def on_tool_end(self, output: Any, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._close(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: uuid.UUID, **kwargs: Any) -> None:
+        self._close(run_id, error=_short(error))
+
+
+def tracer_from_env() -> Optional[SpanTracer]:
+    directory = os.getenv(TRACE_DIR_ENV)
+    if not directory:
+        return None
+    return SpanTracer(directory, include_chains=os.getenv(TRACE_CHAINS_ENV, "0") == "1")
+
+
+_tracer: Optional[SpanTracer] = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[SpanTracer]:
+    """
+    Returns the process tracer configured by `TRACE_DIR`, or None when tracing is off.
+    """
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        with _tracer_lock:
+            if not _tracer_loaded:
+                _tracer = tracer_from_env()
+                _tracer_loaded = True
+    return _tracer
+
+
+def trace_graph(graph: CompiledStateGraph, name: str, tracer: Optional[SpanTracer] = None) -> CompiledStateGraph:
+    """
+    Returns `graph` with a TracingCallbackHandler attached, or `graph` itself when tracing is off.
+
+    Args:
+        graph (CompiledStateGraph): The graph to trace.
+        name (str): Name of the graph in the traces.
+        tracer (Optional[SpanTracer]): Defaults to the tracer configured by `TRACE_DIR`.
+    """
+    tracer = tracer or get_tracer()
+    if tracer is None:
+        return graph
+    return graph.with_config(callbacks=[tracer.handler(name)])
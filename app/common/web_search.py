@@ -0,0 +1,68 @@
+import functools
+import threading
+from typing import Any, Optional, Type
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app.common.lazy_import import lazy_import
+
+
+# Imported on first use, to keep module import fast
+TavilySearchResults = lazy_import("langchain_community.tools.tavily_search", "TavilySearchResults")
+
+DEFAULT_MAX_RESULTS = 2
+
+
+class TavilyInput(BaseModel):
+    query: str = Field(description="search query to look up")
+
+
+class LazyTavilySearch(BaseTool):
+    """
+    Tavily search tool that creates the underlying TavilySearchResults on first use.
+
+    Creating TavilySearchResults requires TAVILY_API_KEY. This tool has the same name,
+    description, arguments and output, so it can be bound to an LLM and put in a
+    ToolNode when a graph is compiled; the key is only needed once a search runs.
+
+    Args:
+        max_results (int): Maximum number of search results returned.
+    """
+
+    name: str = "tavily_search_results_json"
+    description: str = (
+        "A search engine optimized for comprehensive, accurate, and trusted results. "
+        "Useful for when you need to answer questions about current events. "
+        "Input should be a search query."
+    )
+    args_schema: Type[BaseModel] = TavilyInput
+    response_format: str = "content_and_artifact"
+    max_results: int = DEFAULT_MAX_RESULTS
+    _tool: Any = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def search_tool(self) -> Any:
+        """
+        Returns the TavilySearchResults tool, creating it on first use.
+        """
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    self._tool = TavilySearchResults(max_results=self.max_results)
+        return self._tool
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        return self.search_tool()._run(query, run_manager=run_manager)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> Any:
+        return await self.search_tool()._arun(query, run_manager=run_manager)
+
+
+@functools.lru_cache(maxsize=None)
+def get_tavily_tool(max_results: int = DEFAULT_MAX_RESULTS) -> BaseTool:
+    """
+    Returns the Tavily search tool shared by the patterns, one per `max_results`.
+    """
+    return LazyTavilySearch(max_results=max_results)
@@ -0,0 +1,257 @@
+import asyncio
+import contextlib
+import json
+import logging
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel, Field
+
+from app.common.admission import DEFAULT_TENANT, INTERACTIVE, AdmissionController, AdmissionRejected
+from app.common.cancellation import DISCONNECT, CancelToken, cancellable_run, partial_values, run_with_deadline
+from app.common.graph_registry import GraphRegistry, get_graph_registry
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/graphs", tags=["graphs"])
+
+# Stream modes sent over SSE: node updates, and LLM messages as they are produced
+STREAM_MODES = ["updates", "messages"]
+
+# Seconds between checks that the client of a run is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Status of a response nobody reads, as nginx logs it
+CLIENT_CLOSED_REQUEST = 499
+
+# Header naming the tenant a run is counted against by admission control
+TENANT_HEADER = "X-Tenant-ID"
+
+
+class RunRequest(BaseModel):
+    """
+    A user message sent to a graph thread.
+
+    Attributes:
+        message (str): Content of the user message.
+        recursion_limit (Optional[int]): Maximum supersteps of the run; LangGraph's default when None.
+        deadline_seconds (Optional[float]): Seconds the run may take once admitted, after
+            which it is stopped and the state of its last checkpoint returned. No limit when None.
+        priority (str): Admission priority class of the run.
+    """
+
+    message: str
+    recursion_limit: Optional[int] = None
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    priority: str = INTERACTIVE.name
+
+
+def to_jsonable(value: Any) -> Any:
+    """
+    Converts graph state (messages, pydantic models, containers) to JSON-compatible values.
+    """
+    if isinstance(value, BaseMessage):
+        return value.model_dump(mode="json")
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def registry_of(request: Request) -> GraphRegistry:
+    return getattr(request.app.state, "graphs", None) or get_graph_registry()
+
+
+def get_graph(request: Request, name: str) -> CompiledStateGraph:
+    registry = registry_of(request)
+    if name not in registry.specs:
+        raise HTTPException(status_code=404, detail=f"Unknown graph {name}")
+    try:
+        return registry.get(name)
+    except Exception as e:
+        logger.error(f"Could not compile graph {name}: {e!r}")
+        raise HTTPException(status_code=503, detail=f"Graph {name} is unavailable")
+
+
+def admission_of(request: Request) -> Optional[AdmissionController]:
+    return getattr(request.app.state, "admission", None)
+
+
+def tenant_of(request: Request) -> str:
+    return request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+
+
+def check_admission(request: Request, priority: str) -> None:
+    """
+    Fails fast when a run of `priority` would be rejected by admission control.
+
+    Raises:
+        HTTPException: 422 for an unknown priority class.
+        AdmissionRejected: If the run's queue is full.
+    """
+    admission = admission_of(request)
+    if admission is None:
+        return
+    try:
+        admission.check(tenant_of(request), priority)
+    except KeyError:
+        raise HTTPException(status_code=422, detail=f"Unknown priority class {priority}")
+
+
+def admitted(request: Request, priority: str) -> AsyncContextManager[None]:
+    """
+    Holds an admission slot for the block; a no-op when the app has no admission control.
+    """
+    admission = admission_of(request)
+    if admission is None:
+        return contextlib.nullcontext()
+    return admission.admit(tenant_of(request), priority)
+
+
+def rejected_response(error: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"detail": str(error), "reason": error.reason},
+                        headers={"Retry-After": str(error.retry_after)})
+
+
+def run_config(thread_id: str, body: RunRequest) -> Dict[str, Any]:
+    config: Dict[str, Any] = {"configurable": {"thread_id": thread_id}}
+    if body.recursion_limit is not None:
+        config["recursion_limit"] = body.recursion_limit
+    return config
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(to_jsonable(data))}\n\n"
+
+
+@router.get("")
+async def list_graphs(request: Request) -> Dict[str, List[str]]:
+    registry = registry_of(request)
+    return {"graphs": registry.names(), "loaded": registry.loaded()}
+
+
+async def cancel_on_disconnect(request: Request, token: CancelToken, run: asyncio.Task) -> None:
+    """
+    Cancels `run` once the client of `request` disconnects.
+    """
+    while not run.done():
+        if await request.is_disconnected():
+            token.cancel(DISCONNECT)
+            run.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+@router.post("/{name}/threads/{thread_id}/runs")
+async def run_graph(request: Request, name: str, thread_id: str, body: RunRequest) -> Any:
+    """
+    Runs the graph on the thread with a new user message and returns the final state.
+
+    The run waits for admission, and is answered 429 when refused. It is cancelled when
+    the client disconnects. When its deadline passes first, the state of its last
+    checkpoint is returned, with status "deadline".
+    """
+    graph = get_graph(request, name)
+    try:
+        check_admission(request, body.priority)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    token = CancelToken()
+
+    async def admitted_run():
+        async with admitted(request, body.priority):
+            return await run_with_deadline(
+                graph, {"messages": [HumanMessage(content=body.message)]}, run_config(thread_id, body),
+                name=name, deadline=body.deadline_seconds, token=token, cancel_reason=DISCONNECT,
+            )
+
+    run = asyncio.create_task(admitted_run())
+    watcher = asyncio.create_task(cancel_on_disconnect(request, token, run))
+    try:
+        outcome = await run
+    except asyncio.CancelledError:
+        if token.reason != DISCONNECT:
+            raise
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    except Exception as e:
+        logger.error(f"Run of {name} on thread {thread_id} failed: {e!r}")
+        raise HTTPException(status_code=500, detail=f"Run failed: {e}")
+    finally:
+        watcher.cancel()
+    return {"graph": name, "thread_id": thread_id, "status": outcome.status, "values": to_jsonable(outcome.values)}
+
+
+@router.post("/{name}/threads/{thread_id}/stream")
+async def stream_graph(request: Request, name: str, thread_id: str, body: RunRequest) -> Response:
+    """
+    Runs the graph on the thread and streams its progress as server-sent events.
+
+    The request is answered 429 when admission control would refuse the run at once;
+    a run refused after waiting gets an error event. The run is cancelled when the
+    client disconnects.
+
+    Events:
+        updates: The state update of a node, as {node: update}.
+        messages: A message, or message chunk, produced by an LLM in a node.
+        deadline: The deadline passed; carries the state of the last checkpoint.
+        error: The run failed; the stream ends.
+        end: The run finished.
+    """
+    graph = get_graph(request, name)
+    config = run_config(thread_id, body)
+    try:
+        check_admission(request, body.priority)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async with admitted(request, body.priority), cancellable_run(config, name=name, deadline=body.deadline_seconds,
+                                       cancel_reason=DISCONNECT) as (cancellable_config, token):
+                async for mode, chunk in graph.astream(
+                    {"messages": [HumanMessage(content=body.message)]}, cancellable_config, stream_mode=STREAM_MODES
+                ):
+                    if mode == "messages":
+                        message, metadata = chunk
+                        yield sse_event("messages", {"node": metadata.get("langgraph_node"), "message": message})
+                    else:
+                        yield sse_event(mode, chunk)
+        except Exception as e:
+            logger.error(f"Streamed run of {name} on thread {thread_id} failed: {e!r}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        if token.cancelled:
+            yield sse_event(token.reason, {"values": await partial_values(graph, config)})
+        yield sse_event("end", {"graph": name, "thread_id": thread_id})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/{name}/threads/{thread_id}/state")
+async def get_state(request: Request, name: str, thread_id: str) -> Dict[str, Any]:
+    """
+    Returns the latest checkpointed state of the thread.
+    """
+    graph = get_graph(request, name)
+    snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    if snapshot.created_at is None:
+        raise HTTPException(status_code=404, detail=f"Thread {thread_id} has no state in {name}")
+    return {
+        "graph": name,
+        "thread_id": thread_id,
+        "values": to_jsonable(snapshot.values),
+        "next": list(snapshot.next),
+        "checkpoint_id": (snapshot.config or {}).get("configurable", {}).get("checkpoint_id"),
+        "created_at": snapshot.created_at,
+    }
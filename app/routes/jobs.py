@@ -0,0 +1,107 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.common.admission import BATCH
+from app.common.jobs import Job, JobQueue, QueueFullError
+from app.routes.graphs import tenant_of, to_jsonable
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class JobRequest(BaseModel):
+    """
+    A graph run to execute in the background.
+
+    Attributes:
+        graph (str): Name of the graph.
+        message (str): Content of the user message.
+        thread_id (Optional[str]): Thread to continue; a new one when None.
+        deadline_seconds (Optional[float]): Seconds the run may take once started; no limit when None.
+        priority (str): Admission priority class of the run.
+    """
+
+    graph: str
+    message: str
+    thread_id: Optional[str] = None
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    priority: str = BATCH.name
+
+
+def queue_of(request: Request) -> JobQueue:
+    queue = getattr(request.app.state, "jobs", None)
+    if queue is None:
+        raise HTTPException(status_code=503, detail="The job queue is not running")
+    return queue
+
+
+def get_job(request: Request, job_id: str) -> Job:
+    job = queue_of(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@router.post("", status_code=202)
+async def submit_job(request: Request, body: JobRequest) -> Dict[str, Any]:
+    """
+    Queues a graph run and returns its job at once; poll or stream it for progress.
+
+    The run is counted against the tenant of the X-Tenant-ID header by admission control.
+    """
+    try:
+        job = queue_of(request).submit(body.graph, body.message, body.thread_id, body.deadline_seconds,
+                                       tenant_of(request), body.priority)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown graph {body.graph}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    return job.summary()
+
+
+@router.get("")
+async def job_stats(request: Request) -> Dict[str, int]:
+    return queue_of(request).stats()
+
+
+@router.get("/{job_id}")
+async def read_job(request: Request, job_id: str) -> Dict[str, Any]:
+    """
+    Returns the job's status, its latest event and, once it succeeded, the final state.
+    """
+    job = get_job(request, job_id)
+    return {
+        **job.summary(),
+        "last_event": job.events[-1] if job.events else None,
+        "result": to_jsonable(job.result) if job.result is not None else None,
+    }
+
+
+@router.delete("/{job_id}")
+async def cancel_job(request: Request, job_id: str) -> Dict[str, Any]:
+    """
+    Cancels the job, stopping its run if it started; a finished job is left as it is.
+    """
+    get_job(request, job_id)
+    return queue_of(request).cancel(job_id).summary()
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(request: Request, job_id: str, since: int = 0) -> StreamingResponse:
+    """
+    Streams the job's events from sequence number `since` as server-sent events, until it finishes.
+    """
+    get_job(request, job_id)
+    queue = queue_of(request)
+
+    async def events() -> AsyncIterator[str]:
+        async for event in queue.follow(job_id, since):
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
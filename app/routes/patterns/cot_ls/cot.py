@@ -1,18 +1,29 @@
 import operator
 import os
 import logging
+import time
+import sys
 from typing import Dict, List, Literal
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.config import RunnableConfig
 from typing import Annotated
-from langchain_openai import ChatOpenAI
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.lazy_import import lazy_import
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from app.common.checkpointer import get_checkpointer
+from app.common.metrics import get_metrics
 from typing_extensions import TypedDict
 from prompts import Prompts
+from prompt_cache import classify_task, get_prompt_cache
+
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
 
 MAX_ROUNDS = 2
 
@@ -28,6 +39,9 @@ def default_state() -> Dict:
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+get_metrics().register_cache("cot_prompt_cache", lambda: (get_prompt_cache().hits, get_prompt_cache().misses),
+                             lambda: get_prompt_cache().seconds_saved)
+
 
 class State(TypedDict):
     """
@@ -36,12 +50,42 @@ class State(TypedDict):
     Attributes:
         messages (Annotated[List[BaseMessage], add_messages]): A list of messages exchanged in the conversation.
         rounds (Annotated[int, operator.add]): The number of conversation rounds completed.
+        cot_prompt (str): The CoT prompt guiding the generation; empty until one is found or generated.
     """
     messages: Annotated[List[BaseMessage], add_messages]
     rounds: Annotated[int, operator.add]
     cot_prompt: str
 
 
+def latest_question(state: State) -> str:
+    """
+    Content of the latest user message, the question a CoT prompt is made for.
+    """
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+
+async def prompt_cache_lookup_node(state: State, config: RunnableConfig) -> Dict:
+    """
+    Looks up a CoT prompt generated for a question of the same kind as the user's
+
+    Args:
+        state (State): The current conversation state containing messages and rounds.
+
+    Returns:
+        State: The stored CoT prompt on a hit; on a miss an empty one, clearing any
+            prompt left by an earlier question on this thread.
+    """
+    signature = classify_task(latest_question(state))
+    entry = get_prompt_cache().get(signature)
+    if entry is None:
+        return {"cot_prompt": ""}
+    logging.info(f"CoT prompt cache hit for {signature}, saved ~{entry.seconds:.1f}s of generation")
+    return {"cot_prompt": entry.value}
+
+
 async def prompt_generation_node(state: State, config: RunnableConfig) -> Dict:
     """
     Generates a suitable COT prompt to solve the user's question.
@@ -54,6 +98,7 @@ async def prompt_generation_node(state: State, config: RunnableConfig) -> Dict:
 
     Notes:
         - Uses the ChatOpenAI model to generate the CoT prompt.
+        - The prompt is stored in the prompt cache for later questions of the same kind.
         - If an error occurs, logs the error and returns a default state.
     """
     prompt = ChatPromptTemplate(
@@ -72,7 +117,10 @@ async def prompt_generation_node(state: State, config: RunnableConfig) -> Dict:
     generate = partial_prompt | llm
 
     try:
+        start = time.perf_counter()
         res = await generate.ainvoke({"messages": state["messages"]})
+        if res.content:
+            get_prompt_cache().put(classify_task(latest_question(state)), res.content, time.perf_counter() - start)
         # Do not save generated COT prompt in messages
         return {"cot_prompt": res.content}
     except RuntimeError as e:
@@ -202,14 +250,16 @@ def build_graph() -> CompiledStateGraph:
 
     Notes:
         - Defines nodes for generation, reflection, and ending the conversation.
+        - Looks up a cached CoT prompt first, generating one only on a miss.
         - Sets up conditional transitions based on the number of rounds.
     """
     builder = StateGraph(State)
+    builder.add_node("prompt_cache_lookup", prompt_cache_lookup_node)
     builder.add_node("prompt_generation", prompt_generation_node)
     builder.add_node("generate", generation_node)
     builder.add_node("reflect", reflection_node)
     builder.add_node("end", end_node)
-    builder.add_edge(START, "prompt_generation")
+    builder.add_edge(START, "prompt_cache_lookup")
     builder.add_edge("prompt_generation", "generate")
     builder.add_edge("reflect", "generate")
     builder.add_edge("end", END)
@@ -228,7 +278,22 @@ def build_graph() -> CompiledStateGraph:
             return "end"
         return "reflect"
 
+    def should_generate_prompt(state: State) -> Literal["prompt_generation", "generate"]:
+        """
+        Skips the CoT prompt generation when the prompt cache had one.
+
+        Args:
+            state (State): The current conversation state.
+
+        Returns:
+            str: The name of the next node ('prompt_generation' or 'generate').
+        """
+        if state.get("cot_prompt"):
+            return "generate"
+        return "prompt_generation"
+
+    builder.add_conditional_edges("prompt_cache_lookup", should_generate_prompt)
     builder.add_conditional_edges("generate", should_continue)
-    memory = MemorySaver()
+    memory = get_checkpointer("cot_ls")
     graph = builder.compile(checkpointer=memory)
     return graph
@@ -0,0 +1,73 @@
+import os
+import re
+from typing import Dict, Tuple
+
+from app.common.result_cache import ResultCache
+
+
+DEFAULT_MAX_ENTRIES = 128
+
+# Keywords of each task category, matched as whole words; the category with most matches wins
+CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    "arithmetic": ("calculate", "compute", "how many", "how much", "sum", "total", "percent", "percentage",
+                   "average", "multiply", "divide", "subtract", "ratio", "probability", "equation", "solve"),
+    "logic": ("puzzle", "riddle", "deduce", "implies", "true or false", "which of the following", "if all",
+              "contradiction", "syllogism", "valid", "paradox"),
+    "definition": ("what is", "what are", "define", "definition", "meaning of", "who is", "who was"),
+    "explanation": ("why", "how does", "how do", "explain", "describe", "what causes", "reason"),
+    "comparison": ("compare", "comparison", "difference between", "differences", "versus", "vs",
+                   "pros and cons", "better than", "advantages"),
+    "procedure": ("how to", "how can i", "steps", "step by step", "guide", "instructions", "plan", "set up"),
+    "code": ("code", "function", "python", "javascript", "algorithm", "program", "bug", "sql", "regex",
+             "implement", "compile"),
+    "creative": ("write a", "story", "poem", "essay", "compose", "slogan", "lyrics"),
+}
+GENERAL = "general"
+
+_KEYWORD_PATTERNS = {
+    category: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b")
+    for category, keywords in CATEGORIES.items()
+}
+NUMBER_PATTERN = re.compile(r"\d")
+MATH_PATTERN = re.compile(r"\d\s*[-+*/^=%×÷]\s*\d|\d\s*%")
+ENUMERATION_PATTERN = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s", re.MULTILINE)
+
+
+def classify_task(question: str) -> str:
+    """
+    Classifies a question by its keywords and structure, without an LLM call.
+
+    The signature combines the question's category (e.g. "arithmetic", "comparison",
+    "general" when no keyword matches), whether it holds numbers or a formula, whether
+    it asks several things, and its length. Questions of the same kind share a
+    signature, and get near-identical CoT prompts.
+
+    Args:
+        question (str): The user's question.
+
+    Returns:
+        str: The signature, such as "arithmetic|numbers|math|single|short".
+    """
+    text = " ".join(question.lower().split())
+    scores = {category: len(pattern.findall(text)) for category, pattern in _KEYWORD_PATTERNS.items()}
+    # Formulas and percentages count as arithmetic keywords
+    scores["arithmetic"] += len(MATH_PATTERN.findall(text))
+    # Ties go to the first category listed
+    category = max(scores, key=scores.get) if any(scores.values()) else GENERAL
+    words = len(text.split())
+    parts = "multi" if question.count("?") > 1 or len(ENUMERATION_PATTERN.findall(question)) > 1 else "single"
+    return "|".join([
+        category,
+        "numbers" if NUMBER_PATTERN.search(text) else "text",
+        "math" if MATH_PATTERN.search(text) else "prose",
+        parts,
+        "short" if words < 20 else "medium" if words < 80 else "long",
+    ])
+
+
+# Generated CoT prompts by the classification of the question they were made for
+prompt_cache: ResultCache[str] = ResultCache(int(os.getenv("COT_PROMPT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)))
+
+
+def get_prompt_cache() -> ResultCache[str]:
+    return prompt_cache
@@ -1,19 +1,32 @@
 import logging
 import operator
 import os
+import sys
 from typing import Annotated, Dict, List, Tuple
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.lazy_import import lazy_import
+from app.common.web_search import get_tavily_tool
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import ToolNode
+from app.common.checkpointer import get_checkpointer
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
-from langchain_community.tools.tavily_search import TavilySearchResults
 from prompts import Prompts  # type: ignore
 
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+
+MAX_ROUNDS = 6
+
 # Configure logging
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -25,6 +38,7 @@ class PlanExecute(TypedDict):
     past_steps: Annotated[List[Tuple], operator.add]
     response: str
     messages: Annotated[List[BaseMessage], add_messages]
+    rounds: Annotated[int, operator.add]
 
 
 class Plan(BaseModel):
@@ -62,7 +76,7 @@ async def planner_node(state: PlanExecute, config: RunnableConfig) -> Dict:
     system_prompt = config["configurable"].get("system_prompt", Prompts.PLAN_AND_EXECUTE)
     partial_prompt = prompt.partial(system_prompt=system_prompt)
     llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"))
-    tool = TavilySearchResults(max_results=2)
+    tool = get_tavily_tool()
     tools = [tool]
     llm_with_tools = llm.bind_tools(tools)
     generate = partial_prompt | llm_with_tools
@@ -102,7 +116,7 @@ async def execute_node(state: PlanExecute, config: RunnableConfig) -> Dict:
     system_prompt = config["configurable"].get("system_prompt", Prompts.PLAN_AND_EXECUTE)
     partial_prompt = prompt.partial(system_prompt=system_prompt)
     llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"))
-    tool = TavilySearchResults(max_results=2)
+    tool = get_tavily_tool()
     tools = [tool]
     llm_with_tools = llm.bind_tools(tools)
     generate = partial_prompt | llm_with_tools
@@ -113,3 +127,44 @@ async def execute_node(state: PlanExecute, config: RunnableConfig) -> Dict:
         logging.error(f"Error in generation_node: {e}")
         return {"messages": [], "rounds": 1}
 
+
+def has_tool_calls(state: PlanExecute) -> bool:
+    messages = state.get("messages", [])
+    return bool(messages) and isinstance(messages[-1], AIMessage) and len(messages[-1].tool_calls) > 0
+
+
+def build_graph() -> CompiledStateGraph:
+    """
+    Builds and compiles the state graph for the plan and execute flow.
+
+    Returns:
+        CompiledStateGraph: The compiled state graph with nodes and transitions.
+
+    Notes:
+        - The planner and the executor each get their own tool node, so tool results
+          return to the node that asked for them.
+        - Tool loops stop after MAX_ROUNDS LLM calls.
+    """
+    builder = StateGraph(PlanExecute)
+    builder.add_node("planner", planner_node)
+    builder.add_node("planner_tools", ToolNode(tools=[get_tavily_tool()]))
+    builder.add_node("execute", execute_node)
+    builder.add_node("execute_tools", ToolNode(tools=[get_tavily_tool()]))
+    builder.add_edge(START, "planner")
+    builder.add_edge("planner_tools", "planner")
+    builder.add_edge("execute_tools", "execute")
+
+    def after_planner(state: PlanExecute) -> str:
+        if has_tool_calls(state) and state["rounds"] <= MAX_ROUNDS:
+            return "planner_tools"
+        return "execute"
+
+    def after_execute(state: PlanExecute) -> str:
+        if has_tool_calls(state) and state["rounds"] <= MAX_ROUNDS:
+            return "execute_tools"
+        return END
+
+    builder.add_conditional_edges("planner", after_planner)
+    builder.add_conditional_edges("execute", after_execute)
+    memory = get_checkpointer("plan_execute")
+    return builder.compile(checkpointer=memory)
@@ -4,21 +4,34 @@ import os
 import shutil
 import uuid
 import logging
-from typing import Dict, List, Any
+import sys
+from typing import Dict, List, Any, Optional, Tuple, Union
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.config import RunnableConfig
 from typing import Annotated
-from langchain_openai import ChatOpenAI
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.lazy_import import lazy_import
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from app.common.checkpointer import get_checkpointer
+from app.common.text_splitter import get_text_splitter
+from langgraph.types import Send
 from typing_extensions import TypedDict
-from colorama import Fore, Style
+
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+Fore = lazy_import("colorama", "Fore")
+Style = lazy_import("colorama", "Style")
 
 MAX_ROUNDS = 3
+# Characters of the long input kept in the conversation once its parts are merged
+LONG_INPUT_EXCERPT = 500
 
 
 def default_state() -> Dict:
@@ -193,12 +206,166 @@ def build_graph() -> CompiledStateGraph:
 
     builder.add_conditional_edges("generate", should_continue)
     builder.add_edge("reflect", "generate")
-    memory = MemorySaver()
+    memory = get_checkpointer("reflection")
     graph = builder.compile(checkpointer=memory)
     graph.get_state
     return graph
 
 
+def collect_partials(current: Optional[List[Tuple[int, str]]],
+                     update: Optional[List[Tuple[int, str]]]) -> List[Tuple[int, str]]:
+    # None clears the answers, so they do not carry over to the thread's next request
+    if update is None:
+        return []
+    return (current or []) + update
+
+
+class LongInputState(State):
+    """
+    Represents the state of the conversation in long-input mode.
+
+    Attributes:
+        chunks (List[str]): The latest user message, split by the text splitter.
+        partials (Annotated[List[Tuple[int, str]], collect_partials]): The answer to each chunk, with its index.
+    """
+    chunks: List[str]
+    partials: Annotated[List[Tuple[int, str]], collect_partials]
+
+
+class ChunkState(TypedDict):
+    """
+    Input of the map step for one chunk.
+
+    Attributes:
+        index (int): Position of the chunk in the input.
+        count (int): Number of chunks.
+        chunk (str): Text of the chunk.
+    """
+    index: int
+    count: int
+    chunk: str
+
+
+async def split_node(state: LongInputState) -> Dict:
+    """
+    Splits the latest user message into chunks with the shared text splitter.
+
+    Args:
+        state (LongInputState): The current conversation state.
+
+    Returns:
+        LongInputState: The chunks, and the answers of any earlier request cleared.
+    """
+    content = state["messages"][-1].content
+    return {"chunks": get_text_splitter().split_text(content), "partials": None}
+
+
+async def map_chunk_node(state: ChunkState) -> Dict:
+    """
+    Answers one chunk of the long input with the generation node.
+
+    Args:
+        state (ChunkState): The chunk and its position.
+
+    Returns:
+        LongInputState: The answer to the chunk, with its index.
+    """
+    message = HumanMessage(content=f"Part {state['index'] + 1} of {state['count']} of a longer input:\n\n"
+                                   f"{state['chunk']}")
+    result = await generation_node({"messages": [message], "rounds": 0})
+    content = result["messages"][0].content if result["messages"] else ""
+    return {"partials": [(state["index"], content)]}
+
+
+async def reduce_node(state: LongInputState) -> Dict:
+    """
+    Merges the answers to the chunks into a single answer.
+
+    Args:
+        state (LongInputState): The current conversation state with the answers to the chunks.
+
+    Returns:
+        LongInputState: The merged answer, and the long user message replaced by an excerpt.
+
+    Notes:
+        - The excerpt keeps the input out of later prompts, so reflection works on the merged answer only.
+        - If the merge fails, the answers are joined in order.
+    """
+    answers = [content for _, content in sorted(state["partials"])]
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a helpful assistant. A long input was split into parts, and each part was answered "
+                "separately. Merge the answers below into one coherent answer: keep every piece of information, "
+                "remove repetition and keep the order of the parts. "
+                "Always end your messages with a separating line followed by a final review of the work. ",
+            ),
+            ("human", "{answers}"),
+        ]
+    )
+    llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"))
+    merge = prompt | llm
+    try:
+        merged = await merge.ainvoke(
+            {"answers": "\n\n".join(f"Part {i + 1}:\n{answer}" for i, answer in enumerate(answers))}
+        )
+    except RuntimeError as e:
+        logging.error(f"Error in reduce_node: {e}")
+        merged = AIMessage(content="\n\n".join(answers))
+
+    request = state["messages"][-1]
+    excerpt = HumanMessage(
+        id=request.id,
+        content=f"{request.content[:LONG_INPUT_EXCERPT]}\n\n"
+                f"[Long input of {len(request.content)} characters, answered in {len(answers)} parts]",
+    )
+    return {"messages": [excerpt, merged], "rounds": 1}
+
+
+def build_long_input_graph() -> CompiledStateGraph:
+    """
+    Builds and compiles the long-input variant of the reflection graph.
+
+    Returns:
+        CompiledStateGraph: The compiled state graph.
+
+    Notes:
+        - The user message is split by the shared text splitter. Each chunk is answered by
+          the generation node concurrently (map), and the answers are merged (reduce).
+        - Reflection and regeneration then work on the merged answer, as in `build_graph`.
+        - A message that fits in one chunk goes straight to the generation node.
+    """
+    builder = StateGraph(LongInputState)
+    builder.add_node("split", split_node)
+    builder.add_node("map_chunk", map_chunk_node)
+    builder.add_node("reduce", reduce_node)
+    builder.add_node("generate", generation_node)
+    builder.add_node("reflect", reflection_node)
+    builder.add_node("end", end_node)
+    builder.add_edge(START, "split")
+    builder.add_edge("map_chunk", "reduce")
+    builder.add_edge("reflect", "generate")
+    builder.add_edge("end", END)
+
+    def map_chunks(state: LongInputState) -> Union[str, List[Send]]:
+        chunks = state["chunks"]
+        if len(chunks) <= 1:
+            return "generate"
+        return [Send("map_chunk", {"index": i, "count": len(chunks), "chunk": c}) for i, c in enumerate(chunks)]
+
+    def should_continue(state: LongInputState) -> str:
+        if state["rounds"] > MAX_ROUNDS:
+            return "end"
+        return "reflect"
+
+    builder.add_conditional_edges("split", map_chunks, ["map_chunk", "generate"])
+    builder.add_conditional_edges("reduce", should_continue, ["end", "reflect"])
+    builder.add_conditional_edges("generate", should_continue, ["end", "reflect"])
+    memory = get_checkpointer("reflection_long")
+    return builder.compile(checkpointer=memory)
+
+
 async def print_message(event: Dict[str, Any], config: RunnableConfig):
     """
     Prints the event message to the console with appropriate formatting and color.
@@ -1,19 +1,27 @@
 import operator
 import os
 import logging
+import sys
 from typing import Dict, List
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.config import RunnableConfig
 from typing import Annotated
-from langchain_openai import ChatOpenAI
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.lazy_import import lazy_import
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from app.common.checkpointer import get_checkpointer
 from typing_extensions import TypedDict
 from prompts import Prompts  # type: ignore
 
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+
 MAX_ROUNDS = 2
 
 
@@ -184,7 +192,7 @@ def build_graph() -> CompiledStateGraph:
 
     builder.add_conditional_edges("generate", should_continue)
     builder.add_edge("reflect", "generate")
-    memory = MemorySaver()
+    memory = get_checkpointer("reflection_react_ls")
     graph = builder.compile(checkpointer=memory)
     graph.get_state
     return graph
@@ -4,23 +4,32 @@ import os
 import shutil
 import uuid
 import logging
+import sys
 from typing import Dict, List, Any
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.config import RunnableConfig
-from langchain_community.tools.tavily_search import TavilySearchResults
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.lazy_import import lazy_import
+from app.common.web_search import get_tavily_tool
 from langgraph.prebuilt import ToolNode
 from typing import Annotated
-from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from app.common.checkpointer import get_checkpointer
 from typing_extensions import TypedDict
-from colorama import Fore, Style
 from prompts import Prompts  # type: ignore
 
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+Fore = lazy_import("colorama", "Fore")
+Style = lazy_import("colorama", "Style")
+
 MAX_ROUNDS = 3
 
 
@@ -75,7 +84,7 @@ async def generation_node(state: State, config: RunnableConfig) -> Dict:
     system_prompt = config["configurable"].get("system_prompt", Prompts.REACT)
     partial_prompt = prompt.partial(system_prompt=system_prompt)
     llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"))
-    tool = TavilySearchResults(max_results=2)
+    tool = get_tavily_tool()
     tools = [tool]
     llm_with_tools = llm.bind_tools(tools)
     generate = partial_prompt | llm_with_tools
@@ -173,7 +182,7 @@ def build_graph() -> CompiledStateGraph:
         - Sets up conditional transitions based on the number of rounds.
     """
 
-    tool = TavilySearchResults(max_results=2)
+    tool = get_tavily_tool()
 
     builder = StateGraph(State)
     # Tool node
@@ -214,7 +223,7 @@ def build_graph() -> CompiledStateGraph:
 
     builder.add_conditional_edges("generate", should_continue)
     builder.add_edge("reflect", "generate")
-    memory = MemorySaver()
+    memory = get_checkpointer("reflection_react_tool")
     graph = builder.compile(checkpointer=memory)
     graph.get_state
     return graph
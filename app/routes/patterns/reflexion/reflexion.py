@@ -5,15 +5,27 @@ import operator
 import shutil
 import uuid
 import logging
+import sys
+import os
+from typing import Any
 from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.output_parsers.openai_tools import PydanticToolsParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from pydantic import ValidationErr
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common import web_search
+
+
+def get_tavily_tool() -> Any:
+    """
+    Returns the shared Tavily search tool, with five results.
+
+    The tool needs TAVILY_API_KEY only once it searches, not when it is created.
+    """
+    return web_search.get_tavily_tool(max_results=5)
 
-search = TavilySearchAPIWrapper()
-tavily_tool = TavilySearchResults(api_wrapper=search, max_results=5)
 
 # Configure logging
 log = logging.getLogger(__name__)
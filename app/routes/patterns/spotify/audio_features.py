@@ -0,0 +1,224 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import spotipy
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+
+from spotify_types import SpotifyID
+
+
+# Spotify rejects audio-features requests with more than 100 IDs
+BATCH_SIZE = 100
+
+FEATURES: Tuple[str, ...] = (
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "liveness",
+    "loudness",
+    "speechiness",
+    "tempo",
+    "valence",
+)
+
+# Ranges used to bring every feature to [0, 1] before computing distances.
+# Most features are already in [0, 1]; loudness is in dB and tempo in BPM.
+FEATURE_RANGES: Dict[str, Tuple[float, float]] = {
+    "loudness": (-60.0, 0.0),
+    "tempo": (0.0, 250.0),
+}
+
+
+def _track_id(track: str) -> SpotifyID:
+    # Accept "spotify:track:<id>" URIs as well as bare IDs
+    return SpotifyID(track.rsplit(":", 1)[-1])
+
+
+@retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(6))
+def _fetch_batch(sp: spotipy.Spotify, batch: List[SpotifyID]) -> List[Optional[Dict]]:
+    return sp.audio_features(batch)
+
+
+class AudioFeaturesStore:
+    """
+    Batched, cached store of Spotify audio features backed by a NumPy matrix.
+
+    Features for a track are fetched once, in batches of up to 100 IDs, and kept as a
+    row of `matrix` (one column per entry of `FEATURES`, normalized to [0, 1]). Tracks
+    for which Spotify has no features are remembered so they are not requested again.
+    Reads and writes of the cache hold the same lock, so sessions can share the store.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._index: Dict[SpotifyID, int] = {}
+        self._raw: Dict[SpotifyID, Dict] = {}
+        self._missing: Set[SpotifyID] = set()
+        self._matrix = np.empty((capacity, len(FEATURES)), dtype=np.float32)
+        self._lock = threading.Lock()
+        lows = np.zeros(len(FEATURES), dtype=np.float32)
+        spans = np.ones(len(FEATURES), dtype=np.float32)
+        for i, name in enumerate(FEATURES):
+            if name in FEATURE_RANGES:
+                low, high = FEATURE_RANGES[name]
+                lows[i], spans[i] = low, high - low
+        self._lows = lows
+        self._spans = spans
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def __contains__(self, track: str) -> bool:
+        with self._lock:
+            return _track_id(track) in self._index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        Normalized feature matrix, one row per cached track in insertion order.
+        """
+        with self._lock:
+            return self._matrix[: len(self._index)].copy()
+
+    def clear(self) -> None:
+        """
+        Drops the features of every track, so they are requested again.
+        """
+        with self._lock:
+            self._index.clear()
+            self._raw.clear()
+            self._missing.clear()
+
+    def _add(self, track_id: SpotifyID, features: Dict) -> None:
+        row = len(self._index)
+        if row == self._matrix.shape[0]:
+            grown = np.empty((row * 2, len(FEATURES)), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+        values = np.array([features.get(name) or 0.0 for name in FEATURES], dtype=np.float32)
+        self._matrix[row] = np.clip((values - self._lows) / self._spans, 0.0, 1.0)
+        self._index[track_id] = row
+        self._raw[track_id] = features
+
+    def fetch(self, sp: spotipy.Spotify, tracks: Iterable[str]) -> None:
+        """
+        Ensures features for `tracks` are cached, requesting only unknown IDs in batches.
+
+        Args:
+            sp (spotipy.Spotify): Spotify client used for cache misses.
+            tracks (Iterable[str]): Track IDs or URIs.
+        """
+        with self._lock:
+            pending = [
+                t for t in dict.fromkeys(_track_id(t) for t in tracks)
+                if t not in self._index and t not in self._missing
+            ]
+        for i in range(0, len(pending), BATCH_SIZE):
+            batch = pending[i : i + BATCH_SIZE]
+            results = _fetch_batch(sp, batch) or []
+            with self._lock:
+                found = set()
+                for features in results:
+                    if features and features.get("id") and features["id"] not in self._index:
+                        self._add(SpotifyID(features["id"]), features)
+                        found.add(features["id"])
+                self._missing.update(t for t in batch if t not in found and t not in self._index)
+
+    def raw(self, tracks: Iterable[str]) -> List[Optional[Dict]]:
+        """
+        Returns the audio features as returned by Spotify, None for unknown tracks.
+        """
+        with self._lock:
+            return [self._raw.get(_track_id(t)) for t in tracks]
+
+    def vectors(self, tracks: Iterable[str]) -> Tuple[List[SpotifyID], np.ndarray]:
+        """
+        Returns the cached tracks among `tracks` and their normalized feature rows.
+
+        Returns:
+            Tuple[List[SpotifyID], np.ndarray]: Track IDs with features, and a
+                (len(ids), len(FEATURES)) matrix in the same order.
+        """
+        with self._lock:
+            return self._vectors(tracks)
+
+    def _vectors(self, tracks: Iterable[str]) -> Tuple[List[SpotifyID], np.ndarray]:
+        ids = [t for t in dict.fromkeys(_track_id(t) for t in tracks) if t in self._index]
+        rows = np.fromiter((self._index[t] for t in ids), dtype=np.intp, count=len(ids))
+        # Fancy indexing copies the rows, so the result does not change with later writes
+        return ids, self._matrix[rows]
+
+    def rank_by_similarity(self, seed_tracks: Iterable[str], candidate_tracks: Iterable[str],
+                           limit: Optional[int] = None) -> List[Tuple[SpotifyID, float]]:
+        """
+        Ranks candidates by distance to the centroid of the seed tracks.
+
+        Args:
+            seed_tracks (Iterable[str]): Tracks describing the target sound, e.g. a playlist.
+            candidate_tracks (Iterable[str]): Tracks to rank.
+            limit (Optional[int]): Number of nearest candidates to return. None returns all.
+
+        Returns:
+            List[Tuple[SpotifyID, float]]: (track ID, distance) pairs, nearest first.
+                Tracks without cached features are skipped.
+        """
+        with self._lock:
+            _, seeds = self._vectors(seed_tracks)
+            ids, candidates = self._vectors(candidate_tracks)
+        if not ids or len(seeds) == 0:
+            return []
+        distances = np.linalg.norm(candidates - seeds.mean(axis=0), axis=1)
+        if limit is not None and limit < len(ids):
+            order = np.argpartition(distances, limit)[:limit]
+            order = order[np.argsort(distances[order], kind="stable")]
+        else:
+            order = np.argsort(distances, kind="stable")
+        return [(ids[i], float(distances[i])) for i in order]
+
+    def sequence(self, tracks: Iterable[str], seed_tracks: Optional[Iterable[str]] = None) -> List[SpotifyID]:
+        """
+        Orders tracks for smooth transitions with a greedy nearest-neighbour walk.
+
+        The walk starts from the track closest to the seed centroid (or to the centroid
+        of `tracks` when no seeds are given) and repeatedly moves to the closest track
+        not played yet. Tracks without cached features are appended at the end.
+
+        Args:
+            tracks (Iterable[str]): Tracks to order.
+            seed_tracks (Optional[Iterable[str]]): Tracks the sequence should start close to.
+
+        Returns:
+            List[SpotifyID]: Track IDs in playing order.
+        """
+        all_ids = list(dict.fromkeys(_track_id(t) for t in tracks))
+        with self._lock:
+            ids, vectors = self._vectors(all_ids)
+            leftover = [t for t in all_ids if t not in self._index]
+            _, seeds = self._vectors(seed_tracks or [])
+        if not ids:
+            return leftover
+
+        anchor = seeds.mean(axis=0) if len(seeds) else vectors.mean(axis=0)
+        # Pairwise distances computed once; visited tracks are masked with +inf
+        squared = np.einsum("ij,ij->i", vectors, vectors)
+        pairwise = squared[:, None] + squared[None, :] - 2.0 * (vectors @ vectors.T)
+        np.maximum(pairwise, 0.0, out=pairwise)
+        np.fill_diagonal(pairwise, np.inf)
+
+        current = int(np.argmin(np.linalg.norm(vectors - anchor, axis=1)))
+        order = [current]
+        pairwise[:, current] = np.inf
+        for _ in range(len(ids) - 1):
+            current = int(np.argmin(pairwise[current]))
+            order.append(current)
+            pairwise[:, current] = np.inf
+        return [ids[i] for i in order] + leftover
+
+
+audio_features_store = AudioFeaturesStore()
+
+
+def get_audio_features_store() -> AudioFeaturesStore:
+    return audio_features_store
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import spotipy
+
+from spotify_types import SpotifyID
+
+
+CACHE_FILE = "related_artists_cache.json"
+# Related artists drift slowly; a week keeps repeated sessions cheap without going stale
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+MAX_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+class RelatedArtistsGraph:
+    """
+    Persistent adjacency cache of the Spotify related-artist graph.
+
+    Each entry maps an artist ID to the related artists returned by the API together
+    with the time the edge list was fetched. Entries older than `ttl` seconds are
+    refetched. The cache is stored as JSON so it survives across runs, in the same
+    spirit as the artist name to URI cache used by spotify_ls.
+
+    Attributes:
+        cache_file (str): Path of the JSON file backing the cache.
+        ttl (float): Maximum age in seconds of a cached edge list.
+        max_workers (int): Number of concurrent API calls when expanding a frontier.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE, ttl: float = CACHE_TTL_SECONDS,
+                 max_workers: int = MAX_WORKERS):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._edges: Optional[Dict[str, Dict]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.api_calls = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._edges is None:
+            edges: Dict[str, Dict] = {}
+            if os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, "r", encoding="utf-8") as f:
+                        edges = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable related artists cache {self.cache_file}: {e}")
+            self._edges = edges
+        return self._edges
+
+    def save(self) -> None:
+        """
+        Writes the cache to disk if it changed since it was loaded.
+        """
+        with self._lock:
+            if not self._dirty or self._edges is None:
+                return
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._edges, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+
+    def clear(self) -> None:
+        """
+        Drops every cached edge list, in memory and on disk.
+        """
+        with self._lock:
+            self._edges = {}
+            self._dirty = False
+            if os.path.exists(self.cache_file):
+                os.remove(self.cache_file)
+
+    def _is_fresh(self, entry: Optional[Dict]) -> bool:
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def cached_neighbors(self, artist: SpotifyID) -> Optional[List[Dict[str, str]]]:
+        """
+        Returns the cached related artists for `artist`, or None if missing or expired.
+        """
+        entry = self._load().get(artist)
+        return entry["related"] if self._is_fresh(entry) else None
+
+    def _fetch(self, sp: spotipy.Spotify, artist: SpotifyID) -> Optional[List[Dict[str, str]]]:
+        try:
+            items = sp.artist_related_artists(artist)["artists"]
+        except Exception as e:
+            logger.warning(f"Unexpected error for artist {artist}: {str(e)}")
+            return None
+        related = [{"id": item["id"], "name": item.get("name")} for item in items if item.get("id")]
+        with self._lock:
+            self.api_calls += 1
+            self._load()[artist] = {"fetched_at": time.time(), "related": related}
+            self._dirty = True
+        return related
+
+    def neighbors_many(self, sp: spotipy.Spotify, artists: Iterable[SpotifyID]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Returns related artists for every artist, fetching cache misses concurrently.
+
+        Args:
+            sp (spotipy.Spotify): Spotify client used for cache misses.
+            artists (Iterable[SpotifyID]): Artist IDs.
+
+        Returns:
+            Dict[str, List[Dict[str, str]]]: Artist ID to a list of {"id", "name"} dicts.
+                Artists whose lookup failed are omitted.
+        """
+        result: Dict[str, List[Dict[str, str]]] = {}
+        misses: List[SpotifyID] = []
+        for artist in dict.fromkeys(artists):
+            cached = self.cached_neighbors(artist)
+            if cached is None:
+                misses.append(artist)
+            else:
+                result[artist] = cached
+        if misses:
+            workers = max(1, min(self.max_workers, len(misses)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for artist, related in zip(misses, executor.map(lambda a: self._fetch(sp, a), misses)):
+                    if related is not None:
+                        result[artist] = related
+        return result
+
+    def expand(self, sp: spotipy.Spotify, seeds: List[SpotifyID], hops: int = 1,
+               fan_out: Optional[int] = None) -> Dict[SpotifyID, str]:
+        """
+        Breadth-first expansion of the related-artist graph starting from `seeds`.
+
+        Args:
+            sp (spotipy.Spotify): Spotify client used for cache misses.
+            seeds (List[SpotifyID]): Starting artist IDs.
+            hops (int): Number of hops to expand. 1 returns direct neighbours only.
+            fan_out (Optional[int]): Maximum number of neighbours followed per artist,
+                in Spotify's relevance order. None follows every neighbour.
+
+        Returns:
+            Dict[SpotifyID, str]: Discovered artist IDs mapped to their names, seeds excluded.
+        """
+        visited = set(seeds)
+        discovered: Dict[SpotifyID, str] = {}
+        frontier = list(dict.fromkeys(seeds))
+        for _ in range(max(0, hops)):
+            if not frontier:
+                break
+            adjacency = self.neighbors_many(sp, frontier)
+            next_frontier: List[SpotifyID] = []
+            for artist in frontier:
+                related = adjacency.get(artist, [])
+                if fan_out is not None:
+                    related = related[:fan_out]
+                for item in related:
+                    artist_id = SpotifyID(item["id"])
+                    if artist_id in visited:
+                        continue
+                    visited.add(artist_id)
+                    discovered[artist_id] = item["name"]
+                    next_frontier.append(artist_id)
+            frontier = next_frontier
+        self.save()
+        return discovered
+
+
+related_artists_graph = RelatedArtistsGraph()
+
+
+def get_related_artists_graph() -> RelatedArtistsGraph:
+    return related_artists_graph
@@ -1,17 +1,45 @@
 import os
+import sys
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 from spotipy.oauth2 import SpotifyOAuth
 from langchain_core.tools import tool
-from typing import Any, List, Set, Dict
+from typing import Any, List, Optional, Set, Dict
+from langchain_core.runnables.config import RunnableConfig
 
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
 from state import State, get_state
+from related_artists import get_related_artists_graph
+from audio_features import get_audio_features_store
 from spotify_model import Playlist, Track, Tracks
 from spotify_types import SpotifyID
 
 
+def get_standin_client() -> Optional[spotipy.Spotify]:
+    """
+    Returns a client pointed at a local Spotify API stand-in when `SPOTIFY_API_BASE_URL` is set.
+
+    The stand-in lives in `spotify_ls/utils/spotify_standin.py`.
+
+    Returns:
+        Optional[spotipy.Spotify]: A client for the stand-in, or None to use the live API.
+    """
+    base_url = os.environ.get("SPOTIFY_API_BASE_URL")
+    if not base_url:
+        return None
+    sp = spotipy.Spotify(auth="standin")
+    sp.prefix = base_url.rstrip("/") + "/"
+    return sp
+
+
 def get_spotify_user_authorization() -> spotipy.Spotify:
+    standin = get_standin_client()
+    if standin is not None:
+        return standin
+
     scopes = "user-library-modify, playlist-modify-private, playlist-modify-public"
 
     sp = spotipy.Spotify(auth_manager=SpotifyOAuth(scope=scopes,
@@ -29,6 +57,10 @@ def get_spotify_client() -> spotipy.Spotify:
     Returns:
         spotipy.Spotify: An authenticated Spotify client.
     """
+    standin = get_standin_client()
+    if standin is not None:
+        return standin
+
     auth_manager = SpotifyClientCredentials(
         client_id=os.environ.get("SPOTIFY_CLIENT_ID"),
         client_secret=os.environ.get("SPOTIFY_CLIENT_SECRET"),
@@ -84,7 +116,7 @@ def get_spotify_client() -> spotipy.Spotify:
 
 
 @tool
-def get_playlists() -> List[Playlist]:
+def get_playlists(config: RunnableConfig) -> List[Playlist]:
     """
     Retrieves all Spotify Playlist IDs. Each playlist includes the Spotify URI and other relevant data
 
@@ -114,7 +146,7 @@ def get_playlists() -> List[Playlist]:
         return [str(e)]
 
     # Save state
-    state: (State) = get_state()
+    state: (State) = get_state(config)
     state["playlists"] = playlists
 
     # Serialize the playlists to JSON-serializable dictionaries
@@ -123,7 +155,7 @@ def get_playlists() -> List[Playlist]:
 
 
 @tool
-def get_track_list_from_playlist(playlist_id: SpotifyID) -> List[Dict[str, Any]]:
+def get_track_list_from_playlist(playlist_id: SpotifyID, config: RunnableConfig) -> List[Dict[str, Any]]:
     """
     Retrieves the track list for a specific Spotify playlist.
 
@@ -168,9 +200,9 @@ def get_track_list_from_playlist(playlist_id: SpotifyID) -> List[Dict[str, Any]]
         return [{"error": str(e)}]
 
     # Save state
-    state = get_state()
+    state = get_state(config)
     state["tracks"] = playlist_tracks
-    state["artists"] = playlist_artists
+    state["artist_names"] = playlist_artists
 
     # Serialize the tracks to JSON-serializable dictionaries
     serialized_tracks = [track.model_dump() for track in playlist_tracks]
@@ -178,7 +210,6 @@ def get_track_list_from_playlist(playlist_id: SpotifyID) -> List[Dict[str, Any]]
 
 
 @tool
-@retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(6))
 def get_audio_features(tracks: List[SpotifyID]):
     """
     Get audio features such as acousticness, danceability, energy, instrumentalness, tempo and valence.
@@ -190,13 +221,52 @@ def get_audio_features(tracks: List[SpotifyID]):
         Dict[str, Any]: Dictionary representing tracks audio features
     """
 
-    sp = get_spotify_client()
-    audio_features = sp.audio_features(tracks)
-    return audio_features
+    store = get_audio_features_store()
+    store.fetch(get_spotify_client(), tracks)
+    return store.raw(tracks)
 
 
 @tool
-def create_spotify_playlist(name: str, description: str) -> Dict[str, Any]:
+def rank_tracks_by_similarity(seed_tracks: List[SpotifyID], candidate_tracks: List[SpotifyID],
+                              limit: Optional[int] = None) -> List[SpotifyID]:
+    """
+    Ranks candidate tracks by how close their audio features are to a set of seed tracks.
+
+    Use it to pick the candidates that best match the vibe of an existing playlist.
+
+    Args:
+        seed_tracks (List[SpotifyID]): Spotify track IDs describing the target sound.
+        candidate_tracks (List[SpotifyID]): Spotify track IDs to rank.
+        limit (Optional[int]): Number of tracks to return. All candidates if not set.
+
+    Returns:
+        List[SpotifyID]: Candidate track IDs, most similar first.
+    """
+    store = get_audio_features_store()
+    store.fetch(get_spotify_client(), list(seed_tracks) + list(candidate_tracks))
+    return [track for track, _ in store.rank_by_similarity(seed_tracks, candidate_tracks, limit)]
+
+
+@tool
+def order_tracks_for_playlist(tracks: List[SpotifyID],
+                              seed_tracks: Optional[List[SpotifyID]] = None) -> List[SpotifyID]:
+    """
+    Orders tracks for a smooth listening experience based on tempo, energy, mood and other audio features.
+
+    Args:
+        tracks (List[SpotifyID]): Spotify track IDs to order.
+        seed_tracks (Optional[List[SpotifyID]]): Spotify track IDs the playlist should open close to.
+
+    Returns:
+        List[SpotifyID]: The same track IDs in playing order.
+    """
+    store = get_audio_features_store()
+    store.fetch(get_spotify_client(), list(tracks) + list(seed_tracks or []))
+    return store.sequence(tracks, seed_tracks)
+
+
+@tool
+def create_spotify_playlist(name: str, description: str, config: RunnableConfig) -> Dict[str, Any]:
     """
     Creates a new playlist on Spotify.
 
@@ -235,7 +305,7 @@ def create_spotify_playlist(name: str, description: str) -> Dict[str, Any]:
             collaborative=new_playlist_data.get('collaborative'),
             snapshot_id=new_playlist_data.get('snapshot_id')
         )
-        state: State = get_state()
+        state: State = get_state(config)
         state["new_playlist"] = new_playlist
     except spotipy.SpotifyException as e:
         return {"error": str(e)}
@@ -263,7 +333,8 @@ def add_tracks_to_playlist(playlist_id: SpotifyID, tracks: List[SpotifyID]) -> D
 
 
 @tool
-def filter_artists(playlist_id: SpotifyID, new_artists: List[SpotifyID]) -> Set[SpotifyID]:
+def filter_artists(playlist_id: SpotifyID, new_artists: List[SpotifyID],
+                   config: RunnableConfig) -> Set[SpotifyID]:
     """
     Checks `new_artists` against an existing Playlist. It returns a set
      of artists that can be used in a new playlist.
@@ -276,10 +347,10 @@ def filter_artists(playlist_id: SpotifyID, new_artists: List[SpotifyID]) -> Set[
     Returns:
         Dict[str, Set[SpotifyID]]: List of artists Spotify IDs that can be used in a new playlist
     """
-    state: State = get_state()
+    state: State = get_state(config)
     artists: Set[SpotifyID] = set()
     state['candidate_artists'] = set(new_artists)
-    for v in state["artists"].keys():
+    for v in state.get("artists", {}).keys():
         artists.add(v)
     valid_artists = state['candidate_artists'] - artists
     state["valid_artists"] = valid_artists
@@ -287,30 +358,27 @@ def filter_artists(playlist_id: SpotifyID, new_artists: List[SpotifyID]) -> Set[
 
 
 @tool
-def find_similar_artists(artists: List[SpotifyID]) -> Dict[SpotifyID, str]:
+def find_similar_artists(artists: List[SpotifyID], hops: int = 1,
+                         fan_out: Optional[int] = None) -> Dict[SpotifyID, str]:
     """
     Find similar artists for a given a list of Spotify artists IDs.
 
+    Related artists are served from a persistent cache, so repeated or overlapping
+    requests do not call the Spotify API again.
+
     Args:
         artists (List[SpotifyID]): List of Spotify artists IDs in the format <base-62 number>
+        hops (int): How far to walk the related-artist graph. 1 returns direct neighbours,
+            2 also returns neighbours of neighbours.
+        fan_out (Optional[int]): Maximum number of related artists followed per artist at
+            each hop. None follows all of them.
 
     Returns:
-       Set[SpotifyID]: A set of Spotify IDs.
+       Dict[SpotifyID, str]: Spotify IDs of similar artists mapped to their names.
     """
 
-    similar_artists: Dict[SpotifyID, str] = {}
     sp = get_spotify_client()
-    for artist in artists:
-        try:
-            related_artists = sp.artist_related_artists(artist)["artists"]
-        except Exception as e:
-            print(f"Unexpected error for artist {artist}: {str(e)}")
-            continue
-        for item in related_artists:
-            id = item.get("id")
-            if id and id not in artists:
-                similar_artists[id] = item.get("name")
-    return similar_artists
+    return get_related_artists_graph().expand(sp, artists, hops=hops, fan_out=fan_out)
 
 
 @tool
@@ -339,7 +407,7 @@ def find_top_tracks(artists: List[SpotifyID]) -> List[SpotifyID]:
 
 
 @tool
-def get_artists_from_playlist(playlist_id: SpotifyID) -> Dict[SpotifyID, str]:
+def get_artists_from_playlist(playlist_id: SpotifyID, config: RunnableConfig) -> Dict[SpotifyID, str]:
     """
     Get the list of unique artists from a Spotify playlist URI
 
@@ -373,8 +441,24 @@ def get_artists_from_playlist(playlist_id: SpotifyID) -> Dict[SpotifyID, str]:
         return {SpotifyID("error"): str(e)}
 
     # Save state
-    state = get_state()
+    state = get_state(config)
     state["artists"] = playlist_artists
 
     # Serialize the tracks to JSON-serializable dictionaries
     return playlist_artists
+
+
+def get_spotify_tools() -> List:
+    return [
+        get_playlists,
+        get_track_list_from_playlist,
+        get_audio_features,
+        rank_tracks_by_similarity,
+        order_tracks_for_playlist,
+        create_spotify_playlist,
+        add_tracks_to_playlist,
+        filter_artists,
+        find_similar_artists,
+        find_top_tracks,
+        get_artists_from_playlist,
+    ]
@@ -1,9 +1,11 @@
-from typing import List, Annotated, Set, Dict
+from typing import List, Annotated, Optional, Set, Dict
 from typing_extensions import TypedDict
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables.config import RunnableConfig
 from langgraph.graph.message import add_messages
 from spotify_model import Playlist, Track
 from spotify_types import SpotifyID
+from app.common.session_store import ThreadScopedStore, get_thread_id
 
 
 class State(TypedDict, total=False):
@@ -23,11 +25,22 @@ class State(TypedDict, total=False):
     playlists: List[Playlist]
     tracks: List[Track]
     artists: Dict[SpotifyID, str]
+    artist_names: Set[str]
     messages: Annotated[List[BaseMessage], add_messages]
 
 
-state: State = State()
+# One State per graph thread, so concurrent sessions never see each other's data
+states: ThreadScopedStore[State] = ThreadScopedStore(State)
 
 
-def get_state():
-    return state
+def get_state(config: Optional[RunnableConfig] = None) -> State:
+    """
+    Returns the State of the thread the tool is running in.
+
+    Args:
+        config (Optional[RunnableConfig]): The tool's config; its `thread_id` selects the state.
+
+    Returns:
+        State: State scoped to the thread.
+    """
+    return states.get(get_thread_id(config))
@@ -0,0 +1,278 @@
+"""
+Benchmarks the Spotify tools and the spotify_ls graph against the local Spotify stand-in.
+
+Run from the `spotify_ls` directory:
+
+    python benchmarks/bench_spotify.py --iterations 20 --latency-ms 30 --jitter-ms 10
+    python benchmarks/bench_spotify.py --variant spotify --json bench_spotify.json
+
+Each tool is timed cold, with the caches it reads through emptied before every call,
+then warm, repeating the call with those caches filled.
+
+The end-to-end `build_graph()` run still talks to the LLM, so it only runs when
+`OPENAI_API_KEY` is set. Graph compilation is always timed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+PATTERN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATTERNS_ROOT = os.path.dirname(PATTERN_DIR)
+# The tools import `app.common`
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(PATTERNS_ROOT)))
+
+# Mirrors the "dependencies" entries of each variant's langgraph.json
+VARIANT_PATHS = {
+    "spotify_ls": [PATTERN_DIR, os.path.join(PATTERN_DIR, "models"), os.path.join(PATTERN_DIR, "utils")],
+    "spotify": [os.path.join(PATTERNS_ROOT, "spotify")],
+}
+
+
+def setup_paths(variant: str) -> None:
+    for path in reversed(VARIANT_PATHS[variant]):
+        sys.path.insert(0, path)
+    # The stand-in module is unique across variants, so it can always be found last
+    sys.path.append(os.path.join(PATTERN_DIR, "utils"))
+    sys.path.append(REPO_ROOT)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples: List[float], errors: int, requests: int, iterations: int) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "iterations": iterations,
+        "errors": errors,
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+        "requests_per_call": requests / iterations if iterations else 0.0,
+    }
+
+
+def is_error(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list) and result and isinstance(result[0], (str, dict)):
+        first = result[0]
+        return isinstance(first, dict) and "error" in first
+    return False
+
+
+def tool_cases(variant: str, fixtures: Dict[str, Any]) -> List[Tuple[str, Callable[[], Dict[str, Any]]]]:
+    """
+    Returns (tool name, argument factory) pairs in an order that satisfies the tools' shared state.
+    """
+    playlists = fixtures["playlists"]
+    source = playlists[0]
+    target = playlists[3]
+    artist_ids = list(fixtures["artists"].keys())[:10]
+    artist_names = [fixtures["artists"][a]["name"] for a in artist_ids]
+    track_ids = list(fixtures["tracks"].keys())[:100]
+
+    if variant == "spotify":
+        return [
+            ("get_playlists", lambda: {}),
+            ("get_track_list_from_playlist", lambda: {"playlist_id": source["id"]}),
+            ("get_artists_from_playlist", lambda: {"playlist_id": source["id"]}),
+            ("filter_artists", lambda: {"playlist_id": source["id"], "new_artists": artist_ids}),
+            ("find_similar_artists", lambda: {"artists": artist_ids}),
+            ("find_top_tracks", lambda: {"artists": artist_ids}),
+            ("get_audio_features", lambda: {"tracks": track_ids}),
+            ("create_spotify_playlist", lambda: {"name": "Benchmark", "description": "Benchmark"}),
+            ("add_tracks_to_playlist", lambda: {"playlist_id": target["id"], "tracks": track_ids}),
+        ]
+
+    source_uri = f"spotify:playlist:{source['id']}"
+    artist_uris = [f"spotify:artist:{a}" for a in artist_ids]
+    return [
+        ("get_playlists", lambda: {}),
+        ("get_artists_from_playlist", lambda: {"playlist_id": source_uri}),
+        ("filter_artists_by_id", lambda: {"playlist_id": source_uri, "new_artists": artist_uris}),
+        ("filter_artists_by_name", lambda: {"playlist_id": source_uri, "new_artists": artist_names}),
+        ("find_top_tracks", lambda: {"artists": artist_uris}),
+        ("find_top_tracks_by_name", lambda: {"artists": artist_names}),
+        ("create_spotify_playlist", lambda: {"name": "Benchmark", "description": "Benchmark"}),
+        ("add_tracks_to_playlist", lambda: {
+            "playlist_id": f"spotify:playlist:{target['id']}",
+            "tracks": [f"spotify:track:{t}" for t in track_ids],
+        }),
+    ]
+
+
+def load_tools(variant: str) -> Dict[str, Any]:
+    if variant == "spotify":
+        import spotify_tools  # type: ignore
+
+        return {name: getattr(spotify_tools, name) for name in dir(spotify_tools)
+                if hasattr(getattr(spotify_tools, name), "invoke")}
+    from tools.spotify_tools import get_spotify_tools  # type: ignore
+
+    return {t.name: t for t in get_spotify_tools()}
+
+
+def cache_reset(variant: str) -> Callable[[], None]:
+    """
+    Returns a function emptying the caches the tools of `variant` read through.
+    """
+    if variant == "spotify":
+        from audio_features import get_audio_features_store  # type: ignore
+        from related_artists import get_related_artists_graph  # type: ignore
+
+        def reset() -> None:
+            get_related_artists_graph().clear()
+            get_audio_features_store().clear()
+
+        return reset
+    from utils.spotify_apis import CACHE_FILE  # type: ignore
+    from utils.tool_cache import get_tool_cache  # type: ignore
+
+    def reset() -> None:
+        # The tools run outside a graph, in the default thread
+        get_tool_cache().clear()
+        if os.path.exists(CACHE_FILE):
+            os.remove(CACHE_FILE)
+
+    return reset
+
+
+def bench_tools(variant: str, server: Any, fixtures: Dict[str, Any], iterations: int) -> List[Dict[str, Any]]:
+    tools = load_tools(variant)
+    reset = cache_reset(variant)
+    results = []
+    for name, make_args in tool_cases(variant, fixtures):
+        tool = tools[name]
+        # The last cold call fills the caches for the warm ones
+        for phase in ("cold", "warm"):
+            samples: List[float] = []
+            errors = 0
+            requests_before = server.request_count
+            for _ in range(iterations):
+                if phase == "cold":
+                    reset()
+                args = make_args()
+                start = time.perf_counter()
+                try:
+                    result = tool.invoke(args)
+                    if is_error(result):
+                        errors += 1
+                except Exception as e:
+                    errors += 1
+                    result = e
+                samples.append(time.perf_counter() - start)
+            if errors:
+                print(f"{name} ({phase}): {errors} error(s), last result: {str(result)[:200]}")
+            results.append(summarize(f"{name} ({phase})", samples, errors,
+                                     server.request_count - requests_before, iterations))
+    return results
+
+
+async def bench_graph(server: Any, runs: int) -> List[Dict[str, Any]]:
+    from langchain_core.messages import HumanMessage
+    from main import build_graph  # type: ignore
+    from prompts import Prompts  # type: ignore
+
+    compile_samples = []
+    graph = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        graph = build_graph()
+        compile_samples.append(time.perf_counter() - start)
+    results = [summarize("build_graph", compile_samples, 0, 0, runs)]
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("OPENAI_API_KEY not set, skipping end-to-end graph run")
+        return results
+
+    samples: List[float] = []
+    errors = 0
+    requests_before = server.request_count
+    for _ in range(runs):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 200}
+        start = time.perf_counter()
+        try:
+            await graph.ainvoke({"messages": [HumanMessage(content=Prompts.HUMAN)]}, config)
+        except Exception as e:
+            errors += 1
+            print(f"graph run failed: {e}")
+        samples.append(time.perf_counter() - start)
+    results.append(summarize("graph_run", samples, errors, server.request_count - requests_before, runs))
+    return results
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'benchmark':<38}{'n':>6}{'err':>6}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}{'req/call':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['name']:<38}{r['iterations']:>6}{r['errors']:>6}{r['mean_ms']:>12.2f}{r['p50_ms']:>12.2f}"
+              f"{r['p95_ms']:>12.2f}{r['max_ms']:>12.2f}{r['requests_per_call']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Spotify tools against the local stand-in")
+    parser.add_argument("--variant", choices=sorted(VARIANT_PATHS), default="spotify_ls")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--graph-runs", type=int, default=1)
+    parser.add_argument("--skip-graph", action="store_true")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    setup_paths(args.variant)
+    from spotify_standin import FIXTURES_FILE, StandinConfig, start_standin  # type: ignore
+
+    config = StandinConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        page_size=args.page_size,
+        rate_limit_every=args.rate_limit_every,
+        seed=args.seed,
+    )
+    server = start_standin(config)
+    os.environ["SPOTIFY_API_BASE_URL"] = server.base_url
+    with open(FIXTURES_FILE, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+    os.environ.setdefault("SPOTIFY_USER_ID", fixtures["user_id"])
+
+    # Tools persist name lookups relative to the working directory; keep the
+    # committed cache untouched and make every run start cold.
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            results = bench_tools(args.variant, server, fixtures, args.iterations)
+            if args.variant == "spotify_ls" and not args.skip_graph:
+                results += asyncio.run(bench_graph(server, args.graph_runs))
+            os.chdir(cwd)
+    finally:
+        server.shutdown()
+
+    print_report(results)
+    print(f"\nstand-in requests: {server.request_count}, injected 429s: {server.rate_limited_count}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"variant": args.variant, "config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Tool step benchmark: ToolNode versus ConcurrentToolNode.
+
+Builds one AIMessage with many tool calls, the way plan_exec_node does, and runs it
+through the stock ToolNode and through ConcurrentToolNode with the limits from
+main.py. The Spotify tools run against the local stand-in; find_artists_timeline is
+replaced by a stand-in that sleeps for `--slow-seconds`, to show a slow call being cut
+off at its deadline instead of stalling the step.
+
+Run from the `spotify_ls` directory:
+
+    python benchmarks/bench_tool_node.py --calls 24 --slow-seconds 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+PATTERN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in reversed([PATTERN_DIR, os.path.join(PATTERN_DIR, "models"), os.path.join(PATTERN_DIR, "utils")]):
+    sys.path.insert(0, path)
+# The tools import `app.common`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(PATTERN_DIR)))))
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.tools import tool  # noqa: E402
+from langgraph.prebuilt import ToolNode  # noqa: E402
+
+from app.common.tool_node import ConcurrentToolNode, ToolLatencyHistogram, ToolLimit  # noqa: E402
+from spotify_standin import FIXTURES_FILE, StandinConfig, start_standin  # type: ignore  # noqa: E402
+
+
+def make_slow_timeline(seconds: float):
+    @tool
+    def find_artists_timeline(artists: List[str], year: int = 2010) -> Dict[str, Any]:
+        """
+        Stand-in for the LLM-backed timeline tool that takes `seconds` to answer.
+        """
+        time.sleep(seconds)
+        return {"artists": [{"name": name, "success": True} for name in artists]}
+
+    return find_artists_timeline
+
+
+def build_calls(fixtures: Dict[str, Any], calls: int) -> AIMessage:
+    playlist = next(p for p in fixtures["playlists"] if p["tracks"])
+    artists = [f"spotify:artist:{a}" for a in list(fixtures["artists"])[:40]]
+    tool_calls = [
+        {"id": "call_timeline", "name": "find_artists_timeline", "args": {"artists": ["Buddy Guy"]}},
+        {"id": "call_playlist", "name": "get_artists_from_playlist",
+         "args": {"playlist_id": f"spotify:playlist:{playlist['id']}"}},
+    ]
+    for i in range(calls):
+        tool_calls.append({"id": f"call_top_{i}", "name": "find_top_tracks",
+                           "args": {"artists": artists[i % len(artists): i % len(artists) + 2]}})
+    return AIMessage(content="", tool_calls=tool_calls)
+
+
+async def run_node(node: Any, message: AIMessage) -> float:
+    start = time.perf_counter()
+    await node.ainvoke({"messages": [message]}, {"configurable": {"thread_id": "bench"}})
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ToolNode against ConcurrentToolNode")
+    parser.add_argument("--calls", type=int, default=24, help="find_top_tracks calls in the message")
+    parser.add_argument("--slow-seconds", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=1.0, help="find_artists_timeline deadline")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = start_standin(StandinConfig(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 2))
+    os.environ["SPOTIFY_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("SPOTIFY_USER_ID", "standin-user")
+    try:
+        from main import DEFAULT_TOOL_LIMIT, TOOL_LIMITS  # type: ignore
+        from tools.spotify_tools import get_spotify_tools  # type: ignore
+
+        with open(FIXTURES_FILE, "r", encoding="utf-8") as f:
+            fixtures = json.load(f)
+        message = build_calls(fixtures, args.calls)
+        tools = get_spotify_tools() + [make_slow_timeline(args.slow_seconds)]
+
+        stock = asyncio.run(run_node(ToolNode(tools), message))
+        print(f"ToolNode:            {stock:6.2f}s for {len(message.tool_calls)} calls")
+
+        limits = {**TOOL_LIMITS, "find_artists_timeline": ToolLimit(max_concurrency=4, timeout=args.timeout)}
+        histogram = ToolLatencyHistogram()
+        node = ConcurrentToolNode(tools, limits=limits, default_limit=DEFAULT_TOOL_LIMIT, histogram=histogram)
+        bounded = asyncio.run(run_node(node, message))
+        print(f"ConcurrentToolNode:  {bounded:6.2f}s for {len(message.tool_calls)} calls\n")
+        print(histogram.report())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
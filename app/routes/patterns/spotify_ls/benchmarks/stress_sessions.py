@@ -0,0 +1,111 @@
+"""
+Concurrency stress check for per-thread Spotify tool state.
+
+Runs many sessions concurrently against the local Spotify stand-in. Each session reads
+the artists of its own playlist and then filters a shared candidate list against them,
+with random delays in between so the sessions interleave. If tool state leaked across
+threads, a session would filter against another session's artists.
+
+Run from the `spotify_ls` directory:
+
+    python benchmarks/stress_sessions.py --sessions 500 --concurrency 64
+
+Exits with status 1 if any session observed another session's state.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Set
+
+PATTERN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in reversed([PATTERN_DIR, os.path.join(PATTERN_DIR, "models"), os.path.join(PATTERN_DIR, "utils")]):
+    sys.path.insert(0, path)
+# The tools import `app.common`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(PATTERN_DIR)))))
+
+from spotify_standin import FIXTURES_FILE, StandinConfig, start_standin  # type: ignore  # noqa: E402
+# Same module path as the tools use, so both see the same blob store
+from utils.blob_store import resolve_uris  # type: ignore  # noqa: E402
+
+
+def playlist_artists(fixtures: Dict[str, Any], playlist: Dict[str, Any]) -> Set[str]:
+    return {
+        f"spotify:artist:{artist}"
+        for track in playlist["tracks"]
+        for artist in fixtures["tracks"][track]["artists"]
+    }
+
+
+async def run_session(index: int, playlist: Dict[str, Any], candidates: List[str], expected: Set[str],
+                      tools: Dict[str, Any], semaphore: asyncio.Semaphore) -> bool:
+    config = {"configurable": {"thread_id": f"stress-{index}"}}
+    playlist_uri = f"spotify:playlist:{playlist['id']}"
+    async with semaphore:
+        await tools["get_artists_from_playlist"].ainvoke({"playlist_id": playlist_uri}, config)
+        # Give other sessions a chance to overwrite shared state, if there was any
+        await asyncio.sleep(random.random() * 0.01)
+        valid = await tools["filter_artists_by_id"].ainvoke(
+            {"playlist_id": playlist_uri, "new_artists": candidates}, config
+        )
+    if isinstance(valid, dict) and "handle" in valid:
+        valid = resolve_uris(valid["handle"])
+    return set(valid) == expected
+
+
+async def stress(sessions: int, concurrency: int) -> int:
+    from tools.spotify_tools import get_spotify_tools  # type: ignore
+    from models.spotify_state import spotify_states  # type: ignore
+
+    with open(FIXTURES_FILE, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+    playlists = [p for p in fixtures["playlists"] if p["tracks"]]
+    artists_by_playlist = [playlist_artists(fixtures, p) for p in playlists]
+    candidates = sorted(set().union(*artists_by_playlist))
+    tools = {t.name: t for t in get_spotify_tools()}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_session(
+            i,
+            playlists[i % len(playlists)],
+            candidates,
+            set(candidates) - artists_by_playlist[i % len(playlists)],
+            tools,
+            semaphore,
+        )
+        for i in range(sessions)
+    ])
+    elapsed = time.perf_counter() - start
+
+    failures = results.count(False)
+    print(f"sessions: {sessions}, concurrency: {concurrency}, elapsed: {elapsed:.2f}s, "
+          f"failures: {failures}, threads held in store: {len(spotify_states)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress per-thread Spotify tool state")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--jitter-ms", type=float, default=8.0)
+    args = parser.parse_args()
+
+    server = start_standin(StandinConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms))
+    os.environ["SPOTIFY_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("SPOTIFY_USER_ID", "standin-user")
+    try:
+        failures = asyncio.run(stress(args.sessions, args.concurrency))
+    finally:
+        server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from models.plan import Plan
+from utils.blob_store import get_blob_store, is_handle
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_TOKENS = 1200
+# Rough size of a token for English text and JSON, as the benchmarks estimate it
+CHARS_PER_TOKEN = 4
+# Characters of a tool result, of a user request and of the latest critique kept before
+# shrinking to the budget
+RESULT_PREVIEW_CHARS = 400
+REQUEST_CHARS = 400
+CRITIQUE_CHARS = 600
+
+DIGEST_NAME = "conversation_digest"
+# Name of the human messages holding the reflection's critiques of the plan
+REFLECTION_NAME = "reflection"
+DIGEST_HEADER = (
+    "Digest of the earlier conversation, which it replaces. Resolved IDs can be reused. Blob handles "
+    "in tool results can be passed to tools while they are available; if a tool reports one is no longer "
+    "available, call the tool it names again. Calls listed under \"expired\" have to be made again for "
+    "their results.\n"
+)
+URI_PATTERN = re.compile(r"^spotify:[a-z]+:[A-Za-z0-9]+$")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _is_uri(value: Any) -> bool:
+    return isinstance(value, str) and URI_PATTERN.match(value) is not None
+
+
+def _parse(content: Any) -> Any:
+    if not isinstance(content, str):
+        return content
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content
+
+
+def latest_request(messages: Sequence[BaseMessage]) -> Optional[HumanMessage]:
+    """
+    Returns the user's latest request: the last human message that is not a critique.
+    """
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage) and message.name != REFLECTION_NAME:
+            return message
+    return None
+
+
+def collect_ids(value: Any, ids: Dict[str, str]) -> None:
+    """
+    Adds the name to URI pairs found in a tool result or tool arguments to `ids`.
+
+    Recognizes objects with "name" and "uri" fields (playlists, tracks) and mappings
+    between names and URIs in either direction (artists of a playlist).
+    """
+    if isinstance(value, dict):
+        if isinstance(value.get("name"), str) and _is_uri(value.get("uri")):
+            ids[value["name"]] = value["uri"]
+        for key, item in value.items():
+            if _is_uri(key) and isinstance(item, str) and not _is_uri(item):
+                ids[item] = key
+            elif _is_uri(item) and not _is_uri(key) and not key.endswith(("uri", "_id")):
+                ids[key] = item
+            else:
+                collect_ids(item, ids)
+    elif isinstance(value, list):
+        for item in value:
+            collect_ids(item, ids)
+
+
+def outline(plan: Plan) -> List[str]:
+    """
+    One line per step of the plan: its number, name and tool.
+    """
+    return [f"{step.step_number}. {step.name}" + (f" [{step.tool}]" if step.tool else "") for step in plan.steps]
+
+
+def summarize_result(content: Any, status: Optional[str]) -> Any:
+    """
+    Compact form of a tool result: a blob reference without its preview, an error, or
+    the result itself, cut to `RESULT_PREVIEW_CHARS`.
+    """
+    value = _parse(content)
+    if status == "error":
+        return {"error": str(value.get("error", value) if isinstance(value, dict) else value)[:RESULT_PREVIEW_CHARS]}
+    if isinstance(value, dict) and "handle" in value:
+        return {"handle": value["handle"], "count": value.get("count"), "summary": value.get("summary")}
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return value if len(text) <= RESULT_PREVIEW_CHARS else text[:RESULT_PREVIEW_CHARS] + "..."
+
+
+def read_digest(message: BaseMessage) -> Optional[Dict[str, Any]]:
+    """
+    Returns the digest held by a message made by `digest_message`, or None for other messages.
+    """
+    if getattr(message, "name", None) != DIGEST_NAME or not isinstance(message.content, str):
+        return None
+    # The header is a single line, whatever its wording when the digest was made
+    parsed = _parse(message.content.split("\n", 1)[-1])
+    return parsed if isinstance(parsed, dict) else None
+
+
+def build_digest(messages: Sequence[BaseMessage], plan: Optional[Plan] = None) -> Dict[str, Any]:
+    """
+    Builds the structured digest of a span of messages.
+
+    Args:
+        messages (Sequence[BaseMessage]): The span, in order. A digest made by an earlier
+            compaction is merged into the new one.
+        plan (Optional[Plan]): The current plan.
+
+    Returns:
+        Dict[str, Any]: "plan" (step outline, number of critiques and the latest one),
+            "requests" (user requests of older turns), "resolved_ids" (name to Spotify URI) and
+            "tool_results" (by blob handle, or by tool call ID for inline results: tool,
+            arguments and compact result), oldest first, and "expired" (tool and
+            arguments of the results whose blobs can no longer be read).
+    """
+    digest: Dict[str, Any] = {"plan": {}, "requests": [], "resolved_ids": {}, "tool_results": {}, "expired": []}
+    critiques = 0
+    calls: Dict[str, Dict[str, Any]] = {}
+    for message in messages:
+        earlier = read_digest(message)
+        if earlier is not None:
+            digest["requests"].extend(earlier.get("requests", []))
+            digest["resolved_ids"].update(earlier.get("resolved_ids", {}))
+            digest["tool_results"].update(earlier.get("tool_results", {}))
+            digest["expired"].extend(earlier.get("expired", []))
+            critiques += earlier.get("plan", {}).get("critiques", 0)
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                calls[call["id"]] = call
+        elif isinstance(message, ToolMessage):
+            call = calls.get(message.tool_call_id, {})
+            result = summarize_result(message.content, message.status)
+            collect_ids(call.get("args"), digest["resolved_ids"])
+            collect_ids(_parse(message.content), digest["resolved_ids"])
+            key = result["handle"] if isinstance(result, dict) and "handle" in result else message.tool_call_id
+            digest["tool_results"][key] = {"tool": message.name or call.get("name"), "args": call.get("args", {}),
+                                           "result": result}
+        elif isinstance(message, HumanMessage) and message.name == REFLECTION_NAME:
+            critiques += 1
+            digest["plan"]["latest_critique"] = str(message.content)[:CRITIQUE_CHARS]
+        elif isinstance(message, HumanMessage):
+            digest["requests"].append(str(message.content)[:REQUEST_CHARS])
+    # A handle whose blob is gone cannot be passed on; keep only the call that made it
+    store = get_blob_store()
+    for key in [key for key in digest["tool_results"] if is_handle(key) and key not in store]:
+        entry = digest["tool_results"].pop(key)
+        digest["expired"].append({"tool": entry["tool"], "args": entry["args"]})
+    if plan is not None:
+        digest["plan"]["outline"] = outline(plan)
+    digest["plan"]["critiques"] = critiques
+    return digest
+
+
+def render(digest: Dict[str, Any]) -> str:
+    return json.dumps(digest, ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_budget(digest: Dict[str, Any], budget_tokens: int) -> Dict[str, Any]:
+    """
+    Shrinks a digest until its rendering fits `budget_tokens`.
+
+    What the executor can least rediscover goes last: the latest critique is dropped
+    first, then the inline tool results are reduced to their tool and arguments, then
+    the oldest expired calls, tool results, resolved IDs and requests are dropped, then
+    the plan outline.
+    """
+    if estimate_tokens(render(digest)) <= budget_tokens:
+        return digest
+    digest["plan"].pop("latest_critique", None)
+    for entry in digest["tool_results"].values():
+        if estimate_tokens(render(digest)) <= budget_tokens:
+            return digest
+        if not (isinstance(entry["result"], dict) and "handle" in entry["result"]):
+            entry["result"] = "omitted"
+    for section in ("expired", "tool_results", "resolved_ids", "requests"):
+        while digest[section] and estimate_tokens(render(digest)) > budget_tokens:
+            if isinstance(digest[section], list):
+                digest[section].pop(0)
+            else:
+                del digest[section][next(iter(digest[section]))]
+    if estimate_tokens(render(digest)) > budget_tokens:
+        digest["plan"].pop("outline", None)
+    return digest
+
+
+def digest_message(digest: Dict[str, Any], id: str) -> AIMessage:
+    return AIMessage(content=DIGEST_HEADER + render(digest), name=DIGEST_NAME, id=id)
+
+
+def compact(messages: Sequence[BaseMessage], plan: Optional[Plan] = None,
+            budget_tokens: Optional[int] = None) -> List[BaseMessage]:
+    """
+    Returns the message updates replacing all messages but the first, the user's latest
+    request and the last by a digest.
+
+    The latest request stays a message of its own, so only older turns and the critiques
+    of the plan are digested. The digest takes the ID, and so the place, of the first
+    message replaced; the others are removed. Nothing is done when no message is left to
+    replace.
+
+    Args:
+        messages (Sequence[BaseMessage]): The conversation.
+        plan (Optional[Plan]): The current plan, outlined in the digest.
+        budget_tokens (Optional[int]): Estimated tokens the digest may take. Defaults to
+            the DIGEST_BUDGET_TOKENS environment variable, or `DEFAULT_BUDGET_TOKENS`.
+
+    Returns:
+        List[BaseMessage]: Updates for the `messages` channel.
+    """
+    request = latest_request(messages)
+    span = [m for m in messages[1:-1] if m is not request]
+    if not span:
+        return []
+    if budget_tokens is None:
+        budget_tokens = int(os.getenv("DIGEST_BUDGET_TOKENS", DEFAULT_BUDGET_TOKENS))
+    digest = fit_budget(build_digest(span, plan), budget_tokens)
+    replacement = digest_message(digest, span[0].id)
+    logger.info(
+        f"Compacted {len(span)} messages (~{sum(estimate_tokens(str(m.content)) for m in span)} tokens) "
+        f"into a digest of ~{estimate_tokens(replacement.content)} tokens"
+    )
+    return [replacement, *(RemoveMessage(id=m.id) for m in span[1:])]
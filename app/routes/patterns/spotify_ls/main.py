@@ -1,20 +1,35 @@
 import json
 import logging
 import os
+import time
+import sys
 from typing import Dict, Literal
 from dotenv import load_dotenv
 
 MAX_ROUNDS = 1
+# "llm" lets the LLM derive every tool call from the plan; "plan" walks the plan's
+# steps and calls their tools directly, asking the LLM only for reasoning steps
+PLAN_EXECUTOR = os.getenv("PLAN_EXECUTOR", "llm")
 
 # Tools imports
 
-from langgraph.prebuilt import ToolNode
+# Run from the pattern directory, `app` needs the repository root on the path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from app.common.metrics import get_metrics
+from app.common.tool_node import ConcurrentToolNode, ToolLimit
 from models.plan_critique import PlanCritique
 from tools_api import wrap_as_tool
 from search_tools import get_search_tools
+from plan_executor import PlanExecutor
+from plan_cache import get_plan_cache
+from request_text import TOOLS_SUFFIX
+from compaction import REFLECTION_NAME, compact, latest_request
 from tools.spotify_tools import get_spotify_tools
+from utils.tool_cache import get_tool_cache
 from models.plan import Plan, get_plan_tools
-from langchain_openai import ChatOpenAI
+from app.common.lazy_import import lazy_import
 
 # System Prompt imports
 
@@ -31,16 +46,33 @@ from prompts import Prompts
 
 # State
 
-from models.state import State, get_state
-from langchain_core.messages import RemoveMessage
+from models.state import State
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from app.common.checkpointer import get_checkpointer
 from langgraph.graph import END, StateGraph, START
 
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+
 
 load_dotenv(override=True)
 logger = logging.getLogger(__name__)
 
+# Per-tool execution limits. The search tools call the LLM and are the slowest; the
+# Spotify tools page through the API and are bounded by its rate limit.
+TOOL_LIMITS: Dict[str, ToolLimit] = {
+    "find_similar_artists": ToolLimit(max_concurrency=4, timeout=60.0),
+    "find_artists_timeline": ToolLimit(max_concurrency=4, timeout=60.0),
+    "find_top_tracks": ToolLimit(max_concurrency=4, timeout=30.0),
+    "find_top_tracks_by_name": ToolLimit(max_concurrency=4, timeout=30.0),
+    "add_tracks_to_playlist": ToolLimit(max_concurrency=2, timeout=30.0),
+}
+DEFAULT_TOOL_LIMIT = ToolLimit(max_concurrency=8, timeout=20.0)
+
+get_metrics().register_cache("tool_cache", lambda: (get_tool_cache().hits, get_tool_cache().misses))
+get_metrics().register_cache("plan_cache", lambda: (get_plan_cache().hits, get_plan_cache().misses),
+                             lambda: get_plan_cache().seconds_saved)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,6 +85,10 @@ def default_state() -> Dict:
     return {"messages": [], "rounds": 0}
 
 
+def create_llm() -> ChatOpenAI:
+    return ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"), temperature=1.0)
+
+
 async def patch_prompt_node(state: State, config: RunnableConfig) -> Dict:
     """
     Patch the user's prompt to include a list of Tools
@@ -71,15 +107,50 @@ async def patch_prompt_node(state: State, config: RunnableConfig) -> Dict:
     first_message = state["messages"][0]
     tools = get_spotify_tools() + get_search_tools()
     tools_schema = [wrap_as_tool(tool) for tool in tools]
-    prompt_suffix = (
-        f"\n- You have access to the following Tools: \n {json.dumps(tools_schema)}"
-    )
+    prompt_suffix = f"{TOOLS_SUFFIX} \n {json.dumps(tools_schema)}"
     new_prompt = HumanMessage(
         content=first_message.content + prompt_suffix, id=first_message.id
     )
     return {"messages": new_prompt}
 
 
+async def plan_cache_lookup_node(state: State, config: RunnableConfig) -> Dict:
+    """
+    Looks up a stored plan for the template of the user's latest request
+
+    Args:
+        state (State): The current conversation state containing messages and rounds.
+
+    Returns:
+        State: On a hit, the stored plan bound to the request's entities, recorded as the
+            planner's answer. On a miss, no plan and the time planning started.
+    """
+    request = latest_request(state["messages"])
+    plan = get_plan_cache().lookup(request.content) if request is not None else None
+    if plan is None:
+        # Clear any plan left by an earlier request on this thread
+        return {"planning_started": time.time(), "plan": None}
+    return {"messages": AIMessage(content=plan.model_dump_json()), "plan": plan}
+
+
+async def plan_cache_store_node(state: State, config: RunnableConfig) -> Dict:
+    """
+    Stores the final plan under the template of the user's latest request
+
+    Args:
+        state (State): The current conversation state containing messages and rounds.
+
+    Returns:
+        State: Unchanged.
+    """
+    plan = state.get("plan")
+    request = latest_request(state["messages"])
+    if plan is not None and request is not None:
+        planning_seconds = time.time() - state.get("planning_started", time.time())
+        get_plan_cache().store(request.content, plan, planning_seconds)
+    return {}
+
+
 async def planner_node(state: State, config: RunnableConfig) -> Dict:
     """
     Creates a plan to solve the user's request
@@ -181,7 +252,7 @@ async def reflection_node(state: State) -> Dict:
 
     # We treat the output of this as human feedback for the generator
     return {
-        "messages": [HumanMessage(content=llm_response["raw"].content)],
+        "messages": [HumanMessage(content=llm_response["raw"].content, name=REFLECTION_NAME)],
         "rounds": 1,
     }
 
@@ -226,22 +297,23 @@ async def plan_exec_node(state: State, config: RunnableConfig) -> Dict:
         return {"messages": []}
 
 
-async def prune_messages_node(state: State, config: RunnableConfig) -> Dict:
+async def compact_messages_node(state: State, config: RunnableConfig) -> Dict:
     """
-    Prune message list to get more accurate results
+    Replaces the older messages by a compact digest, keeping the first and latest requests and the plan
 
     Args:
         state (State): The current conversation state containing messages and rounds.
 
     Returns:
-        State: The updated state with the assistant's response and incremented rounds.
+        State: The updated messages: the first request, the digest, the latest request and the plan.
 
     Notes:
-        - Uses the ChatOpenAI model to generate the assistant's reply.
-        - If an error occurs, logs the error and returns a default state.
+        - The digest outlines the plan and keeps the resolved Spotify IDs and the tool
+          results by blob handle, so the executor need not call tools again to find them.
+          Results whose blobs can no longer be read are listed as calls to make again.
+        - The digest is kept under a token budget; see `compaction.compact`.
     """
-    messages = state["messages"]
-    return {"messages": [RemoveMessage(id=m.id) for m in messages[1:-1]]}
+    return {"messages": compact(state["messages"], state.get("plan"))}
 
 
 async def end_node(state: State) -> Dict:
@@ -269,19 +341,31 @@ def build_graph() -> CompiledStateGraph:
         - Sets up conditional transitions based on the number of rounds.
     """
     builder = StateGraph(State)
-    tool_node = ToolNode(get_spotify_tools() + get_search_tools())
+    tool_node = ConcurrentToolNode(
+        get_spotify_tools() + get_search_tools(), limits=TOOL_LIMITS, default_limit=DEFAULT_TOOL_LIMIT
+    )
     builder.add_node("patch_prompt", patch_prompt_node)
+    builder.add_node("plan_cache_lookup", plan_cache_lookup_node)
     builder.add_node("planner", planner_node)
     builder.add_node("reflection", reflection_node)
     builder.add_node("plan_exec", plan_exec_node)
-    builder.add_node("prune_messages", prune_messages_node)
+    builder.add_node("plan_cache_store", plan_cache_store_node)
+    builder.add_node("compact_messages", compact_messages_node)
+    builder.add_node("execute_plan", PlanExecutor(tool_node, create_llm).node)
     builder.add_node("end", end_node)
     builder.add_edge(START, "patch_prompt")
-    builder.add_edge("patch_prompt", "planner")
-    builder.add_edge("prune_messages", "plan_exec")
+    builder.add_edge("patch_prompt", "plan_cache_lookup")
+    builder.add_edge("plan_cache_store", "compact_messages")
+    builder.add_edge("execute_plan", "end")
     builder.add_edge("end", END)
 
-    def should_continue(state: State) -> Literal["prune_messages", "reflection"]:
+    def should_plan(state: State) -> Literal["planner", "compact_messages"]:
+        # A stored plan skips planning and reflection
+        if state.get("plan") is not None:
+            return "compact_messages"
+        return "planner"
+
+    def should_continue(state: State) -> Literal["plan_cache_store", "reflection"]:
         """
         Determines whether the conversation should continue or end.
 
@@ -292,9 +376,15 @@ def build_graph() -> CompiledStateGraph:
             str: The name of the next node ('end' or 'reflect').
         """
         if state["rounds"] > MAX_ROUNDS:
-            return "prune_messages"
+            return "plan_cache_store"
         return "reflection"
 
+    def choose_executor(state: State) -> Literal["execute_plan", "plan_exec"]:
+        # Without a parsed plan there is nothing to walk; let the LLM execute it
+        if PLAN_EXECUTOR == "plan" and state.get("plan") is not None:
+            return "execute_plan"
+        return "plan_exec"
+
     def should_call_tools(state: State) -> Literal["tools", "end"]:
         messages = state["messages"]
         last_message = messages[-1]
@@ -302,12 +392,14 @@ def build_graph() -> CompiledStateGraph:
             return "tools"
         return "end"
 
+    builder.add_conditional_edges("plan_cache_lookup", should_plan)
     builder.add_conditional_edges("planner", should_continue)
+    builder.add_conditional_edges("compact_messages", choose_executor)
     builder.add_edge("reflection", "planner")
 
     builder.add_node("tools", tool_node)
     builder.add_edge("tools", "plan_exec")
     builder.add_conditional_edges("plan_exec", should_call_tools)
-    memory = MemorySaver()
+    memory = get_checkpointer("spotify_ls")
     graph = builder.compile(checkpointer=memory)
     return graph
@@ -1,11 +1,9 @@
-import operator
-from typing import List, Annotated, Set, Dict
+from typing import List, Optional, Set, Dict
 from typing_extensions import TypedDict
-from langchain_core.messages import BaseMessage
-from langgraph.graph.message import add_messages
-from plan import Plan
+from langchain_core.runnables.config import RunnableConfig
 from spotify_model import Playlist, Track
 from models.spotify_types import SpotifyURI
+from app.common.session_store import ThreadScopedStore, get_thread_id
 
 
 class SpotifyState(TypedDict, total=False):
@@ -29,8 +27,18 @@ class SpotifyState(TypedDict, total=False):
     artists_name: Dict[str, SpotifyURI]
 
 
-spotify_state: SpotifyState = SpotifyState()
+# One SpotifyState per graph thread, so concurrent sessions never see each other's data
+spotify_states: ThreadScopedStore[SpotifyState] = ThreadScopedStore(SpotifyState)
 
 
-def get_spotify_state():
-    return spotify_state
+def get_spotify_state(config: Optional[RunnableConfig] = None) -> SpotifyState:
+    """
+    Returns the SpotifyState of the thread the tool is running in.
+
+    Args:
+        config (Optional[RunnableConfig]): The tool's config; its `thread_id` selects the state.
+
+    Returns:
+        SpotifyState: State scoped to the thread.
+    """
+    return spotify_states.get(get_thread_id(config))
@@ -30,11 +30,5 @@ class State(TypedDict, total=False):
     messages: Annotated[List[BaseMessage], add_messages]
     spotify_prompt: str
     plan: Plan
+    planning_started: float
     rounds: Annotated[int, operator.add]
-
-
-state: State = State()
-
-
-def get_state():
-    return state
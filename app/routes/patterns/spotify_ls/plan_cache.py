@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+
+from app.common.result_cache import ResultCache
+from models.plan import Plan
+from request_text import QUOTED_PATTERN, strip_tools
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+def request_template(request: str) -> Tuple[str, List[str]]:
+    """
+    Abstracts the entities out of a request.
+
+    Quoted names (e.g. playlist names) become "<entity:i>" and years "<year:i>", numbered
+    by first appearance; repeated values share a placeholder. The rest of the text is
+    lowercased with whitespace collapsed, so requests differing only in their entities
+    share a template.
+
+    Args:
+        request (str): The user's request. Tool schemas appended by patch_prompt_node are ignored.
+
+    Returns:
+        Tuple[str, List[str]]: The template, and the entity values by placeholder index.
+    """
+    text = strip_tools(request)
+    entities: List[str] = []
+
+    def placeholder(kind: str, value: str) -> str:
+        if value not in entities:
+            entities.append(value)
+        return f"<{kind}:{entities.index(value)}>"
+
+    text = QUOTED_PATTERN.sub(lambda m: placeholder("entity", m.group(1) or m.group(2)), text)
+    text = YEAR_PATTERN.sub(lambda m: placeholder("year", m.group(0)), text)
+    return " ".join(text.lower().split()), entities
+
+
+def _pattern(value: str) -> "re.Pattern[str]":
+    # Match the value as it appears inside the plan's JSON, as a whole word
+    escaped = re.escape(json.dumps(value, ensure_ascii=False)[1:-1])
+    return re.compile(rf"(?<![\w]){escaped}(?![\w])", re.IGNORECASE)
+
+
+def abstract_plan(plan: Plan, entities: List[str]) -> str:
+    """
+    Returns the plan as JSON with each entity value replaced by "<entity:i>".
+    """
+    text = plan.model_dump_json()
+    # Longest first, so a name containing another is replaced whole
+    for index in sorted(range(len(entities)), key=lambda i: len(entities[i]), reverse=True):
+        text = _pattern(entities[index]).sub(f"<entity:{index}>", text)
+    return text
+
+
+def bind_plan(template: str, entities: List[str]) -> Plan:
+    """
+    Fills a plan abstracted by `abstract_plan` with the entities of a new request.
+    """
+    text = re.sub(
+        r"<entity:(\d+)>",
+        lambda m: json.dumps(entities[int(m.group(1))], ensure_ascii=False)[1:-1],
+        template,
+    )
+    return Plan.model_validate_json(text)
+
+
+class PlanCache(ResultCache[str]):
+    """
+    Validated plans keyed by the template of the request they solve.
+
+    A request whose template was planned before gets the stored plan back with its own
+    entities bound in, so planning and reflection can be skipped. Only the
+    `max_entries` most recently used templates are kept; the planning time of a stored
+    plan is credited to `seconds_saved` on each hit.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    def lookup(self, request: str) -> Optional[Plan]:
+        """
+        Returns the stored plan for `request`'s template bound to its entities, or None.
+        """
+        template, entities = request_template(request)
+        entry = self.get(template)
+        if entry is None:
+            return None
+        logger.info(f"Plan cache hit for template {self.key(template)[:12]}, saved ~{entry.seconds:.1f}s of planning")
+        return bind_plan(entry.value, entities)
+
+    def store(self, request: str, plan: Plan, planning_seconds: float) -> bool:
+        """
+        Stores a validated plan for `request`'s template.
+
+        Args:
+            request (str): The request the plan solves.
+            plan (Plan): The plan. Plans not marked as validated are not stored.
+            planning_seconds (float): Time spent planning it, credited to later hits.
+
+        Returns:
+            bool: Whether the plan was stored.
+        """
+        if self.max_entries <= 0 or not plan.validated:
+            return False
+        template, entities = request_template(request)
+        return self.put(template, abstract_plan(plan, entities), planning_seconds)
+
+
+plan_cache = PlanCache(int(os.getenv("PLAN_CACHE_SIZE", DEFAULT_MAX_ENTRIES)))
+
+
+def get_plan_cache() -> PlanCache:
+    return plan_cache
@@ -0,0 +1,406 @@
+import asyncio
+import json
+import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolCall, ToolMessage
+from langchain_core.runnables.config import RunnableConfig
+from pydantic import BaseModel
+
+from app.common.tool_node import ConcurrentToolNode, timeout_message
+from compaction import latest_request
+from models.plan import Plan, Step, SubStep
+from prompts import Prompts
+from request_text import QUOTED_PATTERN, strip_tools
+from utils.blob_store import get_blob_store, is_handle
+
+
+logger = logging.getLogger(__name__)
+
+AnyStep = Union[Step, SubStep]
+Bindings = Dict[str, Any]
+
+# Rounds of tool calls the LLM may make while executing a single step
+MAX_FALLBACK_ROUNDS = 3
+# Name of the AIMessages recording calls made without the LLM
+EXECUTOR_NAME = "plan_executor"
+# Longer lists are cut when the known values are shown to the LLM
+SUMMARY_MAX_ITEMS = 25
+
+YEAR_PATTERN = re.compile(r"\b(?:after|since|from|post-?)\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+
+
+def _no_bindings(value: Any, bindings: Bindings) -> Bindings:
+    return {}
+
+
+@dataclass(frozen=True)
+class ToolBinding:
+    """
+    How a tool's arguments are read from the known values, and its result stored in them.
+
+    Attributes:
+        inputs (Dict[str, Tuple[str, ...]]): Per argument, the names of the values tried in order.
+            Arguments not listed are looked up under their own name.
+        output (Optional[str]): Name under which the result is stored as returned, blob
+            references included.
+        derive (Callable[[Any, Bindings], Bindings]): Computes further values from the
+            result, with blob references resolved and models dumped.
+        handle_args (FrozenSet[str]): Arguments that accept blob handles, so a blob
+            reference is passed by handle instead of by its items.
+    """
+
+    inputs: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    output: Optional[str] = None
+    derive: Callable[[Any, Bindings], Bindings] = _no_bindings
+    handle_args: FrozenSet[str] = frozenset()
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and is_handle(value.get("handle"))
+
+
+def is_error(value: Any) -> bool:
+    return isinstance(value, dict) and "error" in value
+
+
+def to_plain(value: Any) -> Any:
+    """
+    Returns a tool result as plain JSON data, with blob references replaced by their items.
+
+    Raises:
+        KeyError: If a blob was evicted.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if is_blob_ref(value):
+        return get_blob_store().get(value["handle"])
+    return value
+
+
+def _unique(names: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(names))
+
+
+def source_playlist(playlists: Any, bindings: Bindings) -> Bindings:
+    # The source playlist is the one the request names; quoted names win over
+    # names that merely appear in the text, and longer names over shorter ones
+    if not isinstance(playlists, list):
+        return {}
+    request = bindings.get("request", "").lower()
+    quoted = {name.lower() for name in bindings.get("quoted", [])}
+    candidates = [
+        p for p in playlists
+        if isinstance(p, dict) and p.get("name") and p["name"].lower() in request
+    ]
+    if not candidates:
+        return {}
+    best = max(candidates, key=lambda p: (p["name"].lower() in quoted, len(p["name"])))
+    return {"source_playlist_id": best["uri"], "source_playlist_name": best["name"]}
+
+
+def playlist_artist_names(artists: Any, bindings: Bindings) -> Bindings:
+    if not isinstance(artists, dict) or "error" in artists:
+        return {}
+    return {"playlist_artist_names": _unique(artists.values())}
+
+
+def similar_artist_names(similar: Any, bindings: Bindings) -> Bindings:
+    if not isinstance(similar, dict):
+        return {}
+    names = [artist["name"] for entry in similar.get("artists", []) for artist in entry.get("similar_artists", [])]
+    return {"candidate_artist_names": _unique(names)} if names else {}
+
+
+def mainstream_artist_names(timeline: Any, bindings: Bindings) -> Bindings:
+    if not isinstance(timeline, dict) or "artists" not in timeline:
+        return {}
+    return {"candidate_artist_names": _unique(a["name"] for a in timeline["artists"] if a.get("success"))}
+
+
+def new_playlist_id(playlist: Any, bindings: Bindings) -> Bindings:
+    if not isinstance(playlist, dict) or "uri" not in playlist:
+        return {}
+    return {"new_playlist_id": playlist["uri"], "new_playlist_name": playlist.get("name")}
+
+
+# The data flow between the spotify_ls tools. Values come from the request
+# ("request", "quoted", "year") or from earlier tool results.
+TOOL_BINDINGS: Dict[str, ToolBinding] = {
+    "get_playlists": ToolBinding(output="playlists", derive=source_playlist),
+    "get_artists_from_playlist": ToolBinding(
+        inputs={"playlist_id": ("source_playlist_id",)},
+        output="playlist_artists",
+        derive=playlist_artist_names,
+    ),
+    "find_similar_artists": ToolBinding(
+        inputs={"artists": ("playlist_artist_names",)},
+        output="similar_artists",
+        derive=similar_artist_names,
+    ),
+    "find_artists_timeline": ToolBinding(
+        inputs={"artists": ("candidate_artist_names",), "year": ("year",)},
+        output="artist_timeline",
+        derive=mainstream_artist_names,
+    ),
+    "filter_artists_by_name": ToolBinding(
+        inputs={"playlist_id": ("source_playlist_id",), "new_artists": ("candidate_artist_names",)},
+        output="valid_artists",
+    ),
+    # No tool returns candidate artist URIs, so the LLM supplies `new_artists`
+    "filter_artists_by_id": ToolBinding(
+        inputs={"playlist_id": ("source_playlist_id",)},
+        output="valid_artists",
+    ),
+    "find_top_tracks": ToolBinding(
+        inputs={"artists": ("valid_artists",)},
+        output="tracks",
+        handle_args=frozenset({"artists"}),
+    ),
+    "find_top_tracks_by_name": ToolBinding(
+        inputs={"artists": ("candidate_artist_names",)},
+        output="tracks",
+    ),
+    "create_spotify_playlist": ToolBinding(
+        inputs={"name": ("playlist_name",), "description": ("playlist_description",)},
+        output="new_playlist",
+        derive=new_playlist_id,
+    ),
+    "add_tracks_to_playlist": ToolBinding(
+        inputs={"playlist_id": ("new_playlist_id",), "tracks": ("tracks",)},
+        output="tracks_added",
+        handle_args=frozenset({"tracks"}),
+    ),
+}
+
+
+def request_bindings(request: str) -> Bindings:
+    """
+    Extracts the values a plan can use from the user's request.
+
+    Returns:
+        Bindings: "request" (the text), "quoted" (quoted names) and, when the request
+            has one, "year" (as in "after 2010").
+    """
+    request = strip_tools(request)
+    bindings: Bindings = {
+        "request": request,
+        "quoted": _unique(a or b for a, b in QUOTED_PATTERN.findall(request)),
+    }
+    year = YEAR_PATTERN.search(request)
+    if year:
+        bindings["year"] = int(year.group(1))
+    return bindings
+
+
+def summarize_bindings(bindings: Bindings) -> str:
+    summary = {}
+    for name, value in bindings.items():
+        if name == "request":
+            continue
+        value = to_plain(value) if isinstance(value, (BaseModel, set, frozenset)) else value
+        if isinstance(value, list) and len(value) > SUMMARY_MAX_ITEMS:
+            value = value[:SUMMARY_MAX_ITEMS] + [f"... {len(value) - SUMMARY_MAX_ITEMS} more"]
+        summary[name] = value
+    return json.dumps(summary, ensure_ascii=False, indent=1, default=str)
+
+
+def tool_content(result: Any) -> str:
+    if isinstance(result, str):
+        return result
+    if isinstance(result, BaseModel):
+        return result.model_dump_json()
+    if isinstance(result, (set, frozenset)):
+        result = sorted(result)
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+
+class PlanExecutor:
+    """
+    Executes a validated Plan by walking its steps instead of asking the LLM for each tool call.
+
+    A step naming a known tool is called directly, with its arguments bound from the
+    request and from the results of earlier steps as described by `bindings`. Substeps
+    of "parallel" steps run concurrently; those of other steps run in order. The LLM
+    is only asked to execute steps that need reasoning: steps without a known tool,
+    branches, and tool steps whose arguments cannot be bound, e.g. the name of a new
+    playlist. Tool results it obtains are bound like any other.
+
+    Every call is recorded as an AIMessage with its tool calls followed by their
+    ToolMessages, so the history has the same shape as in LLM driven execution.
+
+    Args:
+        tool_node (ConcurrentToolNode): Node holding the tools; calls go through its
+            concurrency caps, deadlines and latency histograms.
+        llm (Callable[[], BaseChatModel]): Creates the chat model used for reasoning steps.
+        bindings (Dict[str, ToolBinding]): Data flow between the tools, by tool name.
+    """
+
+    def __init__(self, tool_node: ConcurrentToolNode, llm: Callable[[], BaseChatModel],
+                 bindings: Optional[Dict[str, ToolBinding]] = None):
+        self.tool_node = tool_node
+        self.llm = llm
+        self.bindings = TOOL_BINDINGS if bindings is None else bindings
+        # Longest first, so "find_top_tracks_by_name" is not read as "find_top_tracks"
+        self._tool_names = sorted(tool_node.tools_by_name, key=len, reverse=True)
+
+    def tool_name(self, tool: Optional[str]) -> Optional[str]:
+        """
+        Finds the tool a step refers to, e.g. "get_playlists", "get_playlists()" or
+        "functions.get_playlists".
+        """
+        if not tool:
+            return None
+        if tool in self.tool_node.tools_by_name:
+            return tool
+        for name in self._tool_names:
+            if re.search(rf"(?<![A-Za-z0-9_]){re.escape(name)}(?![A-Za-z0-9_])", tool):
+                return name
+        return None
+
+    def bind_args(self, name: str, values: Bindings) -> Optional[Dict[str, Any]]:
+        """
+        Binds the arguments of tool `name` from `values`.
+
+        Returns:
+            Optional[Dict[str, Any]]: The arguments, or None when a required one has no value.
+        """
+        binding = self.bindings.get(name, ToolBinding())
+        schema = self.tool_node.tools_by_name[name].tool_call_schema
+        args: Dict[str, Any] = {}
+        for arg, arg_field in schema.model_fields.items():
+            keys = binding.inputs.get(arg, (arg,))
+            key = next((k for k in keys if values.get(k) not in (None, [], {})), None)
+            if key is None:
+                if arg_field.is_required():
+                    return None
+                continue
+            value = values[key]
+            if is_blob_ref(value):
+                if arg in binding.handle_args:
+                    value = [value["handle"]]
+                else:
+                    try:
+                        value = to_plain(value)
+                    except KeyError:
+                        return None
+            args[arg] = to_plain(value) if isinstance(value, (BaseModel, set, frozenset)) else value
+        return args
+
+    def bind_result(self, name: str, result: Any, values: Bindings) -> None:
+        if is_error(result):
+            return
+        binding = self.bindings.get(name)
+        if binding is None:
+            return
+        if binding.output:
+            values[binding.output] = result
+        try:
+            values.update(binding.derive(to_plain(result), values))
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Could not derive values from {name}: {e}")
+
+    async def call_tools(self, calls: Sequence[ToolCall], values: Bindings,
+                         config: Optional[RunnableConfig]) -> List[ToolMessage]:
+        async def call(tool_call: ToolCall) -> ToolMessage:
+            name = tool_call["name"]
+            try:
+                result = await self.tool_node.acall(name, tool_call["args"], config)
+            except asyncio.TimeoutError:
+                return timeout_message(tool_call, self.tool_node.limit_for(name).timeout)
+            except Exception as e:
+                return ToolMessage(content=json.dumps({"error": repr(e)}), name=name,
+                                   tool_call_id=tool_call["id"], status="error")
+            self.bind_result(name, result, values)
+            return ToolMessage(content=tool_content(result), name=name, tool_call_id=tool_call["id"],
+                               status="error" if is_error(result) else "success")
+
+        return list(await asyncio.gather(*(call(c) for c in calls)))
+
+    async def run_with_llm(self, step: AnyStep, values: Bindings, request: BaseMessage,
+                           config: Optional[RunnableConfig]) -> List[BaseMessage]:
+        llm = self.llm().bind_tools(list(self.tool_node.tools_by_name.values()), tool_choice="auto")
+        prompt: List[BaseMessage] = [
+            SystemMessage(content=Prompts.SYSTEM),
+            request,
+            HumanMessage(content=Prompts.STEP.format(
+                step=step.model_dump_json(indent=1, exclude_none=True),
+                bindings=summarize_bindings(values),
+            )),
+        ]
+        messages: List[BaseMessage] = []
+        for _ in range(MAX_FALLBACK_ROUNDS):
+            response = await llm.ainvoke(prompt + messages, config)
+            messages.append(response)
+            if not response.tool_calls:
+                break
+            messages.extend(await self.call_tools(response.tool_calls, values, config))
+        return messages
+
+    async def run_step(self, step: AnyStep, values: Bindings, request: BaseMessage,
+                       config: Optional[RunnableConfig]) -> List[BaseMessage]:
+        """
+        Executes one step and its substeps.
+
+        Returns:
+            List[BaseMessage]: The messages recording the step's execution.
+        """
+        substeps = getattr(step, "substeps", None)
+        if substeps:
+            if step.type == "parallel":
+                results = await asyncio.gather(*(self.run_step(s, values, request, config) for s in substeps))
+                return [message for messages in results for message in messages]
+            if step.type != "branch":
+                messages: List[BaseMessage] = []
+                for substep in substeps:
+                    messages.extend(await self.run_step(substep, values, request, config))
+                return messages
+
+        name = self.tool_name(step.tool)
+        args = self.bind_args(name, values) if name and step.type != "branch" else None
+        if args is None:
+            logger.info(f"Step {step.step_number} ({step.name}) needs reasoning, asking the LLM")
+            return await self.run_with_llm(step, values, request, config)
+
+        call = ToolCall(name=name, args=args, id=f"call_{uuid.uuid4().hex[:24]}")
+        message = AIMessage(content=f"Step {step.step_number} ({step.name}): {step.action or step.description}",
+                            tool_calls=[call], name=EXECUTOR_NAME)
+        return [message, *await self.call_tools([call], values, config)]
+
+    async def run(self, plan: Plan, request: BaseMessage,
+                  config: Optional[RunnableConfig] = None) -> List[BaseMessage]:
+        """
+        Executes every step of `plan` in order.
+
+        Args:
+            plan (Plan): The validated plan.
+            request (BaseMessage): The user's request, the source of the plan's entities.
+            config (Optional[RunnableConfig]): Config passed to the tools and the LLM.
+
+        Returns:
+            List[BaseMessage]: The messages recording the execution, ending with a summary.
+        """
+        values = request_bindings(request.content)
+        messages: List[BaseMessage] = []
+        for step in plan.steps:
+            messages.extend(await self.run_step(step, values, request, config))
+        tool_calls = sum(len(m.tool_calls) for m in messages if isinstance(m, AIMessage))
+        llm_calls = sum(1 for m in messages if isinstance(m, AIMessage) and m.name != EXECUTOR_NAME)
+        messages.append(AIMessage(name=EXECUTOR_NAME, content=(
+            f"Executed {len(plan.steps)} plan steps with {tool_calls} tool calls and {llm_calls} LLM calls. "
+            f"Known values: {', '.join(k for k in values if k not in ('request', 'quoted'))}."
+        )))
+        return messages
+
+    async def node(self, state: Dict[str, Any], config: RunnableConfig) -> Dict:
+        """
+        Graph node executing `state["plan"]` for the user's latest request.
+        """
+        request = latest_request(state["messages"]) or state["messages"][0]
+        return {"messages": await self.run(state["plan"], request, config)}
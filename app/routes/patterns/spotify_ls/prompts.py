@@ -14,6 +14,24 @@ Execute the step-by-step plan:
 
 - **Handle Limitations Proactively:** If you encounter any limitations (such as processing limits), implement solutions like batching or looping to ensure all items are processed.
 
+- **Pass Blob Handles Along:** Large tool results come back as a `handle` (e.g. `blob:1a2b3c4d5e6f7a8b`) with a count, summary and preview. Pass the handle to the next tool instead of copying the items; only read the items with `get_blob_items` when you need to inspect them.
+
+- Do not ask for user confirmation.
+"""
+
+    STEP = """
+Execute only this step of the validated plan:
+
+{step}
+
+**Known Values:** Outputs of the steps executed so far, by name. Large results are blob references; pass their `handle` to tools that accept handles.
+
+{bindings}
+
+**Instructions:**
+
+- Call the tools this step needs with arguments taken from the known values. Do not work on other steps.
+- If the step only requires reasoning, answer directly without calling tools.
 - Do not ask for user confirmation.
 """
 
@@ -0,0 +1,14 @@
+import re
+
+
+# patch_prompt_node appends the tool schemas to the request; they are not part of it
+TOOLS_SUFFIX = "\n- You have access to the following Tools:"
+# Quoted names in a request, e.g. of playlists: 'name' or "name"
+QUOTED_PATTERN = re.compile(r"'([^'\n]+)'|\"([^\"\n]+)\"")
+
+
+def strip_tools(request: str) -> str:
+    """
+    Returns the user's request without the tool schemas appended by patch_prompt_node.
+    """
+    return request.split(TOOLS_SUFFIX, 1)[0]
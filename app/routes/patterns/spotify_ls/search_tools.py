@@ -12,7 +12,10 @@ from langchain_core.prompts import ChatPromptTemplate
 from models.artist_success import ArtistTimelineResponse
 from models.artist_list import ArtistSimilarList
 from prompts import Prompts
-from langchain_openai import ChatOpenAI
+from app.common.lazy_import import lazy_import
+
+# Imported on first use, to keep module import fast
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
 
 
 @tool
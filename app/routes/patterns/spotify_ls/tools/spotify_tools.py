@@ -1,16 +1,24 @@
+import json
 import logging
 import os
-import spotipy
+from app.common.cancellation import check_cancelled
+from app.common.lazy_import import lazy_import
 from langchain_core.tools import tool
-from typing import Any, List, Set, Dict
+from typing import Any, List, Optional, Set, Dict, Tuple
+from langchain_core.runnables.config import RunnableConfig
 
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 from utils.spotify_client import get_spotify_client, get_spotify_user_authorization
 from utils.spotify_apis import get_spotify_uri_from_name
+from utils.blob_store import expired_handle_error, get_blob_store, offload, resolve_uris
+from utils.tool_cache import get_tool_cache, playlist_tag
 from models.spotify_state import SpotifyState, get_spotify_state
 from models.spotify_model import Playlist
 from models.spotify_types import SpotifyURI
 
+# Imported on first use, to keep module import fast
+spotipy = lazy_import("spotipy")
+
 
 logger = logging.getLogger(__name__)
 
@@ -22,47 +30,110 @@ logging.basicConfig(
 )
 
 
-@tool
-def get_playlists() -> List[Playlist]:
+tool_cache = get_tool_cache()
+
+
+@tool_cache.memoize(tags=lambda: {"playlists"})
+def fetch_playlists(config: Optional[RunnableConfig] = None) -> List[Playlist]:
     """
-    Retrieves all Spotify Playlist IDs. Each playlist includes the Spotify URI and other relevant data
+    Fetches the current user's playlists, following pagination.
 
-    Returns:
-        List[Playlist]: A list of Spotify Playlist IDs
+    Raises:
+        spotipy.SpotifyException: If a request fails.
     """
     sp = get_spotify_client()
     playlists: List[Playlist] = []
+    # Fetch the current user's playlists with pagination
+    playlists_raw = sp.user_playlists(user=os.getenv("SPOTIFY_USER_ID"), limit=100)
+    while playlists_raw:
+        for playlist_data in playlists_raw["items"]:
+            # Map API data to the Playlist model
+            playlists.append(Playlist(uri=playlist_data["uri"], name=playlist_data["name"]))
+        # Check if there is a next page
+        if playlists_raw["next"]:
+            check_cancelled()
+            playlists_raw = sp.next(playlists_raw)
+        else:
+            break
+    return playlists
+
+
+@tool_cache.memoize(tags=lambda playlist_id: {playlist_tag(playlist_id)})
+def fetch_playlist_artists(
+    playlist_id: SpotifyURI, config: Optional[RunnableConfig] = None
+) -> Tuple[Dict[SpotifyURI, str], Dict[str, SpotifyURI]]:
+    """
+    Fetches the artists of a playlist, following pagination.
 
-    try:
-        # Fetch the current user's playlists with pagination
-        playlists_raw = sp.user_playlists(user=os.getenv("SPOTIFY_USER_ID"), limit=100)
-        while playlists_raw:
-            for playlist_data in playlists_raw["items"]:
-                # Map API data to the Playlist model
-                playlist = Playlist(
-                    uri=playlist_data["uri"],
-                    name=playlist_data["name"],
-                )
-                playlists.append(playlist)
+    Returns:
+        Tuple[Dict[SpotifyURI, str], Dict[str, SpotifyURI]]: Artist URI to name, and name to URI.
+
+    Raises:
+        spotipy.SpotifyException: If a request fails.
+    """
+    sp = get_spotify_client()
+    playlist_artists_uri: Dict[SpotifyURI, str] = {}
+    playlist_artists_name: Dict[str, SpotifyURI] = {}
+    # Fetch the playlist's tracks with pagination
+    playlist = sp.user_playlist(
+        user=os.getenv("SPOTIFY_USER_ID"), playlist_id=playlist_id
+    )
+    if "tracks" in playlist:
+        tracks = playlist["tracks"]
+        while tracks:
+            for item in tracks["items"]:
+                track_data = item["track"]
+                # Map API data to the Track model
+                for artist in track_data["artists"]:
+                    playlist_artists_uri[artist["uri"]] = artist["name"]
+                    playlist_artists_name[artist["name"]] = artist["uri"]
             # Check if there is a next page
-            if playlists_raw["next"]:
-                playlists_raw = sp.next(playlists_raw)
+            if tracks["next"]:
+                # TODO unclear in this case
+                check_cancelled()
+                tracks = sp.next(tracks)
             else:
                 break
+    return playlist_artists_uri, playlist_artists_name
+
+
+@tool_cache.memoize()
+def fetch_top_tracks(artist: SpotifyURI, config: Optional[RunnableConfig] = None) -> List[SpotifyURI]:
+    """
+    Fetches the URIs of an artist's top tracks in the US market.
+
+    Raises:
+        spotipy.SpotifyException: If the request fails.
+    """
+    top_tracks = get_spotify_client().artist_top_tracks(artist, country="US")
+    return [track["uri"] for track in top_tracks["tracks"]]
+
+
+@tool
+def get_playlists(config: RunnableConfig) -> List[Playlist]:
+    """
+    Retrieves all Spotify Playlist IDs. Each playlist includes the Spotify URI and other relevant data
+
+    Returns:
+        List[Playlist]: A list of Spotify Playlist IDs, or a blob reference when the list is long
+    """
+    try:
+        # Copy, so changes to the state do not alter the cached result
+        playlists = list(fetch_playlists(config=config))
     except spotipy.SpotifyException as e:
         return [str(e)]
 
     # Save state
-    state: SpotifyState = get_spotify_state()
+    state: SpotifyState = get_spotify_state(config)
     state["playlists"] = playlists
 
     # Serialize the playlists to JSON-serializable dictionaries
     serialized_playlists = [playlist.model_dump() for playlist in playlists]
-    return serialized_playlists
+    return offload(serialized_playlists, "playlists", "get_playlists")
 
 
 @tool
-def create_spotify_playlist(name: str, description: str) -> Dict[str, Any]:
+def create_spotify_playlist(name: str, description: str, config: RunnableConfig) -> Dict[str, Any]:
     """
     Creates a new playlist on Spotify.
 
@@ -101,10 +172,13 @@ def create_spotify_playlist(name: str, description: str) -> Dict[str, Any]:
             collaborative=new_playlist_data.get("collaborative"),
             snapshot_id=new_playlist_data.get("snapshot_id"),
         )
-        state: SpotifyState = get_spotify_state()
+        state: SpotifyState = get_spotify_state(config)
         state["new_playlist"] = new_playlist
     except spotipy.SpotifyException as e:
         return {"error": str(e)}
+    finally:
+        # Even a failed request may have created the playlist
+        tool_cache.invalidate({"playlists"})
     return new_playlist.model_dump()
 
 
@@ -117,26 +191,35 @@ def add_tracks_to_playlist(
 
     Args:
         playlist_id (SpotifyURI): Spotify URI of the playlist.
-        tracks (List[SpotifyURI]): List of Spotify URI tracks.
+        tracks (List[SpotifyURI]): List of Spotify URI tracks. Blob handles returned by
+            other tools can be passed in place of the tracks they hold.
 
     Returns:
         Dict[str, Any]: A dictionary indicating success or error.
     """
     sp = get_spotify_client()
     batch_size = 20
+    try:
+        tracks = resolve_uris(tracks)
+    except KeyError as e:
+        return {"error": expired_handle_error(e.args[0])}
     try:
         # Process tracks in batches of 20
         for i in range(0, len(tracks), batch_size):
+            check_cancelled()
             batch = tracks[i : i + batch_size]
             sp.playlist_add_items(playlist_id=playlist_id, items=batch)
     except spotipy.SpotifyException as e:
         return {"error": str(e)}
+    finally:
+        # Earlier batches may have been added before a failure
+        tool_cache.invalidate({playlist_tag(playlist_id)})
     return {"success": True}
 
 
 @tool
 def filter_artists_by_id(
-    playlist_id: SpotifyURI, new_artists: List[SpotifyURI]
+    playlist_id: SpotifyURI, new_artists: List[SpotifyURI], config: RunnableConfig
 ) -> Set[SpotifyURI]:
     """
     Checks `new_artists` against an existing Playlist. It returns a set
@@ -145,23 +228,30 @@ def filter_artists_by_id(
     In essense it will perform set operation `new-artists` - `existing-artists`
     Args:
         playlist_id (SpotifyURI): Spotify playlist ID in the format <base-62 number>
-        new_artists (List[SpotifyURI]): List of artists Spotify IDs
+        new_artists (List[SpotifyURI]): List of artists Spotify IDs. Blob handles returned
+            by other tools can be passed in place of the artists they hold.
 
     Returns:
-        Set[SpotifyURI]: List of artists Spotify IDs that can be used in a new playlist
+        Set[SpotifyURI]: List of artists Spotify IDs that can be used in a new playlist,
+            or a blob reference when the list is long
     """
-    state: SpotifyState = get_spotify_state()
+    state: SpotifyState = get_spotify_state(config)
     artists: Set[SpotifyURI] = set()
-    state["candidate_artists"] = set(new_artists)
-    for v in state["artists_uris"].keys():
+    try:
+        state["candidate_artists"] = set(resolve_uris(new_artists))
+    except KeyError as e:
+        return {"error": expired_handle_error(e.args[0])}
+    for v in state.get("artists_uri", {}).keys():
         artists.add(v)
     valid_artists = state["candidate_artists"] - artists
     state["valid_artists"] = valid_artists
-    return valid_artists
+    return offload(valid_artists, "Spotify artist URIs", "filter_artists_by_id")
 
 
 @tool
-def filter_artists_by_name(playlist_id: SpotifyURI, new_artists: List[str]) -> List[SpotifyURI]:
+def filter_artists_by_name(
+    playlist_id: SpotifyURI, new_artists: List[str], config: RunnableConfig
+) -> List[SpotifyURI]:
     """
     Checks `new_artists` against an existing Playlist. It returns a set
      of artists that can be used in a new playlist.
@@ -173,42 +263,45 @@ def filter_artists_by_name(playlist_id: SpotifyURI, new_artists: List[str]) -> L
     Returns:
         List[SpotifyURI]: List of artists URIs that can be used in a new playlist
     """
-    state: SpotifyState = get_spotify_state()
+    state: SpotifyState = get_spotify_state(config)
     spotify_uris = get_spotify_uri_from_name(new_artists)
     valid_artists: List[str] = []
     for uri in spotify_uris:
-        if uri not in state["artists_uri"]:
+        if uri not in state.get("artists_uri", {}):
             valid_artists.append(uri)
     return valid_artists
 
 
 @tool
-def find_top_tracks(artists: List[SpotifyURI]) -> List[SpotifyURI]:
+def find_top_tracks(artists: List[SpotifyURI], config: RunnableConfig) -> List[SpotifyURI]:
     """
     Find top tracks for each of Spotify artist URIs on the list.
 
     Args:
-        artists (List[SpotifyURI]): List of Spotify artists URIs
+        artists (List[SpotifyURI]): List of Spotify artists URIs. Blob handles returned by
+            other tools can be passed in place of the artists they hold.
 
     Returns:
-       List[SpotifyURI]: A list of Spotify track URIs.
+       List[SpotifyURI]: A list of Spotify track URIs, or a blob reference when the list is long
     """
 
     tracks: List[SpotifyURI] = []
-    sp = get_spotify_client()
+    try:
+        artists = resolve_uris(artists)
+    except KeyError as e:
+        return [expired_handle_error(e.args[0])]
     for artist in artists:
+        check_cancelled()
         try:
-            top_tracks = sp.artist_top_tracks(artist, country="US")
-            for track in top_tracks["tracks"]:
-                tracks.append(track["uri"])
+            tracks.extend(fetch_top_tracks(artist, config=config))
         except Exception as e:
             print(f"Unexpected error for artist {artist}: {str(e)}")
             continue
-    return tracks
+    return offload(tracks, "Spotify track URIs", "find_top_tracks")
 
 
 @tool
-def find_top_tracks_by_name(artists: List[str]) -> List[SpotifyURI]:
+def find_top_tracks_by_name(artists: List[str], config: RunnableConfig) -> List[SpotifyURI]:
     """
     Find top tracks for each of Spotify artists name on the list.
 
@@ -216,27 +309,26 @@ def find_top_tracks_by_name(artists: List[str]) -> List[SpotifyURI]:
         artists (List[str]): List of Spotify artists IDs in <base-62 number>
 
     Returns:
-       List[SpotifyURI]: A list of Spotify track URIs.
+       List[SpotifyURI]: A list of Spotify track URIs, or a blob reference when the list is long
     """
 
     tracks: List[str] = []
 
     spotify_uris = get_spotify_uri_from_name(artists)
 
-    sp = get_spotify_client()
     for uri in spotify_uris:
         try:
-            top_tracks = sp.artist_top_tracks(uri, country="US")
-            for track in top_tracks["tracks"]:
-                tracks.append(track["uri"])
+            tracks.extend(fetch_top_tracks(uri, config=config))
         except Exception as e:
             print(f"Unexpected error for artist {uri}: {str(e)}")
             continue
-    return tracks
+    return offload(tracks, "Spotify track URIs", "find_top_tracks_by_name")
 
 
 @tool
-def get_artists_from_playlist(playlist_id: SpotifyURI) -> Dict[SpotifyURI, str]:
+def get_artists_from_playlist(
+    playlist_id: SpotifyURI, config: RunnableConfig
+) -> Dict[SpotifyURI, str]:
     """
     Get the list of artists from a Spotify playlist
 
@@ -244,42 +336,58 @@ def get_artists_from_playlist(playlist_id: SpotifyURI) -> Dict[SpotifyURI, str]:
         playlist_id (SpotifyURI): Spotify playlist URI
 
     Returns:
-        Dict[SpotifyURI, str]: A dictionary where keys=SpotifyURI name and value=artist name
+        Dict[SpotifyURI, str]: A dictionary where keys=SpotifyURI name and value=artist name,
+            or a blob reference when the playlist has many artists
     """
-    sp = get_spotify_client()
-    playlist_artists_uri: Dict[SpotifyURI, str] = {}
-    playlist_artists_name: Dict[str, SpotifyURI] = {}
-
     try:
-        # Fetch the playlist's tracks with pagination
-        playlist = sp.user_playlist(
-            user=os.getenv("SPOTIFY_USER_ID"), playlist_id=playlist_id
-        )
-        if "tracks" in playlist:
-            tracks = playlist["tracks"]
-            while tracks:
-                for item in tracks["items"]:
-                    track_data = item["track"]
-                    # Map API data to the Track model
-                    for artist in track_data["artists"]:
-                        playlist_artists_uri[artist["uri"]] = artist["name"]
-                        playlist_artists_name[artist["name"]] = artist["uri"]
-                # Check if there is a next page
-                if tracks["next"]:
-                    # TODO unclear in this case
-                    tracks = sp.next(tracks)
-                else:
-                    break
+        artists_uri, artists_name = fetch_playlist_artists(playlist_id, config=config)
     except spotipy.SpotifyException as e:
         return {SpotifyURI("error"): str(e)}
+    # Copy, so changes to the state do not alter the cached result
+    playlist_artists_uri: Dict[SpotifyURI, str] = dict(artists_uri)
+    playlist_artists_name: Dict[str, SpotifyURI] = dict(artists_name)
 
     # Save state
-    state: SpotifyState = get_spotify_state()
+    state: SpotifyState = get_spotify_state(config)
     state["artists_uri"] = playlist_artists_uri
     state["artists_name"] = playlist_artists_name
 
     # Serialize the tracks to JSON-serializable dictionaries
-    return playlist_artists_uri
+    return offload(playlist_artists_uri, "artists (Spotify URI to name)", "get_artists_from_playlist")
+
+
+@tool
+def get_blob_items(handle: str, query: Optional[str] = None, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+    """
+    Reads the items behind a blob handle returned by another tool, one page at a time.
+
+    Only use it when the items themselves are needed, e.g. to find a playlist by name;
+    tools that take lists of URIs accept the handle directly.
+
+    Args:
+        handle (str): Blob handle, in the format blob:<hash>
+        query (Optional[str]): Only return items containing this text (case insensitive)
+        offset (int): Index of the first matching item to return
+        limit (int): Maximum number of items to return
+
+    Returns:
+        Dict[str, Any]: The items, the total count of matching items and the offset of the next page
+    """
+    try:
+        value = get_blob_store().get(handle)
+    except KeyError:
+        return {"error": expired_handle_error(handle)}
+    items = list(value.items()) if isinstance(value, dict) else value
+    if query:
+        needle = query.lower()
+        items = [item for item in items if needle in json.dumps(item, ensure_ascii=False).lower()]
+    page = items[offset : offset + limit]
+    next_offset = offset + len(page)
+    return {
+        "items": dict(page) if isinstance(value, dict) else page,
+        "total": len(items),
+        "next_offset": next_offset if next_offset < len(items) else None,
+    }
 
 
 def get_spotify_tools() -> List:
@@ -292,4 +400,5 @@ def get_spotify_tools() -> List:
         get_artists_from_playlist,
         find_top_tracks_by_name,
         find_top_tracks,
+        get_blob_items,
     ]
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from app.common.checkpointer import CHECKPOINTER_ENV, DEFAULT_SQLITE_DIR, SQLITE_DIR_ENV
+
+
+HANDLE_PREFIX = "blob:"
+# Results at or below both limits are returned inline; larger ones are stored out of line
+INLINE_MAX_ITEMS = 25
+INLINE_MAX_BYTES = 2048
+PREVIEW_ITEMS = 5
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Tools that returned the handles, kept after their blobs are evicted to tell which tool to call again
+MAX_SOURCES = 10000
+BLOB_DB_NAME = "spotify_ls_blobs.sqlite"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+class BlobStore:
+    """
+    Content-addressed store for large tool results.
+
+    A value is stored once as JSON under a handle derived from its content, so storing
+    the same result twice (or from two sessions) returns the same handle. Handles are
+    small enough to travel through messages and checkpoints in place of the data.
+    Least recently used blobs are dropped from memory once the store holds more than
+    `max_bytes`.
+
+    Handles saved in checkpoints outlive the process when the checkpointer is durable.
+    With a `path`, every blob is also written to a SQLite database, and blobs evicted from
+    memory, or stored before a restart, are read back from it.
+
+    Args:
+        max_bytes (int): Maximum total size of the JSON payloads kept in memory.
+        path (Optional[str]): SQLite database file the blobs are persisted to. None keeps
+            them in memory only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._sources: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory and path != ":memory:":
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (handle TEXT PRIMARY KEY, source TEXT, data BLOB NOT NULL)"
+            )
+
+    def put(self, value: Any, source: Optional[str] = None) -> str:
+        """
+        Stores `value` and returns its handle.
+
+        Args:
+            value (Any): A JSON serializable value. Sets are stored as sorted lists.
+            source (Optional[str]): Name of the tool that returned it.
+
+        Returns:
+            str: Handle in the form "blob:<hash>".
+        """
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        handle = HANDLE_PREFIX + hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            if source is not None:
+                self._sources[handle] = source
+                self._sources.move_to_end(handle)
+                while len(self._sources) > MAX_SOURCES:
+                    self._sources.popitem(last=False)
+            if handle in self._blobs:
+                self._blobs.move_to_end(handle)
+                return handle
+            self._cache(handle, data)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)", (handle, source, data))
+        return handle
+
+    def _cache(self, handle: str, data: bytes) -> None:
+        self._blobs[handle] = data
+        self._size += len(data)
+        while self._size > self.max_bytes and len(self._blobs) > 1:
+            _, dropped = self._blobs.popitem(last=False)
+            self._size -= len(dropped)
+
+    def _load(self, handle: str) -> Optional[bytes]:
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT data FROM blobs WHERE handle = ?", (handle,)).fetchone()
+        if row is None:
+            return None
+        self._cache(handle, row[0])
+        return row[0]
+
+    def get(self, handle: str) -> Any:
+        """
+        Returns the value stored under `handle`.
+
+        Raises:
+            KeyError: If the handle is unknown, or its blob was evicted and not persisted.
+        """
+        with self._lock:
+            data = self._blobs.get(handle)
+            if data is None:
+                data = self._load(handle)
+                if data is None:
+                    raise KeyError(handle)
+            self._blobs.move_to_end(handle)
+        return json.loads(data)
+
+    def source(self, handle: str) -> Optional[str]:
+        """
+        Returns the name of the tool that returned `handle`, if known.
+        """
+        with self._lock:
+            source = self._sources.get(handle)
+            if source is None and self._conn is not None:
+                row = self._conn.execute("SELECT source FROM blobs WHERE handle = ?", (handle,)).fetchone()
+                source = row[0] if row else None
+        return source
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            if handle in self._blobs:
+                return True
+            return self._conn is not None and self._conn.execute(
+                "SELECT 1 FROM blobs WHERE handle = ?", (handle,)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+def default_path() -> Optional[str]:
+    """
+    Database file of the blob store: next to the checkpoints with the SQLite checkpointer,
+    none with the in-memory one, whose checkpoints do not outlive the process either.
+    """
+    if os.getenv(CHECKPOINTER_ENV, "memory").lower() != "sqlite":
+        return None
+    return os.path.join(os.getenv(SQLITE_DIR_ENV, DEFAULT_SQLITE_DIR), BLOB_DB_NAME)
+
+
+blob_store = BlobStore(path=default_path())
+
+
+def get_blob_store() -> BlobStore:
+    return blob_store
+
+
+def offload(value: Union[List, Dict, set], kind: str, source: Optional[str] = None) -> Any:
+    """
+    Returns small results unchanged and stores large ones in the blob store.
+
+    Large results are replaced by a reference the LLM can pass on to other tools:
+    {"handle", "count", "summary", "preview"}.
+
+    Args:
+        value (Union[List, Dict, set]): Tool result.
+        kind (str): What the items are, used in the summary, e.g. "Spotify track URIs".
+        source (Optional[str]): Name of the tool returning it, named when the handle expires.
+
+    Returns:
+        Any: `value` itself, or the reference to its blob.
+    """
+    items = sorted(value) if isinstance(value, (set, frozenset)) else value
+    if len(items) <= INLINE_MAX_ITEMS and len(json.dumps(items, ensure_ascii=False)) <= INLINE_MAX_BYTES:
+        return value
+    handle = blob_store.put(items, source)
+    if isinstance(items, dict):
+        preview: Any = dict(list(items.items())[:PREVIEW_ITEMS])
+    else:
+        preview = items[:PREVIEW_ITEMS]
+    return {
+        "handle": handle,
+        "count": len(items),
+        "summary": (
+            f"{len(items)} {kind}. Pass the handle instead of the items to tools that accept it, "
+            "or read the items with get_blob_items."
+        ),
+        "preview": preview,
+    }
+
+
+def resolve_uris(items: Union[str, Iterable[str]]) -> List[str]:
+    """
+    Expands blob handles in a list of Spotify URIs.
+
+    A handle to a list contributes its items; a handle to a dictionary (such as the
+    artists of a playlist) contributes its keys. Other entries are kept as they are.
+
+    Args:
+        items (Union[str, Iterable[str]]): URIs and/or handles, or a single handle.
+
+    Returns:
+        List[str]: The URIs, in order.
+
+    Raises:
+        KeyError: If a handle is unknown or its blob was evicted.
+    """
+    if isinstance(items, str):
+        items = [items]
+    uris: List[str] = []
+    for item in items:
+        if is_handle(item):
+            value = blob_store.get(item)
+            uris.extend(value.keys() if isinstance(value, dict) else value)
+        else:
+            uris.append(item)
+    return uris
+
+
+def expired_handle_error(handle: str) -> str:
+    """
+    Error returned by tools given a handle whose blob is gone, naming the tool to call again.
+    """
+    source = blob_store.source(handle)
+    again = f"call {source} again" if source else "call the tool that returned it again"
+    return f"Blob handle {handle} is no longer available; {again} to get a new handle."
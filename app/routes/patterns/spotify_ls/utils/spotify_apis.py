@@ -2,10 +2,14 @@ import json
 import os
 from typing import List
 
-import spotipy
+from app.common.cancellation import check_cancelled
+from app.common.lazy_import import lazy_import
 
 from spotify_client import get_spotify_client
 
+# Imported on first use, to keep module import fast
+spotipy = lazy_import("spotipy")
+
 
 CACHE_FILE = "spotify_name_uri_cache.json"
 
@@ -42,22 +46,24 @@ def get_spotify_uri_from_name(names: List[str]) -> List[str]:
     names_to_fetch = [name for name in names if name not in cache]
 
     # Fetch missing names from Spotify API
-    for name in names_to_fetch:
-        try:
-            spotify_data = sp.search(q=name, limit=1, type="artist")
-            items = spotify_data.get("artists", {}).get("items", [])
-            if items and "uri" in items[0]:
-                cache[name] = items[0]["uri"]
-            else:
-                # If no URI was found, store None
+    try:
+        for name in names_to_fetch:
+            check_cancelled()
+            try:
+                spotify_data = sp.search(q=name, limit=1, type="artist")
+                items = spotify_data.get("artists", {}).get("items", [])
+                if items and "uri" in items[0]:
+                    cache[name] = items[0]["uri"]
+                else:
+                    # If no URI was found, store None
+                    cache[name] = None
+            except spotipy.SpotifyException as e:
+                print(f"Unexpected error for artist '{name}': {str(e)}")
+                # Store None to avoid repeated failing lookups
                 cache[name] = None
-        except spotipy.SpotifyException as e:
-            print(f"Unexpected error for artist '{name}': {str(e)}")
-            # Store None to avoid repeated failing lookups
-            cache[name] = None
-
-    # Save the updated cache to disk
-    save_cache(cache)
+    finally:
+        # Save the updated cache to disk, names fetched before a cancellation included
+        save_cache(cache)
 
     # Prepare the final list of spotify URIs
     for name in names:
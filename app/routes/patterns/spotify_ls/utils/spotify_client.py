@@ -1,10 +1,48 @@
+from __future__ import annotations
+
 import os
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from spotipy.oauth2 import SpotifyOAuth
+from app.common.lazy_import import lazy_import
+from app.common.metrics import record_spotify_response
+from typing import Optional
+
+# Imported on first use, to keep module import fast
+spotipy = lazy_import("spotipy")
+SpotifyClientCredentials = lazy_import("spotipy.oauth2", "SpotifyClientCredentials")
+SpotifyOAuth = lazy_import("spotipy.oauth2", "SpotifyOAuth")
+
+
+def instrument(sp: spotipy.Spotify) -> spotipy.Spotify:
+    """
+    Records every request `sp` sends in the `spotify_request_seconds` metric.
+    """
+    hooks = getattr(getattr(sp, "_session", None), "hooks", None)
+    if hooks is not None:
+        hooks["response"].append(record_spotify_response)
+    return sp
+
+
+def get_standin_client() -> Optional[spotipy.Spotify]:
+    """
+    Returns a client pointed at a local Spotify API stand-in when `SPOTIFY_API_BASE_URL` is set.
+
+    See `utils/spotify_standin.py`. The stand-in does not check tokens, so no OAuth flow is run.
+
+    Returns:
+        Optional[spotipy.Spotify]: A client for the stand-in, or None to use the live API.
+    """
+    base_url = os.environ.get("SPOTIFY_API_BASE_URL")
+    if not base_url:
+        return None
+    sp = spotipy.Spotify(auth="standin")
+    sp.prefix = base_url.rstrip("/") + "/"
+    return instrument(sp)
 
 
 def get_spotify_user_authorization() -> spotipy.Spotify:
+    standin = get_standin_client()
+    if standin is not None:
+        return standin
+
     scopes = "user-library-modify, playlist-modify-private, playlist-modify-public"
 
     sp = spotipy.Spotify(
@@ -16,7 +54,7 @@ def get_spotify_user_authorization() -> spotipy.Spotify:
         )
     )
 
-    return sp
+    return instrument(sp)
 
 
 def get_spotify_client() -> spotipy.Spotify:
@@ -26,8 +64,12 @@ def get_spotify_client() -> spotipy.Spotify:
     Returns:
         spotipy.Spotify: An authenticated Spotify client.
     """
+    standin = get_standin_client()
+    if standin is not None:
+        return standin
+
     auth_manager = SpotifyClientCredentials(
         client_id=os.environ.get("SPOTIFY_CLIENT_ID"),
         client_secret=os.environ.get("SPOTIFY_CLIENT_SECRET"),
     )
-    return spotipy.Spotify(auth_manager=auth_manager)
+    return instrument(spotipy.Spotify(auth_manager=auth_manager))
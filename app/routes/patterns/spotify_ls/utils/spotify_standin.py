@@ -0,0 +1,450 @@
+"""
+Local stand-in for the subset of the Spotify Web API used by the Spotify tools.
+
+The stand-in serves recorded fixtures (see `fixtures/spotify_api.json`) over HTTP so
+tools and graphs can be exercised and benchmarked without live credentials. Artists,
+tracks and playlists that are not part of the fixtures are synthesized
+deterministically from their IDs, so any ID an LLM comes up with still resolves.
+
+Latency, jitter, page sizes and 429 injection are configurable through `StandinConfig`.
+Point the clients at a running stand-in by setting `SPOTIFY_API_BASE_URL`, e.g.:
+
+    python utils/spotify_standin.py --port 8765 --latency-ms 40 --jitter-ms 10
+    export SPOTIFY_API_BASE_URL=http://127.0.0.1:8765/v1/
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "fixtures",
+    "spotify_api.json",
+)
+
+BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# Spotify rejects audio-features requests with more than 100 IDs
+MAX_AUDIO_FEATURES_IDS = 100
+
+
+@dataclass
+class StandinConfig:
+    """
+    Knobs controlling how the stand-in behaves.
+
+    Attributes:
+        latency_ms (float): Fixed delay added to every response.
+        jitter_ms (float): Uniform random delay in [0, jitter_ms) added on top of latency.
+        page_size (int): Upper bound on the number of items returned per page.
+        rate_limit_every (int): Answer every N-th request with a 429 (0 disables).
+        retry_after (int): Value of the `Retry-After` header sent with injected 429s.
+        seed (int): Seed for the jitter random generator, for repeatable runs.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    page_size: int = 100
+    rate_limit_every: int = 0
+    retry_after: int = 0
+    seed: int = 0
+
+
+def synthetic_id(seed: str) -> str:
+    """
+    Derive a stable 22 character base-62 Spotify-like ID from `seed`.
+    """
+    n = int.from_bytes(hashlib.sha1(seed.encode("utf-8")).digest(), "big")
+    chars = []
+    for _ in range(22):
+        n, r = divmod(n, 62)
+        chars.append(BASE62[r])
+    return "".join(chars)
+
+
+class SpotifyCatalog:
+    """
+    In-memory catalog backed by fixtures, with deterministic synthesis for unknown IDs.
+    """
+
+    def __init__(self, fixtures: Dict[str, Any]):
+        self.user_id: str = fixtures.get("user_id", "standin-user")
+        self.artists: Dict[str, Dict[str, Any]] = dict(fixtures.get("artists", {}))
+        self.tracks: Dict[str, Dict[str, Any]] = dict(fixtures.get("tracks", {}))
+        self.playlists: Dict[str, Dict[str, Any]] = {
+            p["id"]: dict(p, tracks=list(p.get("tracks", [])))
+            for p in fixtures.get("playlists", [])
+        }
+        self.playlist_order: List[str] = [p["id"] for p in fixtures.get("playlists", [])]
+        self.artists_by_name: Dict[str, str] = {
+            a["name"].lower(): aid for aid, a in self.artists.items()
+        }
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str = FIXTURES_FILE) -> "SpotifyCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def artist(self, artist_id: str) -> Dict[str, Any]:
+        artist = self.artists.get(artist_id)
+        if artist is None:
+            rng = random.Random(artist_id)
+            artist = {
+                "name": f"Artist {artist_id[:6]}",
+                "genres": ["rock"],
+                "popularity": rng.randint(10, 80),
+            }
+            with self.lock:
+                artist = self.artists.setdefault(artist_id, artist)
+        return artist
+
+    def related(self, artist_id: str) -> List[str]:
+        artist = self.artist(artist_id)
+        if "related" not in artist:
+            artist["related"] = [synthetic_id(f"{artist_id}:related:{i}") for i in range(20)]
+        return artist["related"]
+
+    def top_tracks(self, artist_id: str) -> List[str]:
+        artist = self.artist(artist_id)
+        if "top_tracks" not in artist:
+            artist["top_tracks"] = [synthetic_id(f"{artist_id}:track:{i}") for i in range(10)]
+            for i, track_id in enumerate(artist["top_tracks"]):
+                self.tracks.setdefault(track_id, self._synthetic_track(track_id, artist_id, i))
+        return artist["top_tracks"]
+
+    def track(self, track_id: str) -> Dict[str, Any]:
+        track = self.tracks.get(track_id)
+        if track is None:
+            with self.lock:
+                track = self.tracks.setdefault(
+                    track_id, self._synthetic_track(track_id, synthetic_id(f"{track_id}:artist"), 0)
+                )
+        return track
+
+    def search_artist(self, name: str) -> str:
+        artist_id = self.artists_by_name.get(name.lower())
+        if artist_id is None:
+            artist_id = synthetic_id(f"name:{name.lower()}")
+            self.artist(artist_id)["name"] = name
+            self.artists_by_name[name.lower()] = artist_id
+        return artist_id
+
+    def create_playlist(self, name: str, description: str) -> Dict[str, Any]:
+        with self.lock:
+            playlist_id = synthetic_id(f"playlist:{name}:{len(self.playlist_order)}")
+            playlist = {"id": playlist_id, "name": name, "description": description, "tracks": []}
+            self.playlists[playlist_id] = playlist
+            self.playlist_order.append(playlist_id)
+        return playlist
+
+    @staticmethod
+    def _synthetic_track(track_id: str, artist_id: str, index: int) -> Dict[str, Any]:
+        rng = random.Random(track_id)
+        return {
+            "name": f"Track {track_id[:6]}",
+            "artists": [artist_id],
+            "album": f"Album {artist_id[:6]}",
+            "duration_ms": rng.randint(150000, 330000),
+            "explicit": rng.random() < 0.1,
+            "popularity": max(0, 80 - index * 5),
+            "audio_features": {
+                "acousticness": round(rng.random(), 3),
+                "danceability": round(rng.uniform(0.2, 0.9), 3),
+                "energy": round(rng.uniform(0.3, 1.0), 3),
+                "instrumentalness": round(rng.random() * 0.3, 3),
+                "liveness": round(rng.uniform(0.05, 0.6), 3),
+                "loudness": round(rng.uniform(-12, -3), 3),
+                "speechiness": round(rng.uniform(0.02, 0.2), 3),
+                "tempo": round(rng.uniform(70, 180), 3),
+                "valence": round(rng.random(), 3),
+                "key": rng.randint(0, 11),
+                "mode": rng.randint(0, 1),
+                "time_signature": 4,
+            },
+        }
+
+    # API object renderers
+
+    def artist_object(self, artist_id: str) -> Dict[str, Any]:
+        artist = self.artist(artist_id)
+        return {
+            "id": artist_id,
+            "uri": f"spotify:artist:{artist_id}",
+            "type": "artist",
+            "name": artist["name"],
+            "genres": artist.get("genres", []),
+            "popularity": artist.get("popularity", 0),
+        }
+
+    def track_object(self, track_id: str) -> Dict[str, Any]:
+        track = self.track(track_id)
+        return {
+            "id": track_id,
+            "uri": f"spotify:track:{track_id}",
+            "type": "track",
+            "name": track["name"],
+            "artists": [
+                {
+                    "id": aid,
+                    "uri": f"spotify:artist:{aid}",
+                    "type": "artist",
+                    "name": self.artist(aid)["name"],
+                }
+                for aid in track["artists"]
+            ],
+            "album": {"name": track["album"], "type": "album"},
+            "duration_ms": track.get("duration_ms"),
+            "explicit": track.get("explicit"),
+            "popularity": track.get("popularity"),
+        }
+
+    def audio_features_object(self, track_id: str) -> Dict[str, Any]:
+        track = self.track(track_id)
+        return dict(
+            track["audio_features"],
+            id=track_id,
+            uri=f"spotify:track:{track_id}",
+            type="audio_features",
+            duration_ms=track.get("duration_ms"),
+        )
+
+    def playlist_object(self, playlist_id: str) -> Dict[str, Any]:
+        playlist = self.playlists[playlist_id]
+        return {
+            "id": playlist_id,
+            "uri": f"spotify:playlist:{playlist_id}",
+            "type": "playlist",
+            "name": playlist["name"],
+            "description": playlist.get("description", ""),
+            "owner": {"id": self.user_id, "display_name": self.user_id},
+            "tracks": {"total": len(playlist["tracks"])},
+            "public": True,
+            "collaborative": False,
+            "snapshot_id": synthetic_id(f"{playlist_id}:{len(playlist['tracks'])}"),
+        }
+
+
+class StandinHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], catalog: SpotifyCatalog, config: StandinConfig):
+        super().__init__(address, SpotifyStandinHandler)
+        self.catalog = catalog
+        self.config = config
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.counter_lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+
+class SpotifyStandinHandler(BaseHTTPRequestHandler):
+    server: StandinHTTPServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        server = self.server
+        config = server.config
+        with server.counter_lock:
+            server.request_count += 1
+            count = server.request_count
+            delay = config.latency_ms + (server.rng.random() * config.jitter_ms if config.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000.0)
+        if config.rate_limit_every and count % config.rate_limit_every == 0:
+            with server.counter_lock:
+                server.rate_limited_count += 1
+            self._send(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                       headers={"Retry-After": str(config.retry_after)})
+            return
+
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        if parts and parts[0] == "v1":
+            parts = parts[1:]
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        body: Any = {}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = json.loads(self.rfile.read(length) or b"{}")
+
+        try:
+            status, payload = self._route(method, parts, query, body)
+        except KeyError as e:
+            status, payload = 404, {"error": {"status": 404, "message": f"Not found: {e}"}}
+        self._send(status, payload)
+
+    def _route(self, method: str, parts: List[str], query: Dict[str, str],
+               body: Any) -> Tuple[int, Any]:
+        catalog = self.server.catalog
+        route = tuple(parts)
+
+        if method == "GET" and len(route) == 3 and route[0] == "users" and route[2] == "playlists":
+            items = [catalog.playlist_object(pid) for pid in catalog.playlist_order]
+            return 200, self._page(items, f"users/{route[1]}/playlists", query, default_limit=50)
+        if method == "POST" and len(route) == 3 and route[0] == "users" and route[2] == "playlists":
+            playlist = catalog.create_playlist(body.get("name", ""), body.get("description", ""))
+            return 201, catalog.playlist_object(playlist["id"])
+        if len(route) >= 2 and route[0] == "playlists":
+            playlist_id = route[1]
+            playlist = catalog.playlists[playlist_id]
+            if method == "GET" and len(route) == 2:
+                obj = catalog.playlist_object(playlist_id)
+                obj["tracks"] = self._playlist_tracks_page(playlist_id, {})
+                return 200, obj
+            if method == "GET" and route[2:] == ("tracks",):
+                return 200, self._playlist_tracks_page(playlist_id, query)
+            if method == "POST" and route[2:] == ("tracks",):
+                # spotipy posts the bare list of URIs; the documented API form is {"uris": [...]}
+                uris = body if isinstance(body, list) else body.get("uris", [])
+                track_ids = [uri.split(":")[-1] for uri in uris]
+                if len(track_ids) > 100:
+                    return 400, {"error": {"status": 400, "message": "Too many ids requested"}}
+                with catalog.lock:
+                    playlist["tracks"].extend(track_ids)
+                return 201, {"snapshot_id": synthetic_id(f"{playlist_id}:{len(playlist['tracks'])}")}
+        if method == "GET" and route[:1] == ("artists",):
+            if len(route) == 1:
+                ids = [i for i in query.get("ids", "").split(",") if i]
+                return 200, {"artists": [catalog.artist_object(i) for i in ids]}
+            if len(route) == 2:
+                return 200, catalog.artist_object(route[1])
+            if route[2:] == ("top-tracks",):
+                return 200, {"tracks": [catalog.track_object(t) for t in catalog.top_tracks(route[1])]}
+            if route[2:] == ("related-artists",):
+                return 200, {"artists": [catalog.artist_object(a) for a in catalog.related(route[1])]}
+        if method == "GET" and route[:1] == ("tracks",) and len(route) == 2:
+            return 200, catalog.track_object(route[1])
+        if method == "GET" and route[:1] == ("audio-features",):
+            ids = [route[1]] if len(route) == 2 else [i for i in query.get("ids", "").split(",") if i]
+            if len(ids) > MAX_AUDIO_FEATURES_IDS:
+                return 400, {"error": {"status": 400, "message": "Too many ids requested"}}
+            if len(route) == 2:
+                return 200, catalog.audio_features_object(ids[0])
+            return 200, {"audio_features": [catalog.audio_features_object(i) for i in ids]}
+        if method == "GET" and route == ("search",):
+            name = query.get("q", "")
+            limit = int(query.get("limit", 10))
+            items = [catalog.artist_object(catalog.search_artist(name))] if name else []
+            return 200, {"artists": self._page(items[:limit], "search", query, default_limit=10)}
+        return 404, {"error": {"status": 404, "message": f"Unsupported endpoint {method} /{'/'.join(parts)}"}}
+
+    def _playlist_tracks_page(self, playlist_id: str, query: Dict[str, str]) -> Dict[str, Any]:
+        catalog = self.server.catalog
+        items = [{"track": catalog.track_object(t)} for t in catalog.playlists[playlist_id]["tracks"]]
+        return self._page(items, f"playlists/{playlist_id}/tracks", query, default_limit=100)
+
+    def _page(self, items: List[Any], path: str, query: Dict[str, str], default_limit: int) -> Dict[str, Any]:
+        base_url = self.server.base_url
+        limit = min(int(query.get("limit", default_limit)), self.server.config.page_size)
+        offset = int(query.get("offset", 0))
+        page = items[offset:offset + limit]
+        params = {k: v for k, v in query.items() if k not in ("offset", "limit")}
+
+        def link(new_offset: int) -> str:
+            return f"{base_url}{path}?{urlencode(dict(params, offset=new_offset, limit=limit))}"
+
+        return {
+            "href": link(offset),
+            "items": page,
+            "limit": limit,
+            "offset": offset,
+            "total": len(items),
+            "next": link(offset + limit) if offset + limit < len(items) else None,
+            "previous": link(max(0, offset - limit)) if offset > 0 else None,
+        }
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_standin(config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 0,
+                  fixtures_file: str = FIXTURES_FILE) -> StandinHTTPServer:
+    """
+    Starts the stand-in on a background thread.
+
+    Args:
+        config (StandinConfig): Latency, paging and rate limiting settings.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        fixtures_file (str): Path to the fixtures JSON file.
+
+    Returns:
+        StandinHTTPServer: The running server. Use `server.base_url` as `SPOTIFY_API_BASE_URL`
+            and `server.shutdown()` to stop it.
+    """
+    server = StandinHTTPServer((host, port), SpotifyCatalog.from_file(fixtures_file), config or StandinConfig())
+    thread = threading.Thread(target=server.serve_forever, name="spotify-standin", daemon=True)
+    thread.start()
+    logger.info(f"Spotify stand-in listening on {server.base_url}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Spotify Web API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_FILE)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    config = StandinConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        page_size=args.page_size,
+        rate_limit_every=args.rate_limit_every,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = StandinHTTPServer((args.host, args.port), SpotifyCatalog.from_file(args.fixtures), config)
+    logger.info(f"Spotify stand-in listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from langchain_core.runnables.config import RunnableConfig
+from app.common.session_store import ThreadScopedStore, get_thread_id
+
+
+# Playlists change only through the tools below, which invalidate what they touch;
+# the TTL bounds staleness from edits made outside the agent.
+DEFAULT_TTL_SECONDS = 300.0
+
+
+def playlist_tag(playlist_id: str) -> str:
+    # Accept "spotify:playlist:<id>" URIs as well as bare IDs
+    return f"playlist:{playlist_id.rsplit(':', 1)[-1]}"
+
+
+class _ThreadCache:
+    def __init__(self):
+        self.entries: Dict[str, Tuple[float, Any, Set[str]]] = {}
+        self.lock = threading.Lock()
+
+
+class ToolCache:
+    """
+    Thread-scoped memoization of read-only Spotify calls.
+
+    Results are keyed by the function name and a hash of its arguments, kept per graph
+    thread and expire after their TTL. Each entry carries tags naming the Spotify
+    resources it was read from (e.g. "playlists", "playlist:<id>"); mutating tools call
+    `invalidate` with the tags they affect. Invalidation applies to every thread,
+    since all sessions act on the same Spotify account.
+
+    Attributes:
+        hits (int): Number of calls answered from the cache.
+        misses (int): Number of calls that ran the function.
+    """
+
+    def __init__(self, max_threads: int = 1024):
+        self._threads: ThreadScopedStore[_ThreadCache] = ThreadScopedStore(_ThreadCache, max_threads=max_threads)
+        # Guards the counters and the generation, shared by every thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation, so a call that overlapped one does not store
+        # a result read before the mutation
+        self._generation = 0
+
+    @staticmethod
+    def key(name: str, args: Tuple, kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps([name, args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def memoize(self, ttl: float = DEFAULT_TTL_SECONDS,
+                tags: Optional[Callable[..., Iterable[str]]] = None) -> Callable:
+        """
+        Decorator caching a function's results per thread.
+
+        The decorated function must take a `config` keyword argument, used to find the
+        thread; it is not part of the key. Exceptions are not cached.
+
+        Args:
+            ttl (float): Seconds a result stays valid.
+            tags (Optional[Callable[..., Iterable[str]]]): Called with the function's
+                arguments (without `config`), returns the tags of the result.
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+                cache = self._threads.get(get_thread_id(config))
+                key = self.key(func.__name__, args, kwargs)
+                now = time.monotonic()
+                with cache.lock:
+                    entry = cache.entries.get(key)
+                if entry is not None and entry[0] > now:
+                    with self._lock:
+                        self.hits += 1
+                    return entry[1]
+                with self._lock:
+                    self.misses += 1
+                    generation = self._generation
+                result = func(*args, config=config, **kwargs)
+                entry_tags = set(tags(*args, **kwargs)) if tags else set()
+                with cache.lock, self._lock:
+                    if generation == self._generation:
+                        cache.entries[key] = (now + ttl, result, entry_tags)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """
+        Drops every cached entry carrying one of `tags`, in every thread.
+
+        Returns:
+            int: Number of entries dropped.
+        """
+        tags = set(tags)
+        dropped = 0
+        with self._lock:
+            self._generation += 1
+        for cache in self._threads.snapshot().values():
+            with cache.lock:
+                stale = [key for key, (_, _, entry_tags) in cache.entries.items() if entry_tags & tags]
+                for key in stale:
+                    del cache.entries[key]
+                dropped += len(stale)
+        return dropped
+
+    def clear(self, config: Optional[RunnableConfig] = None) -> None:
+        """
+        Drops the cache of the thread in `config`.
+        """
+        self._threads.evict(get_thread_id(config))
+
+
+tool_cache = ToolCache()
+
+
+def get_tool_cache() -> ToolCache:
+    return tool_cache
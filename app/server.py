@@ -2,21 +2,29 @@ import logging
 import os
 import uvicorn
 from contextlib import asynccontextmanager
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import yaml
 from dotenv import load_dotenv, find_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, field_validator
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.routes.patterns.reflection import router as agents_router
+from app.common.admission import (DEFAULT_MAX_PER_TENANT, DEFAULT_MAX_RUNNING, MAX_PER_TENANT_ENV, MAX_RUNNING_ENV,
+                                  AdmissionController)
+from app.common.graph_registry import get_graph_registry, graphs_from_env
+from app.common.jobs import DEFAULT_MAX_QUEUED, DEFAULT_WORKERS, MAX_QUEUED_ENV, WORKERS_ENV, JobQueue
+from app.common.metrics import CONTENT_TYPE, EventLoopLagMonitor, get_metrics
+from app.common.text_splitter import get_text_splitter
+from app.common.tracing import get_tracer
+from app.routes.graphs import router as graphs_router
+from app.routes.jobs import router as jobs_router
 
 
 def load_env_file():
@@ -39,17 +47,16 @@ def load_env_file():
             raise FileNotFoundError("Neither .env nor .env.azure files were found")
 
 
-def get_text_splitter():
-    return RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=0,
-        length_function=len,
-        is_separator_regex=False,
-        separators=[
-            "\n\n",
-            "\n",
-        ],
-    )
+class AppState:
+    """
+    Shared, request independent objects of the app.
+
+    Attributes:
+        text_splitter (Optional[RecursiveCharacterTextSplitter]): Splitter for long inputs.
+    """
+
+    def __init__(self):
+        self.text_splitter: Optional[RecursiveCharacterTextSplitter] = None
 
 
 class YAMLContent(BaseModel):
@@ -71,18 +78,54 @@ async def lifespan(fast_app: FastAPI):
         # load_env_file()
         # add_joke_agent_route(fast_app)
         # add_cascade_agent_route(fast_app)
-        routes = [route.path for route in fast_app.router.routes]
+        # Included routers show up as entries without a path of their own on recent FastAPI
+        routes = [route.path for route in fast_app.router.routes if hasattr(route, "path")]
         logging.info(f"Available routes: {routes}")
 
         fast_app.state.app_state = AppState()
         fast_app.state.app_state.text_splitter = get_text_splitter()
 
+        # Compile every graph once; requests share them and pass only their RunnableConfig
+        fast_app.state.graphs = get_graph_registry()
+        compiled = fast_app.state.graphs.warm(graphs_from_env())
+        logging.info(f"Compiled graphs: {', '.join(compiled)}")
+
+        fast_app.state.loop_lag = EventLoopLagMonitor()
+        fast_app.state.loop_lag.start()
+
+        # Graph runs of requests and jobs share these limits; jobs run as batch runs
+        fast_app.state.admission = AdmissionController(
+            max_running=int(os.getenv(MAX_RUNNING_ENV, DEFAULT_MAX_RUNNING)),
+            max_per_tenant=int(os.getenv(MAX_PER_TENANT_ENV, DEFAULT_MAX_PER_TENANT)),
+        )
+
+        # Long runs are submitted as jobs and run here instead of in the request
+        fast_app.state.jobs = JobQueue(
+            fast_app.state.graphs,
+            workers=int(os.getenv(WORKERS_ENV, DEFAULT_WORKERS)),
+            max_queued=int(os.getenv(MAX_QUEUED_ENV, DEFAULT_MAX_QUEUED)),
+            admission=fast_app.state.admission,
+        )
+        fast_app.state.jobs.start()
+
         logging.info("App state initialized successfully")
         yield
     except Exception as e:
         logging.error(f"Error during app initialization: {str(e)}")
         raise
     finally:
+        jobs = getattr(fast_app.state, "jobs", None)
+        if jobs is not None:
+            await jobs.stop()
+        loop_lag = getattr(fast_app.state, "loop_lag", None)
+        if loop_lag is not None:
+            await loop_lag.stop()
+        # Keep the final values for offline inspection, e.g. by a textfile collector
+        if os.getenv("METRICS_TEXTFILE"):
+            get_metrics().write(os.environ["METRICS_TEXTFILE"])
+        get_graph_registry().close()
+        if get_tracer() is not None:
+            get_tracer().close()
         logging.info("App shutdown")
 
 
@@ -103,6 +146,10 @@ def add_handlers(app: FastAPI):
     async def read_root():
         return os.path.join(static_directory, "index.html")
 
+    @app.get("/metrics")
+    async def read_metrics():
+        return Response(content=get_metrics().render(), media_type=CONTENT_TYPE)
+
 
 def create_app():
     app = FastAPI(lifespan=lifespan, title="Agentic DB API", description="API for managing Agentic DB",
@@ -118,12 +165,11 @@ def create_app():
         expose_headers=["*"],
     )
 
-    app.mount("/static", StaticFiles(directory=static_directory), name="static")
+    if os.path.isdir(static_directory):
+        app.mount("/static", StaticFiles(directory=static_directory), name="static")
     add_handlers(app)
-    app.include_router(ratings_router)
-    app.include_router(agents_router)
-    app.include_router(applications_router)
-    app.include_router(database_router)
+    app.include_router(graphs_router)
+    app.include_router(jobs_router)
 
     return app
 
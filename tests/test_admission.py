@@ -0,0 +1,62 @@
+import asyncio
+import contextlib
+from typing import List
+
+from app.common.admission import BATCH, INTERACTIVE, AdmissionController
+
+
+async def hold(controller: AdmissionController, tenant: str, priority: str, release: asyncio.Event,
+               admitted: List[str]) -> None:
+    async with controller.admit(tenant, priority):
+        admitted.append(tenant)
+        await release.wait()
+
+
+async def settle() -> None:
+    # Lets the runs admitted so far get into their block
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_tenant_at_its_limit_does_not_block_other_tenants():
+    async def scenario():
+        controller = AdmissionController(max_running=8, max_per_tenant=2)
+        release = asyncio.Event()
+        admitted: List[str] = []
+        # Tenant A fills its two slots and has a third run waiting
+        tasks = [asyncio.create_task(hold(controller, "a", INTERACTIVE.name, release, admitted)) for _ in range(3)]
+        try:
+            await settle()
+            assert admitted == ["a", "a"]
+
+            tasks.append(asyncio.create_task(hold(controller, "b", INTERACTIVE.name, release, admitted)))
+            await settle()
+            assert admitted == ["a", "a", "b"]
+            assert controller.stats()[INTERACTIVE.name] == {"running": 3, "queued": 1}
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+        assert admitted.count("a") == 3
+
+    asyncio.run(scenario())
+
+
+def test_class_limits_follow_the_controller_limit():
+    async def scenario():
+        controller = AdmissionController(max_running=4, max_per_tenant=4)
+        release = asyncio.Event()
+        admitted: List[str] = []
+        tasks = [asyncio.create_task(hold(controller, "jobs", BATCH.name, release, admitted)) for _ in range(4)]
+        try:
+            await settle()
+            # Batch runs hold three of the four slots, leaving one for interactive runs
+            assert controller.stats()[BATCH.name] == {"running": 3, "queued": 1}
+
+            async with contextlib.AsyncExitStack() as stack:
+                await asyncio.wait_for(stack.enter_async_context(controller.admit("user", INTERACTIVE.name)), 1)
+                assert controller.stats()[INTERACTIVE.name]["running"] == 1
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langgraph.graph.message import add_messages
+
+from app.common.graph_registry import GraphSpec, import_pattern
+
+
+compaction = import_pattern(GraphSpec("spotify_ls", "compaction", dependencies=(".", "models", "utils")))
+
+
+def conversation():
+    call = {"id": "call_1", "name": "get_playlists", "args": {}}
+    return [
+        HumanMessage('Extend "Road Trip" with artists active after 2010', id="first"),
+        AIMessage("", tool_calls=[call], id="call"),
+        ToolMessage('[{"name": "Road Trip", "uri": "spotify:playlist:p1"}]', tool_call_id="call_1",
+                    name="get_playlists", id="result"),
+        AIMessage("Done", id="done"),
+        HumanMessage('Make a copy of "Gym Mix" without the slow tracks', id="latest"),
+        AIMessage("draft plan", id="draft"),
+        HumanMessage("Check the playlist exists first", name=compaction.REFLECTION_NAME, id="critique"),
+        AIMessage("plan", id="plan"),
+    ]
+
+
+def test_latest_request_stays_out_of_the_digest():
+    messages = conversation()
+
+    updates = compaction.compact(messages, budget_tokens=1000)
+    compacted = add_messages(messages, updates)
+
+    assert [m.id for m in compacted] == ["first", "call", "latest", "plan"]
+    assert compacted[2].content == 'Make a copy of "Gym Mix" without the slow tracks'
+    assert not any(isinstance(m, RemoveMessage) and m.id == "latest" for m in updates)
+    digest = compaction.read_digest(compacted[1])
+    assert digest["requests"] == []
+    assert digest["resolved_ids"] == {"Road Trip": "spotify:playlist:p1"}
+    assert digest["plan"]["critiques"] == 1
+
+
+def test_older_requests_are_digested_on_a_later_turn():
+    messages = add_messages(conversation(), compaction.compact(conversation()))
+    messages = [*messages, HumanMessage('Shuffle "Chill"', id="third"), AIMessage("plan", id="plan-3")]
+
+    compacted = add_messages(messages, compaction.compact(messages))
+
+    assert [m.id for m in compacted] == ["first", "call", "third", "plan-3"]
+    digest = compaction.read_digest(compacted[1])
+    assert digest["requests"] == ['Make a copy of "Gym Mix" without the slow tracks']
+    assert digest["resolved_ids"] == {"Road Trip": "spotify:playlist:p1"}
@@ -0,0 +1,113 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.common.graph_registry import GRAPHS, GraphSpec, import_pattern
+
+
+def spotify_module(module):
+    return import_pattern(GraphSpec("spotify_ls", module, dependencies=(".", "models", "utils")))
+
+
+plan_cache = spotify_module("plan_cache")
+plan_executor = spotify_module("plan_executor")
+request_text = spotify_module("request_text")
+main = import_pattern(GRAPHS["spotify_ls"])
+Plan = plan_cache.Plan
+
+
+def make_plan(playlist):
+    return Plan.model_validate({
+        "steps": [
+            {
+                "step_number": 1,
+                "name": "find-playlist",
+                "type": "action",
+                "description": f"Find the playlist '{playlist}'",
+                "success_criteria": f"The URI of {playlist} is known",
+                "tool": "get_playlists",
+            },
+            {
+                "step_number": 2,
+                "name": "find-timeline",
+                "type": "action",
+                "description": "Keep the artists active after 2010",
+                "success_criteria": "Artists are filtered",
+                "tool": "find_artists_timeline",
+            },
+        ],
+        "reasoning": f"Start from {playlist}",
+        "validated": True,
+    })
+
+
+def test_request_template_abstracts_entities():
+    template, entities = plan_cache.request_template('Extend "Road Trip" with artists active after 2010')
+    same, others = plan_cache.request_template("extend  'Gym Mix' with artists active after 1999")
+
+    assert template == same == "extend <entity:0> with artists active after <year:1>"
+    assert entities == ["Road Trip", "2010"]
+    assert others == ["Gym Mix", "1999"]
+
+
+def test_stored_plan_is_bound_to_the_new_request():
+    cache = plan_cache.PlanCache(max_entries=4)
+    assert cache.store('Extend "Road Trip" with artists active after 2010', make_plan("Road Trip"), 3.0)
+
+    plan = cache.lookup('Extend "Gym Mix" with artists active after 2010')
+
+    assert plan == make_plan("Gym Mix")
+    assert cache.stats()["seconds_saved"] == 3.0
+
+
+def test_entity_containing_another_is_replaced_whole():
+    entities = ["Rock Classics", "Rock"]
+    template = plan_cache.abstract_plan(make_plan("Rock Classics"), entities)
+
+    assert "Rock" not in template
+    assert plan_cache.bind_plan(template, ["Jazz Classics", "Jazz"]) == make_plan("Jazz Classics")
+
+
+def test_unvalidated_plans_are_not_stored():
+    cache = plan_cache.PlanCache(max_entries=4)
+    plan = make_plan("Road Trip").model_copy(update={"validated": False})
+
+    assert not cache.store('Extend "Road Trip"', plan, 1.0)
+    assert cache.lookup('Extend "Road Trip"') is None
+
+
+def test_request_bindings_ignore_the_tool_schemas():
+    request = 'Extend "Road Trip" with artists active after 2010' + request_text.TOOLS_SUFFIX + ' "get_playlists"'
+
+    bindings = plan_executor.request_bindings(request)
+
+    assert bindings == {
+        "request": 'Extend "Road Trip" with artists active after 2010',
+        "quoted": ["Road Trip"],
+        "year": 2010,
+    }
+
+
+def test_second_turn_is_planned_for_its_own_request():
+    main.get_plan_cache().clear()
+    first = HumanMessage('Extend "Road Trip" with artists active after 2010')
+    second = HumanMessage('Make a copy of "Gym Mix" without the slow tracks')
+    critique = HumanMessage("Check the playlist exists first", name=main.REFLECTION_NAME)
+    config = {"configurable": {"thread_id": "two-turns"}}
+
+    turn_one = [first, AIMessage("plan")]
+    asyncio.run(main.plan_cache_store_node({"messages": turn_one, "plan": make_plan("Road Trip")}, config))
+
+    # The second request has its own template, so the first turn's plan does not answer it
+    turn_two = [*turn_one, AIMessage("done"), second]
+    update = asyncio.run(main.plan_cache_lookup_node({"messages": turn_two}, config))
+    assert update["plan"] is None
+
+    # Its plan is stored under the second request, not under a critique that follows it
+    state = {"messages": [*turn_two, AIMessage("plan"), critique], "plan": make_plan("Gym Mix")}
+    asyncio.run(main.plan_cache_store_node(state, config))
+    update = asyncio.run(main.plan_cache_lookup_node(
+        {"messages": [HumanMessage('Make a copy of "Chill" without the slow tracks')]}, config
+    ))
+    # main loads its own copy of the models, so compare the plans' values
+    assert update["plan"].model_dump() == make_plan("Chill").model_dump()
@@ -0,0 +1,31 @@
+from app.common.result_cache import ResultCache
+
+
+def test_least_recently_used_keys_are_evicted():
+    cache: ResultCache[str] = ResultCache(max_entries=2)
+    cache.put("a", "A", 1.0)
+    cache.put("b", "B", 1.0)
+    cache.get("a")
+    cache.put("c", "C", 1.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == "A"
+    assert cache.get("c").value == "C"
+    assert cache.stats()["entries"] == 2
+
+
+def test_hits_credit_the_time_spent_producing_the_result():
+    cache: ResultCache[str] = ResultCache(max_entries=4)
+    cache.put("plan", "steps", 2.5)
+    cache.get("plan")
+    cache.get("plan")
+    cache.get("other")
+
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 1, "hit_rate": 2 / 3, "seconds_saved": 5.0}
+
+
+def test_cache_without_entries_stores_nothing():
+    cache: ResultCache[str] = ResultCache(max_entries=0)
+
+    assert cache.put("a", "A", 1.0) is False
+    assert cache.get("a") is None
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from app.common.session_store import DEFAULT_THREAD_ID, ThreadScopedStore, get_thread_id
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_thread_id_defaults_outside_a_thread():
+    assert get_thread_id(None) == DEFAULT_THREAD_ID
+    assert get_thread_id({}) == DEFAULT_THREAD_ID
+    assert get_thread_id(config(7)) == "7"
+
+
+def test_each_thread_gets_its_own_value():
+    store = ThreadScopedStore(dict)
+
+    store.get("a")["artists"] = {"spotify:artist:1"}
+
+    assert store.get("a") == {"artists": {"spotify:artist:1"}}
+    assert store.get("b") == {}
+
+
+def test_concurrent_sessions_do_not_see_each_other():
+    store = ThreadScopedStore(list)
+    barrier = threading.Barrier(16)
+    leaks = []
+
+    def session(thread_id):
+        barrier.wait()
+        for i in range(200):
+            store.get(thread_id).append(thread_id)
+        if set(store.get(thread_id)) != {thread_id}:
+            leaks.append(thread_id)
+
+    threads = [threading.Thread(target=session, args=(f"t{i}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert leaks == []
+    assert all(len(values) == 200 for values in store.snapshot().values())
+
+
+def test_least_recently_used_threads_are_evicted():
+    store = ThreadScopedStore(dict, max_threads=2)
+    store.get("a")["x"] = 1
+    store.get("b")
+    store.get("a")
+    store.get("c")
+
+    assert set(store.snapshot()) == {"a", "c"}
+    # An evicted thread starts over
+    assert store.get("b") == {}
+
+
+def test_idle_threads_are_evicted():
+    store = ThreadScopedStore(dict, ttl_seconds=0.05)
+    store.get("idle")["x"] = 1
+    time.sleep(0.1)
+    store.get("active")
+
+    assert set(store.snapshot()) == {"active"}
+
+
+def test_evict_drops_one_thread():
+    store = ThreadScopedStore(dict)
+    store.get("a")
+    store.get("b")
+
+    store.evict("a")
+
+    assert set(store.snapshot()) == {"b"}
+    assert len(store) == 1
@@ -0,0 +1,82 @@
+import pytest
+
+from app.routes.patterns.spotify_ls.utils.blob_store import BlobStore
+from app.routes.patterns.spotify_ls.utils.tool_cache import ToolCache, playlist_tag
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def counting_tools(cache: ToolCache):
+    calls = []
+
+    @cache.memoize(tags=lambda playlist_id: [playlist_tag(playlist_id)])
+    def get_artists(playlist_id, config=None):
+        calls.append(playlist_id)
+        return {"playlist": playlist_id, "read": len(calls)}
+
+    return get_artists, calls
+
+
+def test_repeated_calls_are_answered_from_the_cache():
+    cache = ToolCache()
+    get_artists, calls = counting_tools(cache)
+
+    first = get_artists("p1", config=config("a"))
+    assert get_artists("p1", config=config("a")) == first
+    assert calls == ["p1"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalidation_drops_tagged_entries_in_every_thread():
+    cache = ToolCache()
+    get_artists, calls = counting_tools(cache)
+    for thread_id in ["a", "b"]:
+        get_artists("p1", config=config(thread_id))
+        get_artists("p2", config=config(thread_id))
+
+    # URIs and bare IDs name the same playlist
+    assert cache.invalidate([playlist_tag("spotify:playlist:p1")]) == 2
+
+    get_artists("p1", config=config("a"))
+    get_artists("p2", config=config("b"))
+    assert calls == ["p1", "p2", "p1", "p2", "p1"]
+
+
+def test_threads_do_not_share_entries():
+    cache = ToolCache()
+    get_artists, calls = counting_tools(cache)
+    get_artists("p1", config=config("a"))
+    get_artists("p1", config=config("b"))
+    cache.clear(config("a"))
+    get_artists("p1", config=config("b"))
+
+    assert calls == ["p1", "p1"]
+
+
+def test_evicted_blobs_expire_without_persistence():
+    store = BlobStore(max_bytes=64)
+    old = store.put(["spotify:track:%d" % i for i in range(3)], source="find_top_tracks")
+    new = store.put(["spotify:track:%d" % i for i in range(3, 6)])
+
+    assert old not in store
+    with pytest.raises(KeyError):
+        store.get(old)
+    # The tool to call again is still known after the blob is gone
+    assert store.source(old) == "find_top_tracks"
+    assert store.get(new) == ["spotify:track:3", "spotify:track:4", "spotify:track:5"]
+
+
+def test_persisted_blobs_outlive_eviction_and_restarts(tmp_path):
+    path = str(tmp_path / "blobs.sqlite")
+    store = BlobStore(max_bytes=64, path=path)
+    old = store.put({"spotify:artist:1", "spotify:artist:2"}, source="filter_artists_by_id")
+    store.put(["spotify:track:%d" % i for i in range(3)])
+
+    assert store.get(old) == ["spotify:artist:1", "spotify:artist:2"]
+
+    reopened = BlobStore(path=path)
+    assert old in reopened
+    assert reopened.get(old) == ["spotify:artist:1", "spotify:artist:2"]
+    assert reopened.source(old) == "filter_artists_by_id"
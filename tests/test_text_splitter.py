@@ -0,0 +1,33 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from app.common.graph_registry import GRAPHS, import_pattern
+from app.common.text_splitter import CHUNK_SIZE, get_text_splitter
+
+
+# One paragraph of 15,000 characters, with no line break to cut at
+SINGLE_PARAGRAPH = " ".join(f"word{i % 100:02d}" for i in range(2500))
+
+
+def test_single_paragraph_is_split_at_words():
+    chunks = get_text_splitter().split_text(SINGLE_PARAGRAPH)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    assert " ".join(chunks) == SINGLE_PARAGRAPH
+
+
+def test_word_longer_than_a_chunk_is_cut():
+    chunks = get_text_splitter().split_text("x" * (CHUNK_SIZE * 3))
+
+    assert [len(chunk) for chunk in chunks] == [CHUNK_SIZE] * 3
+
+
+def test_long_input_graph_maps_a_single_paragraph():
+    reflection = import_pattern(GRAPHS["reflection_long"])
+
+    update = asyncio.run(reflection.split_node({"messages": [HumanMessage(SINGLE_PARAGRAPH)]}))
+
+    # More than one chunk, so the graph maps the chunks instead of generating from the whole input
+    assert len(update["chunks"]) > 1
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from app.common.tool_node import ConcurrentToolNode, ToolLatencyHistogram, ToolLimit
+
+
+def slow_tool():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    @tool
+    def slow(seconds: float) -> str:
+        """Sleeps for `seconds`."""
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(seconds)
+        with lock:
+            running.pop()
+        return "done"
+
+    return slow, peak
+
+
+def call_message(*seconds):
+    return AIMessage("", tool_calls=[
+        {"id": f"call_{i}", "name": "slow", "args": {"seconds": s}} for i, s in enumerate(seconds)
+    ])
+
+
+def test_sync_tool_keeps_its_slot_after_an_async_timeout():
+    slow, peak = slow_tool()
+    node = ConcurrentToolNode([slow], limits={"slow": ToolLimit(max_concurrency=1, timeout=0.05)},
+                              histogram=ToolLatencyHistogram())
+
+    start = time.perf_counter()
+    result = asyncio.run(node.ainvoke({"messages": [call_message(0.3, 0.01)]}))
+
+    first, second = result["messages"]
+    assert json.loads(first.content)["error"] == "timeout"
+    assert second.content == "done"
+    # The second call waited for the late first call to return instead of running beside it
+    assert time.perf_counter() - start >= 0.3
+    assert max(peak) == 1
+    assert node.histogram.snapshot()["slow"]["outcomes"] == {"timeout": 1, "ok": 1}
+
+
+def test_acall_runs_sync_tools_under_the_caps():
+    slow, peak = slow_tool()
+    node = ConcurrentToolNode([slow], limits={"slow": ToolLimit(max_concurrency=2, timeout=1.0)},
+                              histogram=ToolLatencyHistogram())
+
+    async def scenario():
+        return await asyncio.gather(*(node.acall("slow", {"seconds": 0.05}) for _ in range(4)))
+
+    assert asyncio.run(scenario()) == ["done"] * 4
+    assert max(peak) == 2
+
+
+def test_acall_raises_on_timeout():
+    slow, _ = slow_tool()
+    node = ConcurrentToolNode([slow], limits={"slow": ToolLimit(timeout=0.05)}, histogram=ToolLatencyHistogram())
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(node.acall("slow", {"seconds": 0.2}))
+
+
+def test_async_tools_are_cancelled_at_the_deadline():
+    cancelled = []
+
+    @tool
+    async def wait(seconds: float) -> str:
+        """Waits for `seconds`."""
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            cancelled.append(seconds)
+            raise
+        return "done"
+
+    node = ConcurrentToolNode([wait], limits={"wait": ToolLimit(timeout=0.05)}, histogram=ToolLatencyHistogram())
+    message = AIMessage("", tool_calls=[{"id": "call_0", "name": "wait", "args": {"seconds": 5}}])
+
+    result = asyncio.run(node.ainvoke({"messages": [message]}))
+
+    assert json.loads(result["messages"][0].content)["error"] == "timeout"
+    assert cancelled == [5]
@@ -0,0 +1,25 @@
+import pytest
+
+from app.common.graph_registry import GRAPHS, import_pattern
+from app.common.web_search import get_tavily_tool
+
+
+@pytest.mark.parametrize("name", ["plan_execute", "reflection_react_tool", "reflection_react_tool_ls"])
+def test_search_graphs_compile_without_an_api_key(monkeypatch, name):
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    spec = GRAPHS[name]
+
+    graph = getattr(import_pattern(spec), spec.factory)()
+
+    assert graph is not None
+
+
+def test_search_tool_is_shared_and_needs_the_key_only_to_search(monkeypatch):
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    tool = get_tavily_tool()
+
+    assert get_tavily_tool() is tool
+    assert tool.name == "tavily_search_results_json"
+    assert tool.tool_call_schema.model_json_schema()["required"] == ["query"]
+    with pytest.raises(ValueError, match="tavily_api_key"):
+        tool.invoke({"query": "new releases"})